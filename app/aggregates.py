@@ -0,0 +1,169 @@
+import json
+import math
+import logging
+from datetime import date, timedelta
+from functools import lru_cache
+
+# Reporting aggregates of the transactions table: number of trades and sum of amount_eur per LEI,
+# per notional currency and per trading day (UTC day of transaction_epoch_us), one row per (dimension, key)
+# in the transaction_aggregates table.
+# The table is kept in step with the transactions by transaction_processor (config.MAINTAIN_AGGREGATES),
+# in bulk and without triggers:
+# - for every batch about to be written, the stored rows of its transaction_uti are read with one statement,
+#   and every new or changed row adds its contribution and takes off the one of the row it replaces
+#   (rows with the same content hash are not written and are skipped)
+# - the deltas are summed per (dimension, key) and written with one executemany before every commit,
+#   so the aggregates are committed in the same transaction as the rows they come from.
+#   Keys with a sum which is not finite (a notional of 'inf') are worked out again from the transactions table,
+#   as infinite amounts cannot be added and taken off.
+# Missing keys (no LEI, no currency or no epoch) are aggregated under ''.
+
+# Dimension -> SQL expression of its key over the transactions table, used for rebuilds and checks
+aggregate_dimensions = {
+    "lei": "COALESCE(legal_entity_identifier, '')",
+    "currency": "COALESCE(notional_currency, '')",
+    "day": "COALESCE(date(transaction_epoch_us / 1000000.0, 'unixepoch'), '')",
+}
+
+# Relative difference of amount_eur tolerated by check_aggregates, for the rounding of the incremental sums
+AMOUNT_TOLERANCE = 1e-6
+
+MICROSECONDS_PER_DAY = 86400 * 1000000
+EPOCH_DATE = date(1970, 1, 1)
+
+
+# Returns the UTC day (YYYY-MM-DD) of an epoch in microseconds, '' when there is no epoch
+@lru_cache(maxsize=4096)
+def epoch_day(epoch):
+
+    if epoch is None:
+        return ""
+    return (EPOCH_DATE + timedelta(days=epoch // MICROSECONDS_PER_DAY)).isoformat()
+
+
+# Deltas of the aggregates for the rows written since the last flush.
+# Rows are tuples in the column order of prepare_transactions: transaction_uti first, notional_currency at 3,
+# legal_entity_identifier at 7, amount_eur at 8, transaction_epoch_us at 9 and row_hash last.
+class AggregateDeltas:
+
+    def __init__(self):
+        self.deltas = {}
+
+    # Adds count and amount to the deltas of the three keys of a row
+    def add(self, legal_entity_identifier, notional_currency, epoch, amount_eur, count):
+
+        for dimension_key in (("lei", legal_entity_identifier or ""), ("currency", notional_currency or ""),
+                              ("day", epoch_day(epoch))):
+            delta = self.deltas.get(dimension_key)
+            if delta is None:
+                self.deltas[dimension_key] = [count, count * amount_eur]
+            else:
+                delta[0] += count
+                delta[1] += count * amount_eur
+
+    # Parameters:
+    # - cursor: Cursor of the connection writing the transactions, the batch must not be written yet
+    # - batch (list): Rows about to be written, in the order they are written
+    # Adds the deltas of the new and changed rows of the batch.
+    def add_batch(self, cursor, batch):
+
+        stored = {row[0]: row[1:] for row in cursor.execute("""
+            SELECT transaction_uti, row_hash, legal_entity_identifier, notional_currency, transaction_epoch_us, amount_eur
+            FROM transactions WHERE transaction_uti IN (SELECT value FROM json_each(?))
+        """, (json.dumps([row[0] for row in batch]),))}
+
+        for row in batch:
+            old = stored.get(row[0])
+            if old is not None:
+                if old[0] == row[-1]:
+                    continue
+                self.add(old[1], old[2], old[3], old[4], -1)
+            self.add(row[7], row[3], row[9], row[8], 1)
+            # A later row of the same transaction_uti replaces this one
+            stored[row[0]] = (row[-1], row[7], row[3], row[9], row[8])
+
+    # Writes the deltas summed since the last flush to transaction_aggregates, without committing.
+    # The rows must be written already. Keys left without any trade are removed.
+    def flush(self, cursor):
+
+        changes = [(dimension, key, count, amount) for (dimension, key), (count, amount) in self.deltas.items()
+                   if count or amount]
+        self.deltas = {}
+        if not changes:
+            return
+        cursor.executemany("""
+            INSERT INTO transaction_aggregates (dimension, key, trade_count, amount_eur) VALUES (?, ?, ?, ?)
+            ON CONFLICT(dimension, key) DO UPDATE SET
+                trade_count = trade_count + excluded.trade_count,
+                amount_eur = amount_eur + excluded.amount_eur
+        """, [change for change in changes if math.isfinite(change[3])])
+        for dimension, key, _, amount in changes:
+            if not math.isfinite(amount):
+                recompute_aggregate(cursor, dimension, key)
+        if any(count < 0 for _, _, count, _ in changes):
+            cursor.execute("DELETE FROM transaction_aggregates WHERE trade_count = 0")
+
+
+# Works out the aggregate of one key again from the transactions table, without committing
+def recompute_aggregate(cursor, dimension, key):
+
+    cursor.execute("DELETE FROM transaction_aggregates WHERE dimension = ? AND key = ?", (dimension, key))
+    cursor.execute(f"""
+        INSERT INTO transaction_aggregates (dimension, key, trade_count, amount_eur)
+        SELECT ?, ?, COUNT(*), TOTAL(amount_eur) FROM transactions
+        WHERE {aggregate_dimensions[dimension]} = ? HAVING COUNT(*) > 0
+    """, (dimension, key, key))
+
+
+# Returns the aggregates worked out from the whole transactions table, (dimension, key) -> (trade_count, amount_eur)
+def compute_aggregates(conn):
+
+    selects = " UNION ALL ".join(
+        f"SELECT '{dimension}', {key}, COUNT(*), TOTAL(amount_eur) FROM transactions GROUP BY 2"
+        for dimension, key in aggregate_dimensions.items())
+    return {(dimension, key): (count, amount) for dimension, key, count, amount in conn.execute(selects)}
+
+
+# Returns the aggregates stored in transaction_aggregates, (dimension, key) -> (trade_count, amount_eur)
+def stored_aggregates(conn):
+
+    return {(dimension, key): (count, amount) for dimension, key, count, amount in conn.execute(
+        "SELECT dimension, key, trade_count, amount_eur FROM transaction_aggregates")}
+
+
+# Parameter : conn - Database connection
+# Rebuilds transaction_aggregates from a full scan of the transactions table and commits.
+# Returns the number of aggregate rows written.
+def rebuild_aggregates(conn):
+
+    aggregates = compute_aggregates(conn)
+    conn.execute("DELETE FROM transaction_aggregates")
+    conn.executemany("INSERT INTO transaction_aggregates (dimension, key, trade_count, amount_eur) VALUES (?, ?, ?, ?)",
+                     [(*dimension_key, *values) for dimension_key, values in aggregates.items()])
+    conn.commit()
+    logging.info(f"Aggregates rebuilt: {len(aggregates)} rows")
+    return len(aggregates)
+
+
+# Parameter : conn - Database connection
+# Compares transaction_aggregates with a full recompute from the transactions table.
+# Returns the list of differences (dimension, key, stored, expected), stored or expected is None
+# when the key is missing on that side; an empty list when the table is consistent.
+def check_aggregates(conn):
+
+    stored = stored_aggregates(conn)
+    expected = compute_aggregates(conn)
+
+    differences = []
+    for dimension_key in sorted(stored.keys() | expected.keys()):
+        stored_value = stored.get(dimension_key)
+        expected_value = expected.get(dimension_key)
+        if stored_value is None or expected_value is None or stored_value[0] != expected_value[0] \
+                or abs(stored_value[1] - expected_value[1]) > AMOUNT_TOLERANCE * max(1.0, abs(expected_value[1])):
+            differences.append((*dimension_key, stored_value, expected_value))
+
+    if differences:
+        logging.warning(f"Aggregates differ from a full recompute for {len(differences)} keys")
+    else:
+        logging.info(f"Aggregates consistent with a full recompute ({len(expected)} keys)")
+    return differences
@@ -0,0 +1,206 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import config
+from transaction_processor import prepare_transactions, write_transactions
+from file_processor import list_input_files, read_chunks, move_processed_file, move_errored_file
+from compression import split_file_name
+from ingestion_ledger import file_checksum, is_ingested, record_ingestion
+from batching import DEFAULT_CHUNK_SIZE
+from metrics import timed_commit
+from quarantine import Quarantine, save_rejected_rows
+
+# Asyncio pipeline loading the input files with three stages connected by bounded queues:
+# - reader: reads the chunks of the files in a thread, in order of file name
+# - validator: submits every chunk to an executor (prepare_transactions) as soon as it is read
+# - writer: writes the validated chunks in order on the event loop thread, which owns the SQLite connection
+# While a chunk is written and committed the next chunks are read and validated. The queues are bounded,
+# so a slow writer holds back the reader and at most about 2 * queue_size chunks are held in memory.
+# The writer commits once the last chunk of a file is written, with its rejected rows, and moves the file
+# to processed, or rolls back and moves it to errored when any stage fails: without config.COMMIT_ROWS
+# a file is loaded completely or not at all. With config.COMMIT_ROWS the chunks are committed as they are
+# written, as in the streaming mode of file_processor, and a file failing partway keeps the chunks committed.
+
+# Marker of the end of the chunks of a file
+END_OF_FILE = "end"
+
+
+# State of one input file going through the pipeline
+class PipelineFile:
+
+    def __init__(self, file, input_path):
+        self.file = file
+        self.file_path = os.path.join(input_path, file)
+        self.ext = split_file_name(file)[1]
+        self.start_time = time.perf_counter()
+        self.stats = Counter()
+        self.rejected_rows = []
+        self.checksum = None
+        self.size_bytes = None
+        self.skipped = False
+        self.ledger_checked = False
+        self.error = None
+
+
+# Runs in the executor: validates one chunk.
+# Returns rows ready for the transaction table, the counts of rows read, valid and rejected,
+# and the rejected rows to quarantine.
+def validate_chunk(chunk, quarantine=None):
+
+    start_time = time.perf_counter()
+    with Quarantine(quarantine) as quarantined:
+        transactions_list = prepare_transactions(chunk)
+    return transactions_list, {"read": len(chunk), "valid": len(transactions_list),
+                               "rejected": len(chunk) - len(transactions_list),
+                               "validate_seconds": time.perf_counter() - start_time}, quarantined.rows
+
+
+# Reader stage: puts the chunks of every file on read_queue, followed by END_OF_FILE.
+# Files already in the ingestion ledger are marked as skipped without being read.
+async def read_stage(input_files, input_path, conn, read_queue, chunk_size, chunk_bytes, ledger, metrics):
+
+    for file in input_files:
+        entry = PipelineFile(file, input_path)
+        try:
+            if ledger or metrics:
+                entry.size_bytes = os.path.getsize(entry.file_path)
+                entry.stats["bytes_read"] = entry.size_bytes
+            if ledger:
+                entry.checksum = await asyncio.to_thread(file_checksum, entry.file_path)
+                entry.skipped = is_ingested(conn, entry.checksum)
+
+            if not entry.skipped:
+                chunks = read_chunks(entry.file_path, entry.ext, chunk_size or DEFAULT_CHUNK_SIZE, chunk_bytes)
+                while True:
+                    start_time = time.perf_counter()
+                    chunk = await asyncio.to_thread(next, chunks, None)
+                    entry.stats["read_seconds"] += time.perf_counter() - start_time
+                    if chunk is None:
+                        break
+                    await read_queue.put((entry, chunk))
+                logging.info(f"File read complete: {file}")
+
+        except Exception as e:
+            entry.error = e
+        await read_queue.put((entry, END_OF_FILE))
+
+    await read_queue.put(None)
+
+
+# Validator stage: submits the chunks to the executor and passes the futures on to write_queue in order
+async def validate_stage(read_queue, write_queue, executor, quarantine):
+
+    loop = asyncio.get_running_loop()
+    while (item := await read_queue.get()) is not None:
+        entry, chunk = item
+        if chunk is not END_OF_FILE:
+            chunk = loop.run_in_executor(executor, validate_chunk, chunk, quarantine)
+        await write_queue.put((entry, chunk))
+
+    await write_queue.put(None)
+
+
+# Writer stage: writes the validated chunks and finishes every file once its last chunk is written
+async def write_stage(write_queue, conn, errored_path, processed_path, timestamp, ledger, metrics, quarantine):
+
+    while (item := await write_queue.get()) is not None:
+        entry, validation = item
+        # The ledger is checked again when the writer reaches the file: an identical file earlier in the run
+        # may have been committed after this one was read, its chunks are then dropped
+        if ledger and entry.checksum and not entry.ledger_checked and not entry.skipped and entry.error is None:
+            entry.ledger_checked = True
+            if is_ingested(conn, entry.checksum):
+                entry.skipped = True
+        if validation is END_OF_FILE:
+            finish_file(entry, conn, errored_path, processed_path, timestamp, ledger, metrics, quarantine)
+            continue
+
+        try:
+            transactions_list, stats, rejected_rows = await validation
+            if entry.error is not None or entry.skipped:
+                continue
+            entry.stats.update(stats)
+            entry.rejected_rows.extend(rejected_rows)
+            if transactions_list:
+                start_time = time.perf_counter()
+                entry.stats.update(write_transactions(transactions_list, conn, commit=bool(config.COMMIT_ROWS)))
+                entry.stats["write_seconds"] += time.perf_counter() - start_time
+        except Exception as e:
+            if entry.error is None:
+                entry.error = e
+
+
+# Saves the rejected rows, commits the file and moves it to processed, or rolls it back and moves it to errored,
+# then records it in the ingestion ledger and the metrics.
+def finish_file(entry, conn, errored_path, processed_path, timestamp, ledger, metrics, quarantine):
+
+    input_path = os.path.dirname(entry.file_path)
+    if entry.skipped:
+        logging.info(f"File {entry.file} was already ingested, skipping it.")
+        outcome = "skipped"
+    elif entry.error is None:
+        try:
+            save_rejected_rows(conn, entry.file, entry.rejected_rows, quarantine, processed_path, timestamp)
+            commit_seconds = timed_commit(conn)
+            entry.stats.update({"commits": 1, "commit_seconds": commit_seconds, "write_seconds": commit_seconds})
+            outcome = "processed"
+        except Exception as e:
+            entry.error = e
+
+    move_start = time.perf_counter()
+    if entry.error is None:
+        if not entry.skipped:
+            logging.info(f"Transactions inserted: {entry.stats['inserted']}, updated: {entry.stats['updated']}, "
+                         f"unchanged: {entry.stats['unchanged']}, duplicates collapsed: {entry.stats['collapsed']}")
+        move_processed_file(entry.file, input_path, processed_path, timestamp)
+    else:
+        logging.error(entry.error)
+        conn.rollback()
+        move_errored_file(entry.file, input_path, errored_path, timestamp)
+        outcome = "errored"
+    entry.stats["move_seconds"] = time.perf_counter() - move_start
+
+    duration = time.perf_counter() - entry.start_time
+    if ledger and entry.checksum:
+        record_ingestion(conn, entry.file, entry.checksum, entry.size_bytes, entry.stats, outcome, duration)
+    if metrics:
+        metrics.record_file(entry.file, outcome, entry.stats, duration)
+
+
+# Parameters:
+# - input_path, errored_path, processed_path, conn: Same as for file_processor.process_files
+# - chunk_size (int): Rows in one chunk, batching.DEFAULT_CHUNK_SIZE when not given
+# - chunk_bytes (int): Optional, byte budget for one chunk (CSV files only)
+# - workers (int): Number of worker processes validating the chunks, None or 1 validates them in one thread
+# - queue_size (int): Maximum number of chunks waiting in each of the two queues
+# - ledger (bool), metrics (metrics.RunMetrics), quarantine (str): Same as for file_processor.process_files
+# Loads the files of the input directory through the asyncio pipeline.
+# Returns the list of files which were loaded, empty if there was no file to load.
+def process_files_async(input_path, errored_path, processed_path, conn, chunk_size=None, chunk_bytes=None,
+                        workers=None, queue_size=4, ledger=False, metrics=None, quarantine=None):
+
+    input_files = list_input_files(input_path, errored_path, processed_path)
+    if not input_files:
+        return input_files
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if workers and workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        executor = ThreadPoolExecutor(max_workers=1)
+
+    async def run():
+        read_queue = asyncio.Queue(maxsize=queue_size)
+        write_queue = asyncio.Queue(maxsize=queue_size)
+        await asyncio.gather(
+            read_stage(input_files, input_path, conn, read_queue, chunk_size, chunk_bytes, ledger, metrics),
+            validate_stage(read_queue, write_queue, executor, quarantine),
+            write_stage(write_queue, conn, errored_path, processed_path, timestamp, ledger, metrics, quarantine))
+
+    with executor:
+        asyncio.run(run())
+    return input_files
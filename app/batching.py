@@ -0,0 +1,12 @@
+from itertools import islice
+
+# Number of rows in one chunk when a file is streamed and no chunk size is given
+DEFAULT_CHUNK_SIZE = 10000
+
+
+# Divides the input list into batched for writing to db in batches
+def batched(iterable, n):
+    it = iter(iterable)
+    while batch := tuple(islice(it, n)):
+        yield batch
+
@@ -0,0 +1,65 @@
+import logging
+from datetime import datetime
+
+# Checkpoints of the files loaded in streaming mode with config.COMMIT_ROWS, stored in the load_checkpoints table
+# (see db_handler.create_tables), one row per file checksum.
+# Every chunk is written then committed together with the checkpoint of the rows read so far, so a
+# checkpoint never gets ahead of or behind the rows committed. When the process dies in the middle of a
+# file, the next load of the same file (same checksum) starts after the last checkpoint: formats whose
+# reader has read_chunk_offsets (CSV, see readers.py) are read again from the byte offset of the checkpoint,
+# the others are read again from the start and the rows already committed are skipped without being
+# validated or written. The checkpoint is removed with the last commit of the file; it is kept when the file
+# ends up in errored, so the same file dropped again resumes too.
+
+
+# Returns the checkpoint of the file with the checksum, as (chunks committed, rows read, byte offset),
+# None when there is no checkpoint for it.
+def load_checkpoint(conn, checksum):
+
+    return conn.execute("SELECT chunks_committed, rows_read, byte_offset FROM load_checkpoints WHERE checksum = ?",
+                        (checksum,)).fetchone()
+
+
+# Parameters:
+# - checksum (str): Checksum of the file (ingestion_ledger.file_checksum)
+# - file_name (str): Name of the input file
+# - chunks_committed (int): Chunks of the file written so far
+# - rows_read (int): Rows of the file read so far, valid or not
+# - byte_offset (int): Offset in the file just after the last row read, None for formats read without offsets
+# Saves the checkpoint of the file, without committing: it is committed with the rows of the chunk.
+def save_checkpoint(conn, checksum, file_name, chunks_committed, rows_read, byte_offset):
+
+    conn.execute("""
+        INSERT INTO load_checkpoints (checksum, file_name, chunks_committed, rows_read, byte_offset, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(checksum) DO UPDATE SET
+            file_name = excluded.file_name,
+            chunks_committed = excluded.chunks_committed,
+            rows_read = excluded.rows_read,
+            byte_offset = excluded.byte_offset,
+            updated_at = excluded.updated_at
+    """, (checksum, file_name, chunks_committed, rows_read, byte_offset, datetime.now().isoformat(timespec="seconds")))
+
+
+# Removes the checkpoint of a file, without committing: it is committed with the last rows of the file
+def clear_checkpoint(conn, checksum):
+
+    conn.execute("DELETE FROM load_checkpoints WHERE checksum = ?", (checksum,))
+
+
+# Parameters:
+# - chunks (iterator): Chunks (TransactionBatch) of a file read from its start
+# - rows (int): Number of rows to skip
+# Yields the chunks without their first 'rows' rows, the rows skipped are read but not validated.
+def skip_rows(chunks, rows):
+
+    if rows:
+        logging.info(f"Resuming after the {rows} rows already committed")
+    for chunk in chunks:
+        if rows >= len(chunk):
+            rows -= len(chunk)
+            continue
+        if rows:
+            chunk = chunk[rows:]
+            rows = 0
+        yield chunk
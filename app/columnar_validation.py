@@ -0,0 +1,53 @@
+from itertools import compress
+from operator import mul, and_
+import config
+from transaction_batch import TransactionBatch
+from identifier_validation import valid_isins, valid_leis
+from quarantine import first_failures, reject
+
+# Validation engine working on plain column lists instead of a pandas DataFrame.
+# Gives the same accept/reject results as transaction_processor.transaction_validations
+# and returns the rows ready for executemany, without building a DataFrame.
+
+# Input parameter : transactions - TransactionBatch read from a file, or list of dictionaries
+# 1 - Checks if notional and exchange rate fields are numeric, rejects all rows where these fields are NAN or Null.
+# 2 - Rejects rows where transaction_uti is empty string or missing.
+#     Rejects rows where the ISIN or LEI check digits are wrong (config.VALIDATE_IDENTIFIERS).
+#     Rejected rows are counted in the log and quarantined with their reason code (quarantine.reject).
+# 3 - Computes amount_eur as notional * exchange_rate
+# Returns list of tuples in the column order of transaction table.
+def validate_transactions(transactions):
+
+    if not isinstance(transactions, TransactionBatch):
+        transactions = TransactionBatch.from_dicts(transactions)
+
+    # The numeric columns were converted when the rows were read, values which are not numeric are NaN
+    notional = transactions.notional
+    exchange_rate = transactions.exchange_rate
+    uti = transactions.transaction_uti
+
+    # A row is valid when both numbers parsed (NaN != NaN), transaction_uti is present and the identifiers are valid
+    valid = [n == n and r == r and u is not None and u != ""
+             for n, r, u in zip(notional, exchange_rate, uti)]
+    if config.VALIDATE_IDENTIFIERS and valid:
+        isin_ok = valid_isins(transactions.isin).tolist()
+        lei_ok = valid_leis(transactions.legal_entity_identifier).tolist()
+        valid = list(map(and_, valid, map(and_, isin_ok, lei_ok)))
+
+    # Quarantining the records with bad data, the reasons are only worked out for the rejected rows
+    indices = [i for i, ok in enumerate(valid) if not ok]
+    if indices:
+        checks = [[uti[i] is None or uti[i] == "" for i in indices],
+                  [notional[i] != notional[i] for i in indices],
+                  [exchange_rate[i] != exchange_rate[i] for i in indices]]
+        if config.VALIDATE_IDENTIFIERS:
+            checks += [[not isin_ok[i] for i in indices], [not lei_ok[i] for i in indices]]
+        positions, reasons = first_failures(checks)
+        reject(transactions, [indices[position] for position in positions], reasons)
+
+    amount_eur = list(map(mul, notional, exchange_rate))
+
+    rows = zip(uti, transactions.isin, notional, transactions.notional_currency, transactions.transaction_type,
+               transactions.transaction_datetime, exchange_rate, transactions.legal_entity_identifier, amount_eur)
+
+    return list(compress(rows, valid))
@@ -0,0 +1,61 @@
+import os
+import importlib
+
+# Compressed input files are detected from their first bytes, whatever their name, and decompressed
+# on the fly by the readers with the codecs of the standard library: the decompressed file is never
+# written to disk and only the blocks being read are held in memory.
+# A compression suffix may follow the format in the file name (input_data_csv.csv.gz), it is not needed
+# for the file to be decompressed.
+
+# Magic bytes at the start of the file -> module of its codec, imported only when a compressed file is read
+compression_codecs = {
+    b"\x1f\x8b": "gzip",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "lzma",
+}
+
+# File name suffixes of the compressed files
+COMPRESSION_SUFFIXES = (".gz", ".bz2", ".xz")
+
+MAGIC_BYTES = max(len(magic) for magic in compression_codecs)
+
+
+# Parameter : file_path (str): Input file
+# Returns the open function of the codec the file is compressed with, None when it is not compressed.
+def sniff_compression(file_path):
+
+    with open(file_path, "rb") as input_file:
+        start = input_file.read(MAGIC_BYTES)
+    for magic, codec in compression_codecs.items():
+        if start.startswith(magic):
+            return importlib.import_module(codec).open
+    return None
+
+
+# Parameters:
+# - file_path (str): Input file, compressed or not
+# - mode (str): "rb" or "r", the keyword arguments (encoding, newline) are passed on as for open
+# Opens the file, through its codec when it is compressed, so the readers always see the decompressed content.
+# Seeking is supported on the decompressed content, the codecs decompress again from the start to seek back.
+def open_input(file_path, mode="rb", **kwargs):
+
+    codec_open = sniff_compression(file_path)
+    if codec_open is None:
+        return open(file_path, mode, **kwargs)
+    # The codecs open in binary mode unless text mode is asked for explicitly
+    if "b" not in mode and "t" not in mode:
+        mode += "t"
+    return codec_open(file_path, mode, **kwargs)
+
+
+# Parameter : file (str): Name of an input file
+# Returns the name without extensions, the extension of the format and the compression suffix ('' if none),
+# eg. "input_data_csv.csv.gz" -> ("input_data_csv", ".csv", ".gz").
+def split_file_name(file):
+
+    name, ext = os.path.splitext(file)
+    compression = ""
+    if ext.lower() in COMPRESSION_SUFFIXES:
+        compression = ext
+        name, ext = os.path.splitext(name)
+    return name, ext, compression
@@ -8,9 +8,113 @@
 DB_NAME = "Transaction_Reporting.db"
 DB_PATH = "data"
 
+# SQLite write profile, applied to every connection by db_handler.get_db_connection.
+# Journal_Mode - "WAL" lets readers (display, reports) query the database while a load is running.
+# Synchronous - "NORMAL" syncs the WAL at checkpoints only, "FULL" syncs on every commit.
+# Cache_Size - page cache, negative values are in KiB.
+# Mmap_Size - bytes of the database file read through memory mapping, 0 disables it.
+# Busy_Timeout - milliseconds a connection waits for a lock before failing.
+JOURNAL_MODE = "WAL"
+SYNCHRONOUS = "NORMAL"
+CACHE_SIZE = -64000
+MMAP_SIZE = 268435456
+BUSY_TIMEOUT = 5000
+
+# Batch_Size - number of rows sent to the database in one executemany call.
+# Commit_Rows - commit after at least this many rows have been written, used when files are streamed
+#               (CHUNK_SIZE or CHUNK_BYTES): the chunks are then committed as they are written, or with their
+#               checkpoint (LOAD_CHECKPOINTS). Whole files are always committed once, with their rejected rows.
+#               None commits once per file so a file is loaded completely or not at all.
+BATCH_SIZE = 1000
+COMMIT_ROWS = None
+
+# Writes of at least this many rows are loaded into a staging table and merged into
+# transactions with one set based statement instead of an upsert per row. None disables it.
+# Run benchmarks/bench_staging_merge.py on the target machine to find the break even point.
+STAGING_MIN_ROWS = None
+
+# Maintain_Aggregates - True keeps transaction_aggregates (trades and amount_eur per LEI, currency and
+#                       trading day, see aggregates.py) in step with every batch written to transactions.
+#                       After loading with it switched off, run python3 app/main.py --rebuild-aggregates.
+MAINTAIN_AGGREGATES = True
+
 # File path for Input files.
 # Processed_Path - for files which are processed successfuly without any errors.
 # Error_Path - for files which are not processed and resulted in errors.
 INPUT_PATH = "data/input"
 ERROR_PATH = "data/errored"
 PROCESSED_PATH = "data/processed"
+
+# Streaming settings for large input files.
+# Chunk_Size - number of rows validated and written at a time, None loads the whole file at once.
+# Chunk_Bytes - optional byte budget for one chunk, a chunk is closed at whichever limit is hit first.
+CHUNK_SIZE = None
+CHUNK_BYTES = None
+
+# Records every input file (checksum, size, row counts, outcome, duration) in the ingestion_ledger table.
+# A file with the same content as a file already processed successfully is moved to processed without loading it.
+INGESTION_LEDGER = True
+
+# Checkpointed loads (checkpoints.py), used when files are streamed (CHUNK_SIZE or CHUNK_BYTES) with COMMIT_ROWS:
+# every chunk is committed together with a checkpoint of the file (checksum, chunks and rows committed,
+# byte offset for CSV files), and a file whose load was interrupted resumes after its last checkpoint.
+# Not used by the asyncio pipeline.
+LOAD_CHECKPOINTS = True
+
+# Number of worker processes reading and validating input files in parallel.
+# None or 1 processes the files one by one in the main process.
+WORKERS = None
+
+# Parsing of one large CSV or NDJSON file in WORKERS processes (split_csv.py): the file is memory-mapped and cut
+# into byte ranges ending on record boundaries (newlines outside quoted fields), which are parsed and validated
+# in parallel and written in file order, so a single huge file uses every worker. Compressed files are streamed.
+# Split_Csv_Min_Bytes - CSV and NDJSON files of at least this size are split when WORKERS > 1, None disables it.
+# Split_Range_Bytes - size of one byte range, at most 2 ranges per worker are held in memory.
+SPLIT_CSV_MIN_BYTES = None
+SPLIT_RANGE_BYTES = 64 * 2 ** 20
+
+# Asyncio pipeline (async_pipeline.py): files are read, validated (in an executor, WORKERS processes when set)
+# and written by three stages connected by bounded queues, so reading, validation and SQLite writes overlap.
+# Async_Pipeline - True loads the files through the pipeline, in chunks of CHUNK_SIZE rows.
+# Pipeline_Queue_Size - chunks waiting in each queue, caps the memory held by the pipeline.
+ASYNC_PIPELINE = False
+PIPELINE_QUEUE_SIZE = 4
+
+# Validation engine used for the transactions read from file.
+# "pandas" - validates with a pandas DataFrame (transaction_processor.transaction_validations)
+# "columnar" - validates plain column lists without building a DataFrame (columnar_validation), faster for small and medium files
+VALIDATION_ENGINE = "pandas"
+
+# Validate_Identifiers - True rejects the rows whose ISIN (ISO 6166 Luhn check digit) or
+# LEI (ISO 17442 mod 97 check digits) is malformed, they are logged with the other bad data.
+VALIDATE_IDENTIFIERS = True
+
+# Quarantine of the rejected rows, with the reason code of their first failing check (see quarantine.py).
+# The log only carries the counts of rejected rows per reason.
+# "table" - bulk inserted into the rejected_transactions table with the rows of the file
+# "csv" - written to <processed file name>.rejected.csv next to the processed file
+# None - rejected rows are only counted
+QUARANTINE = "table"
+
+# Secondary indexes of the transactions table used by the queries of query.py, index name -> columns.
+# They are created once the files are loaded (in watch mode when the input directory is idle),
+# one index per transaction, so an index build never holds the database during a load.
+# Transaction_Indexes - an empty dict creates no index.
+# Query_Page_Size - rows read per page by the keyset paginated queries.
+TRANSACTION_INDEXES = {"isin": ["isin"], "lei": ["legal_entity_identifier"],
+                       "currency": ["notional_currency"], "epoch": ["transaction_epoch_us"]}
+QUERY_PAGE_SIZE = 1000
+
+# Watch mode (python3 app/main.py --watch)
+# Watch_Poll_Interval - seconds between two scans of the input directory.
+# Watch_Settle_Seconds - a file is loaded once its size and modification time have not changed for this long,
+#                        or straight away when a marker file <file name>.done is present.
+WATCH_POLL_INTERVAL = 2.0
+WATCH_SETTLE_SECONDS = 5.0
+
+# Run metrics written by main.py: stage durations, row counts, bytes read and commit latency of every file.
+# Metrics_Jsonl_Path - one JSON line per file and one summary line per run are appended, None disables it.
+# Metrics_Prometheus_Path - totals of the run in Prometheus text format (node_exporter textfile collector),
+#                           rewritten after every file, None disables it.
+METRICS_JSONL_PATH = "data/metrics/run_metrics.jsonl"
+METRICS_PROMETHEUS_PATH = "data/metrics/cdp_loader.prom"
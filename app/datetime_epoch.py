@@ -0,0 +1,140 @@
+import logging
+
+# Conversion of the transaction datetimes to UTC epoch microseconds, stored in transactions.transaction_epoch_us
+# next to the original text so time range queries are index range scans on an INTEGER column.
+# The feeds write ISO 8601 with different UTC designators (CSV/JSON '...Z', XML '...+00:00'), parsed here as:
+#   YYYY-MM-DD[(T| )HH:MM:SS[.fraction]][Z|(+|-)HH:MM]
+# without a designator the time is read as UTC, digits of the fraction after the microseconds are dropped.
+# Like identifier_validation, the values are copied into one array of character codes and every field is read
+# for all the rows at once with numpy; the only Python loops are over the character positions.
+
+# Longest accepted value: 2024-11-25T15:06:22.123456789+00:00
+DATETIME_WIDTH = 35
+FRACTION_START = 20
+FRACTION_DIGITS = 9
+
+MICROSECONDS_PER_SECOND = 1000000
+SECONDS_PER_DAY = 86400
+
+# Days in each month of a year which is not a leap year
+DAYS_IN_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+
+# Parameter : values (sequence): Datetimes as read from the files, may hold None or NaN
+# Returns two numpy arrays: the UTC epoch in microseconds of every value (0 where it is not valid),
+# and True where the value is a valid datetime.
+def epoch_microseconds(values):
+
+    import numpy as np
+
+    # One extra character is kept so that longer values are not truncated to a valid length
+    text = np.asarray(values, dtype=object).astype(f"U{DATETIME_WIDTH + 1}")
+    codes = text.view(np.uint32).reshape(len(text), DATETIME_WIDTH + 1).astype(np.int64)
+    digits = codes - ord("0")
+    is_digit = (digits >= 0) & (digits <= 9)
+    rows = np.arange(len(text))
+
+    # Reads the number written at the given character positions of every value
+    def number(start, length):
+        value = np.zeros(len(text), dtype=np.int64)
+        valid = np.ones(len(text), dtype=bool)
+        for position in range(start, start + length):
+            value = value * 10 + digits[:, position]
+            valid &= is_digit[:, position]
+        return value, valid
+
+    def character(position, *allowed):
+        return np.isin(codes[:, position], [ord(c) for c in allowed])
+
+    # Date YYYY-MM-DD
+    year, valid_year = number(0, 4)
+    month, valid_month = number(5, 2)
+    day, valid_day = number(8, 2)
+    valid = valid_year & valid_month & valid_day & character(4, "-") & character(7, "-")
+    valid &= (month >= 1) & (month <= 12)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = np.array(DAYS_IN_MONTH)[np.clip(month - 1, 0, 11)] + (leap & (month == 2))
+    valid &= (day >= 1) & (day <= month_days)
+
+    # Time HH:MM:SS, absent for a date alone
+    date_only = codes[:, 10] == 0
+    hour, valid_hour = number(11, 2)
+    minute, valid_minute = number(14, 2)
+    second, valid_second = number(17, 2)
+    valid_time = (character(10, "T", " ") & character(13, ":") & character(16, ":")
+                  & valid_hour & valid_minute & valid_second & (hour <= 23) & (minute <= 59) & (second <= 59))
+    valid &= date_only | valid_time
+    seconds = np.where(date_only, 0, hour * 3600 + minute * 60 + second)
+
+    # Fraction of second, from 1 to 9 digits after a '.', only the first 6 are kept
+    has_fraction = ~date_only & character(FRACTION_START - 1, ".")
+    fraction_digits = np.zeros(len(text), dtype=np.int64)
+    microseconds = np.zeros(len(text), dtype=np.int64)
+    still_digits = has_fraction.copy()
+    for index in range(FRACTION_DIGITS):
+        still_digits &= is_digit[:, FRACTION_START + index]
+        fraction_digits += still_digits
+        if index < 6:
+            microseconds += np.where(still_digits, digits[:, FRACTION_START + index] * 10 ** (5 - index), 0)
+    valid &= ~has_fraction | (fraction_digits > 0)
+
+    # UTC designator, starting right after the seconds or the fraction
+    end = np.where(date_only, 10, np.where(has_fraction, FRACTION_START + fraction_digits, FRACTION_START - 1))
+    padded = np.pad(codes, ((0, 0), (0, 6)))
+    suffix = padded[rows[:, None], end[:, None] + np.arange(7)]
+    suffix_digits = suffix - ord("0")
+    offset_digits_ok = np.all((suffix_digits[:, [1, 2, 4, 5]] >= 0) & (suffix_digits[:, [1, 2, 4, 5]] <= 9), axis=1)
+    no_suffix = suffix[:, 0] == 0
+    zulu = (suffix[:, 0] == ord("Z")) & (suffix[:, 1] == 0)
+    offset = (np.isin(suffix[:, 0], [ord("+"), ord("-")]) & (suffix[:, 3] == ord(":")) & (suffix[:, 6] == 0)
+              & offset_digits_ok & ~date_only)
+    offset_hours = suffix_digits[:, 1] * 10 + suffix_digits[:, 2]
+    offset_minutes = suffix_digits[:, 4] * 10 + suffix_digits[:, 5]
+    offset &= (offset_hours <= 23) & (offset_minutes <= 59)
+    valid &= no_suffix | zulu | offset
+    offset_seconds = np.where(offset, (offset_hours * 3600 + offset_minutes * 60)
+                              * np.where(suffix[:, 0] == ord("-"), -1, 1), 0)
+
+    # Days since 1970-01-01 of the proleptic Gregorian calendar, counted from March so leap days come last
+    shifted_year = year - (month <= 2)
+    era = shifted_year // 400
+    year_of_era = shifted_year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = era * 146097 + day_of_era - 719468
+
+    epoch = ((days * SECONDS_PER_DAY + seconds - offset_seconds) * MICROSECONDS_PER_SECOND + microseconds)
+    return np.where(valid, epoch, 0), valid
+
+
+# Parameter : values (sequence): Datetimes as read from the files
+# Returns a list with the UTC epoch in microseconds of every value, None where the value is missing or not valid.
+# Values which are present but could not be read are counted in the log, the rows are still loaded.
+def epoch_list(values):
+
+    import numpy as np
+
+    epochs, valid = epoch_microseconds(values)
+    epochs = epochs.tolist()
+
+    # Only the rows without an epoch are looked at one by one
+    unreadable = 0
+    for index in np.flatnonzero(~valid).tolist():
+        epochs[index] = None
+        unreadable += isinstance(values[index], str) and values[index] != ""
+    if unreadable:
+        logging.warning(f"transaction_datetime could not be read for {unreadable} transactions, "
+                        f"transaction_epoch_us is left empty")
+    return epochs
+
+
+# Parameter : value (str or int): Datetime as accepted by epoch_microseconds, or an epoch in microseconds
+# Returns the UTC epoch in microseconds of the value, raises ValueError when it is not a valid datetime.
+def to_epoch(value):
+
+    if isinstance(value, int):
+        return value
+    epochs, valid = epoch_microseconds([value])
+    if not valid[0]:
+        raise ValueError(f"Invalid datetime: {value}")
+    return int(epochs[0])
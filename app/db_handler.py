@@ -1,6 +1,7 @@
 import sqlite3
 import os
 import config
+from aggregates import rebuild_aggregates
 
 db_name = config.DB_NAME
 db_path = config.DB_PATH
@@ -12,6 +13,14 @@ def setup_database():
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
     conn = sqlite3.connect(db_path)
+    apply_write_profile(conn)
+    create_tables(conn)
+    conn.close()
+
+
+# Creates the tables used by the application on the given connection (if not already created)
+def create_tables(conn):
+
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -24,18 +33,120 @@ def setup_database():
         transaction_datetime TEXT,
         exchange_rate REAL,
         legal_entity_identifier TEXT,
-        amount_eur REAL
- 
+        amount_eur REAL,
+        row_hash TEXT,
+        transaction_epoch_us INTEGER
+    );
+    ''')
+
+    # Databases created before the content hash was introduced get the new column
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(transactions)")]
+    if "row_hash" not in columns:
+        cursor.execute("ALTER TABLE transactions ADD COLUMN row_hash TEXT")
+
+    # Databases created before transaction_datetime was normalized get the UTC epoch in microseconds (datetime_epoch.py)
+    # of the rows already loaded, worked out by SQLite, which only reads the fraction of second to the millisecond
+    if "transaction_epoch_us" not in columns:
+        cursor.execute("ALTER TABLE transactions ADD COLUMN transaction_epoch_us INTEGER")
+        cursor.execute('''
+        UPDATE transactions SET transaction_epoch_us =
+            CAST(strftime('%s', transaction_datetime) AS INTEGER) * 1000000
+            + CAST(round((strftime('%f', transaction_datetime) - CAST(strftime('%S', transaction_datetime) AS INTEGER))
+                         * 1000000) AS INTEGER)
+        ''')
+
+    # One row per ingestion attempt of an input file, see ingestion_ledger.py
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ingestion_ledger (
+        id INTEGER PRIMARY KEY,
+        file_name TEXT,
+        checksum TEXT,
+        size_bytes INTEGER,
+        rows_read INTEGER,
+        rows_valid INTEGER,
+        rows_rejected INTEGER,
+        rows_inserted INTEGER,
+        rows_updated INTEGER,
+        rows_unchanged INTEGER,
+        rows_collapsed INTEGER,
+        outcome TEXT,
+        duration_seconds REAL,
+        ingested_at TEXT
+    );
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_ledger_checksum ON ingestion_ledger (checksum)")
+
+    # Ledgers created before duplicate transaction_uti were collapsed get the new column
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(ingestion_ledger)")]
+    if "rows_collapsed" not in columns:
+        cursor.execute("ALTER TABLE ingestion_ledger ADD COLUMN rows_collapsed INTEGER")
+
+    # Rows rejected by the validation, with the reason code of their first failing check, see quarantine.py.
+    # notional and exchange_rate are kept as read, so they have no declared type.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS rejected_transactions (
+        id INTEGER PRIMARY KEY,
+        file_name TEXT,
+        reason TEXT,
+        transaction_uti TEXT,
+        isin TEXT,
+        notional,
+        notional_currency TEXT,
+        transaction_type TEXT,
+        transaction_datetime TEXT,
+        exchange_rate,
+        legal_entity_identifier TEXT,
+        rejected_at TEXT
+    );
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rejected_transactions_file ON rejected_transactions (file_name)")
+
+    # Last chunk committed of the files being loaded in streaming mode, see checkpoints.py
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS load_checkpoints (
+        checksum TEXT PRIMARY KEY,
+        file_name TEXT,
+        chunks_committed INTEGER,
+        rows_read INTEGER,
+        byte_offset INTEGER,
+        updated_at TEXT
+    );
+    ''')
+
+    # Trades and sum of amount_eur per LEI, currency and trading day, kept in step with transactions, see aggregates.py
+    aggregates_exist = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transaction_aggregates'").fetchone()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS transaction_aggregates (
+        dimension TEXT,
+        key TEXT,
+        trade_count INTEGER,
+        amount_eur REAL,
+        PRIMARY KEY (dimension, key)
     );
     ''')
 
     conn.commit()
-    conn.close()
 
+    # Databases which already hold transactions get their aggregates worked out when the table is created,
+    # the upserts only add the changes on top of them
+    if not aggregates_exist and cursor.execute("SELECT EXISTS (SELECT 1 FROM transactions)").fetchone()[0]:
+        rebuild_aggregates(conn)
 
 
 def get_db_connection():
 
     conn = sqlite3.connect(db_path)
-    
+    apply_write_profile(conn)
+
     return conn
+
+
+# Applies the SQLite write profile from config to the connection
+def apply_write_profile(conn):
+
+    conn.execute(f"PRAGMA journal_mode = {config.JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous = {config.SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = {int(config.CACHE_SIZE)}")
+    conn.execute(f"PRAGMA mmap_size = {int(config.MMAP_SIZE)}")
+    conn.execute(f"PRAGMA busy_timeout = {int(config.BUSY_TIMEOUT)}")
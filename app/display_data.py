@@ -1,10 +1,13 @@
-import pandas as pd
-from tabulate import tabulate
+from query import fetch_page, transaction_columns
+
 
 # Module for displaying data in tabular form to user
-def display_transactions_pretty(conn):
+# The first page of the transactions is read with query.fetch_page, tabulate is imported when the data is displayed
+def display_transactions_pretty(conn, page_size=20):
+
+    from tabulate import tabulate
 
-    df = pd.read_sql_query("SELECT * FROM transactions Limit 20", conn)
+    rows, _ = fetch_page(conn, page_size=page_size)
 
     # Print formatted table
-    print(tabulate(df, headers='keys', tablefmt='psql'))
+    print(tabulate(rows, headers=transaction_columns, tablefmt='psql'))
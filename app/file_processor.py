@@ -2,11 +2,20 @@ import logging
 import os
 import shutil
 import re
-from transaction_processor import process_transactions
-from read_csv import read_csv
-from read_json import read_json
-from read_xml import read_xml
+import time
+import config
+from transaction_processor import process_transactions, prepare_transactions, write_transactions
+from readers import readers, get_reader
+from compression import split_file_name
+from batching import DEFAULT_CHUNK_SIZE
+from ingestion_ledger import file_checksum, is_ingested, record_ingestion
+from metrics import timed_commit
+from profiling import FileProfiler, checkpoint
+from quarantine import Quarantine, save_rejected_rows
+from split_csv import use_split_csv, load_split_csv
+from checkpoints import load_checkpoint, save_checkpoint, clear_checkpoint, skip_rows
 from datetime import datetime
+from collections import Counter, deque
 
 
 
@@ -18,16 +27,50 @@ logging.basicConfig(level=logging.INFO,
 # - input_path (str): The directory path where the  input files are located.
 # - processed_path (str): The directory path where the files will be stored after processing.
 # - error_path (str): The directory path where the files are moved in case of error.
+# - chunk_size (int): Optional, streams the files in chunks of this many rows instead of loading them whole.
+# - chunk_bytes (int): Optional, byte budget for one streamed chunk (CSV files only).
+# - workers (int): Optional, number of worker processes used to read and validate files in parallel.
+# - ledger (bool): Optional, records every file in the ingestion ledger and skips files already ingested.
+# - metrics (metrics.RunMetrics): Optional, records the stage timings and counts of every file.
+# - profile (str): Optional, profiles every file ("cprofile", "tracemalloc" or "all"), see profiling.py.
+#                  Files are then processed one by one in this process, whatever the number of workers.
+# - quarantine (str): Optional, saves the rejected rows of every file ("table" or "csv"), see quarantine.py.
+# - checkpoints (bool): Optional, in streaming mode with config.COMMIT_ROWS commits every chunk with a checkpoint
+#                       of the file and resumes an interrupted file after its last checkpoint, see checkpoints.py.
 # Step 1: Check if the path provided exist and are valid directories.
-# Step 2: Checks if files are present at the input path, and processes them one by one.
+# Step 2: Checks if files are present at the input path, and processes them one by one in order of file name.
 # Step 3: Gets the List of transactions from the each file and sends the transactions for processing.
 # Step 4: if Step 3 Success , Renames the file and moves to processed folder
 # Step 5: if step 3 Failure , Renames the file and moves to errored folder
-def process_files(input_path, errored_path, processed_path, conn):
+# Returns the list of files which were loaded, empty if there was no file to load.
+def process_files(input_path, errored_path, processed_path, conn, chunk_size=None, chunk_bytes=None, workers=None,
+                  ledger=False, metrics=None, profile=None, quarantine=None, checkpoints=False):
+    # Step 1 and 2
+    input_files = list_input_files(input_path, errored_path, processed_path)
+    if not input_files:
+        return input_files
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    if workers and workers > 1 and not profile:
+        process_files_parallel(input_files, input_path, errored_path, processed_path, conn, timestamp, workers,
+                               ledger, metrics, quarantine)
+        return input_files
+
+    for file in input_files:
+        process_file(file, input_path, errored_path, processed_path, conn, timestamp,
+                     chunk_size, chunk_bytes, ledger, metrics, profile, quarantine, checkpoints)
+    return input_files
+
+
+# Step 1: Check if the path provided exist and are valid directories, the output directories are created.
+# Step 2: Lists the files present at the input path.
+# Returns the files which can be loaded (select_input_files), or an empty list.
+def list_input_files(input_path, errored_path, processed_path):
     # Step 1
     if not os.path.isdir(input_path):
         logging.error(f"The path {input_path} is not a valid directory for Input files.")
-        return
+        return []
 
     if not os.path.isdir(processed_path):
         logging.warning(f"The path {processed_path} is not a valid directory Processed files.")
@@ -43,44 +86,349 @@ def process_files(input_path, errored_path, processed_path, conn):
     files = os.listdir(input_path)
     if not files:
         logging.info(f"No files found in {input_path}.")
-        return
+        return []
+
+    return select_input_files(files)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    for file in files:
-        name, ext = os.path.splitext(file)
+# Returns the files which can be loaded, sorted by file name, a warning is logged for the others.
+# Files are loaded in order of file name, so the final state of a transaction_uti
+# present in several files is always taken from the last file.
+def select_input_files(files):
+
+    input_files = []
+    for file in sorted(files):
+        name, ext, _ = split_file_name(file)
         pattern = r"^input_[a-zA-Z]+_[a-zA-Z]+$"
-        file_path = os.path.join(input_path, file)
+        if not re.match(pattern, name):
+            logging.warning(f"Unsupported file_name for input file : {file}")
+        elif ext not in readers:
+            logging.warning(f"Unsupported file type: {file}")
+        else:
+            input_files.append(file)
+    return input_files
+
+
+# Loads one input file, parameters are the same as for process_files.
+# Returns the outcome of the file: "processed", "errored" or "skipped" (already in the ingestion ledger).
+# With 'profile' the load is profiled and the report is written next to the processed or errored file,
+# as <processed or errored file name>.profile.txt.
+# CSV and NDJSON files of at least config.SPLIT_CSV_MIN_BYTES are parsed in config.WORKERS processes (split_csv.py).
+def process_file(file, input_path, errored_path, processed_path, conn, timestamp,
+                 chunk_size=None, chunk_bytes=None, ledger=False, metrics=None, profile=None, quarantine=None,
+                 checkpoints=False):
+
+    if profile:
+        with FileProfiler(profile) as profiler:
+            outcome = process_file(file, input_path, errored_path, processed_path, conn, timestamp,
+                                   chunk_size, chunk_bytes, ledger, metrics, quarantine=quarantine,
+                                   checkpoints=checkpoints)
+        name, ext, compression = split_file_name(file)
+        prefix, output_path = ("errored", errored_path) if outcome == "errored" else ("processed", processed_path)
         try:
-            if re.match(pattern, name):
-                if ext == ".csv":
-                    transactions = read_csv(file_path)
-                elif ext == ".json":
-                    transactions = read_json(file_path)
-                elif ext == ".xml":
-                    transactions = read_xml(file_path)
-                else:
-                    logging.warning(f"Unsupported file type: {file}")
-                    continue
-                logging.info("File read complete. Starting transaction processing...")
-                
-                # Step 3
-                if transactions:
-                    process_transactions(transactions, conn)
-
-                # Step 4
-                new_file_name = f"processed_{name}_{timestamp}{ext}"
-                shutil.move(file_path, os.path.join(
-                    processed_path, new_file_name))
-                logging.info(f"File: {file} processed successfully and moved to {processed_path} folder")
+            profiler.write_report(os.path.join(output_path, f"{prefix}_{name}_{timestamp}{ext}{compression}.profile.txt"),
+                                  file, outcome)
+        except OSError as e:
+            logging.error(f"Error writing profile of {file}: {e}")
+        return outcome
+
+    ext = split_file_name(file)[1]
+    file_path = os.path.join(input_path, file)
+    start_time = time.perf_counter()
+    file_stats = Counter()
+    quarantined = Quarantine(quarantine)
+    checksum = size_bytes = None
+    try:
+        if ledger:
+            size_bytes = os.path.getsize(file_path)
+            checksum = file_checksum(file_path)
+            if is_ingested(conn, checksum):
+                skip_ingested_file(file, input_path, processed_path, conn, timestamp, checksum, size_bytes,
+                                   start_time, metrics)
+                return "skipped"
 
+        # The readers go through the whole file, so the bytes read are the size of the file
+        if metrics:
+            file_stats["bytes_read"] = size_bytes or os.path.getsize(file_path)
+        read_start = time.perf_counter()
+
+        if use_split_csv(file_path, ext):
+            # Large CSV or NDJSON file parsed in config.WORKERS processes, written in file order and committed once
+            split_stats, rejected_rows = load_split_csv(file_path, conn, config.WORKERS, quarantine, ext=ext)
+            file_stats.update(split_stats)
+            save_rejected_rows(conn, file, rejected_rows, quarantine, processed_path, timestamp)
+            commit_seconds = timed_commit(conn)
+            file_stats.update({"commits": 1, "commit_seconds": commit_seconds})
+            file_stats["write_seconds"] += commit_seconds
+            transactions = None
+        elif chunk_size or chunk_bytes:
+            # Streaming mode, each chunk is validated and written as soon as it is read
+            if checkpoints and config.COMMIT_ROWS:
+                # Every chunk is committed with the checkpoint of the file, the last commit removes the checkpoint
+                checksum = checksum or file_checksum(file_path)
+                file_stats.update(process_checkpointed_chunks(file, file_path, ext, conn, checksum, chunk_size,
+                                                              chunk_bytes, quarantined, processed_path, timestamp))
+                clear_checkpoint(conn, checksum)
             else:
-                logging.warning(f"Unsupported file_name for input file : {file}")
+                chunks = read_chunks(file_path, ext, chunk_size, chunk_bytes)
+                # Without config.COMMIT_ROWS the chunks are committed together once the whole file is read
+                for chunk in chunks:
+                    with quarantined:
+                        file_stats.update(process_transactions(chunk, conn, commit=bool(config.COMMIT_ROWS)))
+            save_rejected_rows(conn, file, quarantined.rows, quarantine, processed_path, timestamp)
+            commit_seconds = timed_commit(conn)
+            file_stats.update({"commits": 1, "commit_seconds": commit_seconds, "write_seconds": commit_seconds})
+            # Reading is what remains of the loop once validating and writing the chunks is taken out
+            file_stats["read_seconds"] = (time.perf_counter() - read_start - file_stats["validate_seconds"]
+                                          - file_stats["write_seconds"])
+            transactions = None
+        else:
+            transactions = read_file(file_path, ext)
+            file_stats["read_seconds"] = time.perf_counter() - read_start
+            checkpoint("read")
+        logging.info("File read complete. Starting transaction processing...")
+
+        # Step 3
+        if transactions:
+            with quarantined:
+                file_stats.update(process_transactions(transactions, conn, commit=False))
+            # The rejected rows are committed with the rows of the file
+            save_rejected_rows(conn, file, quarantined.rows, quarantine, processed_path, timestamp)
+            commit_seconds = timed_commit(conn)
+            file_stats.update({"commits": 1, "commit_seconds": commit_seconds, "write_seconds": commit_seconds})
+
+        # Step 4
+        move_start = time.perf_counter()
+        move_processed_file(file, input_path, processed_path, timestamp)
+        file_stats["move_seconds"] = time.perf_counter() - move_start
+        outcome = "processed"
+
+    except Exception as e:
+        logging.error(e)
+        conn.rollback()
+
+        # Step 5
+        move_start = time.perf_counter()
+        move_errored_file(file, input_path, errored_path, timestamp)
+        file_stats["move_seconds"] = time.perf_counter() - move_start
+        outcome = "errored"
+
+    duration = time.perf_counter() - start_time
+    if ledger and checksum:
+        record_ingestion(conn, file, checksum, size_bytes, file_stats, outcome, duration)
+    if metrics:
+        metrics.record_file(file, outcome, file_stats, duration)
+    return outcome
+
+
+# Reads the whole file with the reader registered for its extension (readers.py) and returns the transactions
+def read_file(file_path, ext):
+
+    return get_reader(ext).read(file_path)
+
+
+# Reads the file incrementally with the chunk reader registered for its extension and returns the iterator of chunks.
+# Readers which do not take a byte budget read chunks of DEFAULT_CHUNK_SIZE rows when no chunk size is given.
+def read_chunks(file_path, ext, chunk_size=None, chunk_bytes=None):
+
+    reader = get_reader(ext)
+    if reader.chunk_bytes:
+        return reader.read_chunks(file_path, chunk_size, chunk_bytes)
+    return reader.read_chunks(file_path, chunk_size or DEFAULT_CHUNK_SIZE)
+
+
+# Parameters:
+# - file (str), file_path (str), ext (str): Name, path and extension of the file
+# - checksum (str): Checksum of the file, the key of its checkpoint
+# - chunk_size, chunk_bytes: Same as for process_files
+# - quarantined (quarantine.Quarantine): Quarantine of the file
+# Streams the file in chunks and commits every chunk with the checkpoint of the file (checkpoints.py),
+# starting after the last checkpoint when an earlier load of the file was interrupted. In "table" mode the
+# rejected rows of a chunk are committed with it, otherwise they are left in the quarantine for the caller.
+# Returns the processing stats of the chunks loaded.
+def process_checkpointed_chunks(file, file_path, ext, conn, checksum, chunk_size, chunk_bytes, quarantined,
+                                processed_path, timestamp):
+
+    chunks_committed, rows_read, byte_offset = load_checkpoint(conn, checksum) or (0, 0, None)
+    if chunks_committed:
+        logging.info(f"Resuming {file} after {chunks_committed} chunks and {rows_read} rows already committed")
+    reader = get_reader(ext)
+    if reader.read_chunk_offsets:
+        chunks = reader.read_chunk_offsets(file_path, chunk_size, chunk_bytes, byte_offset)
+    else:
+        chunks = ((chunk, None) for chunk in skip_rows(read_chunks(file_path, ext, chunk_size, chunk_bytes), rows_read))
+
+    file_stats = Counter()
+    for chunk, byte_offset in chunks:
+        with quarantined:
+            file_stats.update(process_transactions(chunk, conn, commit=False))
+        if quarantined.mode == "table":
+            save_rejected_rows(conn, file, quarantined.rows, quarantined.mode, processed_path, timestamp)
+            quarantined.rows.clear()
+        chunks_committed += 1
+        rows_read += len(chunk)
+        save_checkpoint(conn, checksum, file, chunks_committed, rows_read, byte_offset)
+        commit_seconds = timed_commit(conn)
+        file_stats.update({"commits": 1, "commit_seconds": commit_seconds, "write_seconds": commit_seconds})
+    return file_stats
+
+
+# Moves a file already in the ingestion ledger to processed without loading it,
+# and records it as skipped in the ledger and the metrics
+def skip_ingested_file(file, input_path, processed_path, conn, timestamp, checksum, size_bytes, start_time, metrics):
+
+    logging.info(f"File {file} was already ingested, skipping it.")
+    move_processed_file(file, input_path, processed_path, timestamp)
+    duration = time.perf_counter() - start_time
+    record_ingestion(conn, file, checksum, size_bytes, {}, "skipped", duration)
+    if metrics:
+        metrics.record_file(file, "skipped", {}, duration)
+
+
+# Renames the file and moves it to processed folder
+def move_processed_file(file, input_path, processed_path, timestamp):
+
+    name, ext, compression = split_file_name(file)
+    new_file_name = f"processed_{name}_{timestamp}{ext}{compression}"
+    shutil.move(os.path.join(input_path, file), os.path.join(
+        processed_path, new_file_name))
+    logging.info(f"File: {file} processed successfully and moved to {processed_path} folder")
+
+
+# Renames the file and moves it to errored folder
+def move_errored_file(file, input_path, errored_path, timestamp):
+
+    name, ext, compression = split_file_name(file)
+    new_file_name = f"errored_{name}_{timestamp}{ext}{compression}"
+    shutil.move(os.path.join(input_path, file), os.path.join(errored_path, new_file_name))
+    logging.info(f"File {file} moved to errored folder.")
+
+
+# Runs in a worker process: reads and validates one file.
+# Returns rows ready for the transaction table, the counts of rows read, valid and rejected,
+# the seconds spent reading and validating in the worker, and the rejected rows to quarantine.
+def parse_file(file_path, ext, quarantine=None):
+
+    start_time = time.perf_counter()
+    transactions = read_file(file_path, ext)
+    read_seconds = time.perf_counter() - start_time
+    logging.info(f"File read complete: {file_path}")
+    start_time = time.perf_counter()
+    with Quarantine(quarantine) as quarantined:
+        transactions_list = prepare_transactions(transactions) if transactions else []
+    stats = {"read": len(transactions), "valid": len(transactions_list),
+             "rejected": len(transactions) - len(transactions_list),
+             "bytes_read": os.path.getsize(file_path), "read_seconds": read_seconds,
+             "validate_seconds": time.perf_counter() - start_time}
+    return transactions_list, stats, quarantined.rows
+
+
+# Parameters:
+# - input_files (list): Files to be loaded, sorted by file name
+# - workers (int): Number of worker processes
+# - ledger (bool): Records every file in the ingestion ledger and skips files already ingested
+# - metrics (metrics.RunMetrics): Optional, records the stage timings and counts of every file
+# - quarantine (str): Optional, saves the rejected rows of every file ("table" or "csv")
+# Files are read and validated in a process pool, the validated rows are written by this process only,
+# which is the single writer to the SQLite database. Rows are written in the order of input_files
+# whichever worker finishes first, at most 2 files per worker are held in memory waiting to be written.
+# Checksums for the ledger are computed here before a file is submitted, so files already
+# ingested are never sent to the workers.
+# CSV and NDJSON files of at least config.SPLIT_CSV_MIN_BYTES are split into byte ranges parsed by the same pool
+# when their turn comes (split_csv.py), instead of being parsed by a single worker.
+def process_files_parallel(input_files, input_path, errored_path, processed_path, conn, timestamp, workers,
+                           ledger=False, metrics=None, quarantine=None):
+
+    # Imported here so runs without workers do not load multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    pending = deque()
+    files = iter(input_files)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+
+        # Submits the next file to the pool, returns False once all files are submitted
+        def submit_next():
+            for file in files:
+                file_path = os.path.join(input_path, file)
+                start_time = time.perf_counter()
+                checksum = size_bytes = None
+                try:
+                    if ledger:
+                        size_bytes = os.path.getsize(file_path)
+                        checksum = file_checksum(file_path)
+                        if is_ingested(conn, checksum):
+                            skip_ingested_file(file, input_path, processed_path, conn, timestamp, checksum,
+                                               size_bytes, start_time, metrics)
+                            continue
+                except OSError as e:
+                    logging.error(e)
+                    move_errored_file(file, input_path, errored_path, timestamp)
+                    if metrics:
+                        metrics.record_file(file, "errored", {}, time.perf_counter() - start_time)
+                    continue
+
+                ext = split_file_name(file)[1]
+                future = None if use_split_csv(file_path, ext) else executor.submit(parse_file, file_path, ext,
+                                                                                      quarantine)
+                pending.append((file, future, checksum, size_bytes, start_time))
+                return True
+            return False
+
+        while len(pending) < workers * 2 and submit_next():
+            pass
+
+        while pending:
+            file, future, checksum, size_bytes, start_time = pending.popleft()
+            submit_next()
+            # Checked again by the writer: an identical file earlier in the run may have been loaded
+            # after this one was submitted, the result of its worker is then dropped
+            if ledger and checksum and is_ingested(conn, checksum):
+                skip_ingested_file(file, input_path, processed_path, conn, timestamp, checksum, size_bytes,
+                                   start_time, metrics)
+                continue
+            file_stats = Counter()
+            try:
+                if future is None:
+                    # Large CSV or NDJSON file, its ranges are parsed by the pool and written in file order
+                    file_path = os.path.join(input_path, file)
+                    split_stats, rejected_rows = load_split_csv(file_path, conn, workers, quarantine, executor,
+                                                                split_file_name(file)[1])
+                    file_stats.update(split_stats)
+                    file_stats["bytes_read"] = os.path.getsize(file_path)
+                    save_rejected_rows(conn, file, rejected_rows, quarantine, processed_path, timestamp)
+                    commit_seconds = timed_commit(conn)
+                    file_stats.update({"commits": 1, "commit_seconds": commit_seconds, "write_seconds": commit_seconds})
+                else:
+                    transactions_list, stats, rejected_rows = future.result()
+                    file_stats.update(stats)
+
+                    if transactions_list:
+                        write_start = time.perf_counter()
+                        file_stats.update(write_transactions(transactions_list, conn, commit=False))
+                        file_stats["write_seconds"] = time.perf_counter() - write_start
+                    else:
+                        logging.info("No valid transactions to process.")
+                    # The rejected rows are committed with the rows of the file
+                    save_rejected_rows(conn, file, rejected_rows, quarantine, processed_path, timestamp)
+                    commit_seconds = timed_commit(conn)
+                    file_stats.update({"commits": 1, "commit_seconds": commit_seconds, "write_seconds": commit_seconds})
+
+                move_start = time.perf_counter()
+                move_processed_file(file, input_path, processed_path, timestamp)
+                file_stats["move_seconds"] = time.perf_counter() - move_start
+                outcome = "processed"
 
-        except Exception as e:
-            logging.error(e)
+            except Exception as e:
+                logging.error(e)
+                conn.rollback()
+                move_start = time.perf_counter()
+                move_errored_file(file, input_path, errored_path, timestamp)
+                file_stats["move_seconds"] = time.perf_counter() - move_start
+                outcome = "errored"
 
-            # Step 5
-            new_file_name = f"errored_{name}_{timestamp}{ext}"
-            shutil.move(file_path, os.path.join(errored_path, new_file_name))
-            logging.info(f"File {file} moved to errored folder.")
+            duration = time.perf_counter() - start_time
+            if ledger and checksum:
+                record_ingestion(conn, file, checksum, size_bytes, file_stats, outcome, duration)
+            if metrics:
+                metrics.record_file(file, outcome, file_stats, duration)
@@ -0,0 +1,102 @@
+from functools import cache
+
+# Check digit validation of the instrument (ISIN, ISO 6166) and legal entity (LEI, ISO 17442) identifiers.
+# Both checks work on whole columns with numpy: the identifiers are copied into one array of character codes
+# per character position, and every step is a table lookup or an arithmetic operation over all the rows at once.
+# The only Python loops are over the 12 (ISIN) or 20 (LEI) character positions, never over the rows.
+# numpy is imported inside the functions, like pandas in transaction_processor, so importing this module is free.
+
+ISIN_LENGTH = 12
+LEI_LENGTH = 20
+
+# Non ASCII characters are looked up as DEL (127), which is neither a letter nor a digit
+ASCII_LIMIT = 127
+
+
+# Returns the lookup tables indexed by ASCII code, built once on first use:
+# - digit, letter, alphanumeric: whether the character is 0-9, A-Z, or either
+# - value: 0-9 for digits, 10-35 for letters A-Z
+# - luhn: Luhn sum of the digits of the character, [0] when its last digit is not doubled, [1] when it is
+# - luhn_flip: 1 for digits, 0 for letters; letters stand for two digits so they keep the doubling parity
+# - shift: 10 for digits, 100 for letters, to append the character to a number
+@cache
+def lookup_tables():
+
+    import numpy as np
+
+    codes = np.arange(ASCII_LIMIT + 1)
+    digit = (codes >= ord("0")) & (codes <= ord("9"))
+    letter = (codes >= ord("A")) & (codes <= ord("Z"))
+    value = np.where(digit, codes - ord("0"), np.where(letter, codes - ord("A") + 10, 0))
+
+    def luhn_weight(number, doubled):
+        weighted = number * (1 + doubled)
+        return weighted - 9 * (weighted > 9)
+
+    # A letter is two digits, its high digit has the opposite doubling of its low digit (0 for digits)
+    luhn = np.array([luhn_weight(value % 10, doubled) + luhn_weight(value // 10, 1 - doubled)
+                     for doubled in (0, 1)], dtype=np.int32)
+
+    return {"digit": digit, "letter": letter, "alphanumeric": digit | letter, "value": value.astype(np.int32),
+            "luhn": luhn, "luhn_flip": digit.astype(np.int32), "shift": np.where(letter, 100, 10).astype(np.int32)}
+
+
+# Parameters:
+# - values (sequence): Identifiers read from the file, may hold None or NaN
+# - length (int): Length of a valid identifier
+# Returns the ASCII codes of the characters as an array of shape (length, rows), one contiguous row per
+# character position, and whether every value has exactly 'length' characters.
+# Missing values are converted to 'None' / 'nan' and fail the length check.
+def character_codes(values, length):
+
+    import numpy as np
+
+    # One extra character is kept so that longer values are not truncated to a valid length
+    text = np.asarray(values, dtype=object).astype(f"U{length + 1}")
+    codes = text.view(np.uint32).reshape(len(text), length + 1)
+    right_length = (codes[:, length - 1] != 0) & (codes[:, length] == 0)
+    positions = np.minimum(codes[:, :length], ASCII_LIMIT).astype(np.uint8).T.copy()
+    return positions, right_length
+
+
+# Parameter : values (sequence): ISINs of the transactions
+# Returns a numpy array of booleans, True where the ISIN is 2 letters, 9 letters or digits and a check digit
+# and passes the Luhn check, letters counting as the two digits of their value (A = 10 ... Z = 35).
+def valid_isins(values):
+
+    import numpy as np
+
+    tables = lookup_tables()
+    positions, valid = character_codes(values, ISIN_LENGTH)
+    valid &= tables["letter"][positions[0]] & tables["letter"][positions[1]] & tables["digit"][positions[-1]]
+
+    # Luhn check from the right: the check digit is not doubled, then every second digit is
+    total = np.zeros(len(valid), dtype=np.int32)
+    doubled = np.zeros(len(valid), dtype=np.int32)
+    for column in positions[::-1]:
+        valid &= tables["alphanumeric"][column]
+        total += tables["luhn"][doubled, column]
+        doubled ^= tables["luhn_flip"][column]
+
+    return valid & (total % 10 == 0)
+
+
+# Parameter : values (sequence): LEIs of the transactions
+# Returns a numpy array of booleans, True where the LEI is 18 letters or digits and 2 check digits
+# and the whole code, letters counting as two digits (A = 10 ... Z = 35), is 1 modulo 97 (ISO 7064 MOD 97-10).
+def valid_leis(values):
+
+    import numpy as np
+
+    tables = lookup_tables()
+    positions, valid = character_codes(values, LEI_LENGTH)
+    valid &= tables["digit"][positions[-2]] & tables["digit"][positions[-1]]
+
+    # Remainder modulo 97 of the number read so far, one character position at a time
+    remainder = np.zeros(len(valid), dtype=np.int32)
+    for column in positions:
+        valid &= tables["alphanumeric"][column]
+        remainder = (remainder * tables["shift"][column] + tables["value"][column]) % 97
+
+    return valid & (remainder == 1)
+
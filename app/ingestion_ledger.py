@@ -0,0 +1,48 @@
+import hashlib
+import logging
+from datetime import datetime
+
+# Ledger of the ingested input files, stored in the ingestion_ledger table (see db_handler.create_tables).
+# Every file gets one row per attempt with its checksum, size, row counts, outcome and duration.
+# A file whose checksum was already processed successfully is not loaded again.
+
+
+# Parameter : file_path (str): Input directory and filename
+# Returns the sha256 checksum of the file, read in blocks so big files are not loaded in memory.
+def file_checksum(file_path, block_size=1 << 20):
+
+    checksum = hashlib.sha256()
+    with open(file_path, "rb") as input_file:
+        while block := input_file.read(block_size):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+# Returns True if a file with the checksum was already processed successfully
+def is_ingested(conn, checksum):
+
+    cursor = conn.execute(
+        "SELECT 1 FROM ingestion_ledger WHERE checksum = ? AND outcome = 'processed' LIMIT 1", (checksum,))
+    return cursor.fetchone() is not None
+
+
+# Parameters:
+# - file_name (str): Name of the input file
+# - checksum (str): Checksum returned by file_checksum
+# - size_bytes (int): Size of the input file
+# - stats (dict): Row counts returned by process_transactions, summed over the file
+# - outcome (str): "processed", "errored" or "skipped" (already ingested)
+# - duration (float): Seconds spent on the file
+# Records one ingestion attempt in the ledger and commits it.
+def record_ingestion(conn, file_name, checksum, size_bytes, stats, outcome, duration):
+
+    conn.execute("""
+        INSERT INTO ingestion_ledger (file_name, checksum, size_bytes, rows_read, rows_valid, rows_rejected,
+        rows_inserted, rows_updated, rows_unchanged, rows_collapsed, outcome, duration_seconds, ingested_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (file_name, checksum, size_bytes, stats.get("read", 0), stats.get("valid", 0), stats.get("rejected", 0),
+          stats.get("inserted", 0), stats.get("updated", 0), stats.get("unchanged", 0), stats.get("collapsed", 0),
+          outcome, round(duration, 6), datetime.now().isoformat(timespec="seconds")))
+    conn.commit()
+    logging.info(f"File {file_name} recorded in ingestion ledger with outcome {outcome}")
+
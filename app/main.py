@@ -1,38 +1,115 @@
+import os
+import sys
 import config
 import logging
+import signal
 import sqlite3
+import argparse
+import threading
 from datetime import datetime
 from db_handler import setup_database, get_db_connection
 from display_data import display_transactions_pretty
-from file_processor import process_files
+from metrics import RunMetrics
+from profiling import PROFILE_MODES
 
 
 # The main entry point of the script.
 # This function is responsible for initializing the program.
 # Step 1: Create the database and table (if not already created)
+#         With --rebuild-aggregates or --check-aggregates the aggregates (see aggregates.py) are rebuilt
+#         or checked against a full recompute, and no file is loaded. The check exits with 1 when they differ.
 # Step 2: Process the files for loading into database
-# Step 3: Display the data after loading it
+#         With --watch the input directory is watched and files are loaded as they arrive,
+#         until the process receives SIGINT or SIGTERM.
+#         With config.ASYNC_PIPELINE the files are loaded through the asyncio pipeline (async_pipeline.py).
+#         With --profile every file is profiled with cProfile and/or tracemalloc (see profiling.py).
+# Step 3: Display the data after loading it, the display is skipped when no file was loaded
+# The loader (file_processor and the modules it imports), the watcher, the indexes and the aggregates are only
+# imported in the steps using them, so a run with an empty input directory starts fast.
+# The metrics of every file and of the run are written to config.METRICS_JSONL_PATH and config.METRICS_PROMETHEUS_PATH.
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load transaction files into the reporting database.")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and load new files from the input directory as they arrive")
+    parser.add_argument("--profile", choices=PROFILE_MODES,
+                        help="profile every file and write a report next to the processed or errored file")
+    parser.add_argument("--rebuild-aggregates", action="store_true",
+                        help="rebuild the aggregates per LEI, currency and day from the transactions table and exit")
+    parser.add_argument("--check-aggregates", action="store_true",
+                        help="compare the aggregates with a full recompute from the transactions table and exit")
+    args = parser.parse_args(argv)
+
+    # Logging is set up as file_processor does, before it is imported
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def main():
     # Step 1:
     setup_database()
+    if args.rebuild_aggregates or args.check_aggregates:
+        from aggregates import rebuild_aggregates, check_aggregates
+        conn = get_db_connection()
+        try:
+            if args.rebuild_aggregates:
+                rebuild_aggregates(conn)
+            if args.check_aggregates:
+                differences = check_aggregates(conn)
+                for dimension, key, stored, expected in differences:
+                    logging.warning(f"Aggregate {dimension} {key!r}: stored {stored}, recomputed {expected}")
+                return 1 if differences else 0
+        finally:
+            conn.close()
+        return 0
 
     input_path = config.INPUT_PATH
     errored_path = config.ERROR_PATH
     processed_path = config.PROCESSED_PATH
+    metrics = RunMetrics(config.METRICS_JSONL_PATH, config.METRICS_PROMETHEUS_PATH)
+    options = {"chunk_size": config.CHUNK_SIZE, "chunk_bytes": config.CHUNK_BYTES,
+               "ledger": config.INGESTION_LEDGER, "metrics": metrics, "profile": args.profile,
+               "quarantine": config.QUARANTINE, "checkpoints": config.LOAD_CHECKPOINTS}
+    conn = None
     try:
         conn = get_db_connection()
         # Step 2:
-        process_files(input_path, errored_path, processed_path, conn)
+        if args.watch:
+            from watcher import watch_directory
+            stop_event = threading.Event()
+            for signal_number in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signal_number, lambda signum, frame: stop_event.set())
+            watch_directory(input_path, errored_path, processed_path, conn,
+                            poll_interval=config.WATCH_POLL_INTERVAL, settle_seconds=config.WATCH_SETTLE_SECONDS,
+                            stop_event=stop_event, **options)
+            return
+
+        if os.path.isdir(input_path) and not os.listdir(input_path):
+            # Nothing to load, the loader is not imported
+            logging.info(f"No files found in {input_path}.")
+            loaded_files = []
+        elif config.ASYNC_PIPELINE and not args.profile:
+            # asyncio is only imported when the pipeline is used
+            from async_pipeline import process_files_async
+            loaded_files = process_files_async(input_path, errored_path, processed_path, conn, config.CHUNK_SIZE,
+                                               config.CHUNK_BYTES, config.WORKERS, config.PIPELINE_QUEUE_SIZE,
+                                               config.INGESTION_LEDGER, metrics, config.QUARANTINE)
+        else:
+            from file_processor import process_files
+            loaded_files = process_files(input_path, errored_path, processed_path, conn, workers=config.WORKERS,
+                                         **options)
 
-        # Step 3:
-        display_transactions_pretty(conn)
+        # Step 3: (skipped when there was no file to load, so an empty run does not import tabulate)
+        # The secondary indexes are built once the files are loaded, outside the load transactions
+        if loaded_files:
+            from query import create_indexes
+            create_indexes(conn)
+            display_transactions_pretty(conn)
     except sqlite3.Error as e:
         logging.error(f"Error connecting to database: {e}")
 
     finally:
-        conn.close()
+        metrics.finish()
+        if conn is not None:
+            conn.close()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import logging
+from collections import Counter
+from datetime import datetime
+
+# Run metrics of the loader: per stage durations, row counts, bytes read and commit latency of every file.
+# The stats returned by transaction_processor.process_transactions carry the row counts and the
+# validate/write/commit timings, file_processor adds the read and move timings and the bytes read.
+# Every file is exported as one JSON line, and the totals of the run as a Prometheus text format file
+# which can be collected by the node_exporter textfile collector.
+
+# Prefix of the Prometheus metric names
+METRIC_PREFIX = "cdp"
+
+row_counts = ["read", "valid", "rejected", "collapsed", "inserted", "updated", "unchanged"]
+stages = ["read", "validate", "write", "commit", "move"]
+outcomes = ["processed", "errored", "skipped"]
+
+
+# Commits the connection and returns the seconds the commit took
+def timed_commit(conn):
+
+    start = time.perf_counter()
+    conn.commit()
+    return time.perf_counter() - start
+
+
+# Parameters:
+# - jsonl_path (str): File the JSON lines are appended to, None disables them
+# - prometheus_path (str): Prometheus text format file, rewritten after every file, None disables it
+# Collects the metrics of the files loaded by one run of the application (or one watch session).
+class RunMetrics:
+
+    def __init__(self, jsonl_path=None, prometheus_path=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.started_at = time.time()
+        self.start_time = time.perf_counter()
+        self.totals = Counter()
+        self.files = Counter()
+
+    # Parameters:
+    # - file (str): Name of the input file
+    # - outcome (str): "processed", "errored" or "skipped"
+    # - stats (dict): Counts and timings of the file, summed over its chunks
+    # - duration (float): Seconds spent on the file
+    # Records the file, appends its JSON line and rewrites the Prometheus file. Returns the record.
+    def record_file(self, file, outcome, stats, duration):
+
+        self.files[outcome] += 1
+        self.totals.update({key: value for key, value in stats.items() if isinstance(value, (int, float))})
+        self.totals["duration_seconds"] += duration
+
+        record = {
+            "type": "file",
+            "file": file,
+            "outcome": outcome,
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "duration_seconds": round(duration, 6),
+            "bytes_read": stats.get("bytes_read", 0),
+            "rows": {count: stats.get(count, 0) for count in row_counts},
+            "stage_seconds": {stage: round(stats.get(f"{stage}_seconds", 0.0), 6) for stage in stages},
+            "commits": stats.get("commits", 0),
+        }
+        self.append(record)
+        self.write_prometheus()
+        return record
+
+    # Appends the summary of the run to the JSON lines and rewrites the Prometheus file. Returns the summary.
+    def finish(self):
+
+        summary = {
+            "type": "run",
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+            "duration_seconds": round(time.perf_counter() - self.start_time, 6),
+            "files": {outcome: self.files[outcome] for outcome in outcomes},
+            "bytes_read": self.totals["bytes_read"],
+            "rows": {count: self.totals[count] for count in row_counts},
+            "stage_seconds": {stage: round(self.totals[f"{stage}_seconds"], 6) for stage in stages},
+            "commits": self.totals["commits"],
+        }
+        self.append(summary)
+        self.write_prometheus()
+        logging.info(f"Run metrics: {summary['files']} files, rows {summary['rows']}")
+        return summary
+
+    # Appends one record to the JSON lines file
+    def append(self, record):
+
+        if not self.jsonl_path:
+            return
+        os.makedirs(os.path.dirname(self.jsonl_path) or ".", exist_ok=True)
+        with open(self.jsonl_path, "a", encoding="utf-8") as jsonl_file:
+            jsonl_file.write(json.dumps(record) + "\n")
+
+    # Returns the totals of the run in the Prometheus text exposition format
+    def prometheus_text(self):
+
+        metrics = [
+            ("files_total", "counter", "Input files handled, by outcome.",
+             [(f'outcome="{outcome}"', self.files[outcome]) for outcome in outcomes]),
+            ("rows_total", "counter", "Transactions read from file, valid, rejected and written, by kind.",
+             [(f'kind="{count}"', self.totals[count]) for count in row_counts]),
+            ("stage_seconds_total", "counter", "Seconds spent in every stage of the load, commit is part of write.",
+             [(f'stage="{stage}"', self.totals[f"{stage}_seconds"]) for stage in stages]),
+            ("bytes_read_total", "counter", "Bytes of input files read.", [("", self.totals["bytes_read"])]),
+            ("commits_total", "counter", "Database commits of transaction rows.", [("", self.totals["commits"])]),
+            ("file_duration_seconds_total", "counter", "Seconds spent on input files.",
+             [("", self.totals["duration_seconds"])]),
+            ("run_start_timestamp_seconds", "gauge", "Unix time the run started.", [("", self.started_at)]),
+            ("last_update_timestamp_seconds", "gauge", "Unix time the metrics were last written.",
+             [("", time.time())]),
+        ]
+
+        lines = []
+        for name, metric_type, help_text, samples in metrics:
+            full_name = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{full_name}{{{labels}}} {value}" if labels else f"{full_name} {value}")
+        return "\n".join(lines) + "\n"
+
+    # Rewrites the Prometheus file through a temporary file, so a collector never reads it half written
+    def write_prometheus(self):
+
+        if not self.prometheus_path:
+            return
+        os.makedirs(os.path.dirname(self.prometheus_path) or ".", exist_ok=True)
+        temporary_path = self.prometheus_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as prometheus_file:
+            prometheus_file.write(self.prometheus_text())
+        os.replace(temporary_path, self.prometheus_path)
@@ -0,0 +1,130 @@
+import io
+import time
+import logging
+from datetime import datetime
+
+# Opt-in profiling of the load of one input file (python3 app/main.py --profile cprofile|tracemalloc|all).
+# "cprofile" - top functions by cumulative time, with cProfile.
+# "tracemalloc" - peak memory, traced memory at the checkpoints of the load (read, validate, write),
+#                 and the top allocation sites at the checkpoint holding the most memory.
+# "all" - both of them, the timings are then inflated by tracemalloc.
+# The report is written as a text file next to the processed or errored file.
+
+PROFILE_MODES = ("cprofile", "tracemalloc", "all")
+
+# Number of functions and allocation sites listed in the report
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 15
+
+# Profiler of the file being loaded, checkpoint() does nothing when no file is profiled
+active_profiler = None
+
+
+# Records a checkpoint of the load of the file being profiled, eg. once the file is read
+def checkpoint(label):
+
+    if active_profiler is not None:
+        active_profiler.checkpoint(label)
+
+
+# Parameter : mode (str): One of PROFILE_MODES
+# Profiles the code run inside 'with FileProfiler(mode):', then report() returns the text of the report.
+class FileProfiler:
+
+    def __init__(self, mode):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unsupported profile mode: {mode}")
+        self.cpu = mode in ("cprofile", "all")
+        self.memory = mode in ("tracemalloc", "all")
+        # cProfile, pstats and tracemalloc are only imported when a file is profiled
+        if self.cpu:
+            import cProfile
+            self.profile = cProfile.Profile()
+        else:
+            self.profile = None
+        if self.memory:
+            import tracemalloc
+            self.tracemalloc = tracemalloc
+        else:
+            self.tracemalloc = None
+        self.checkpoints = {}
+        self.snapshot = None
+        self.snapshot_label = None
+        self.snapshot_size = -1
+        self.peak = 0
+        self.seconds = 0.0
+
+    def __enter__(self):
+        global active_profiler
+        active_profiler = self
+        if self.memory:
+            self.tracemalloc.start()
+        self.start_time = time.perf_counter()
+        if self.cpu:
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        global active_profiler
+        self.seconds = time.perf_counter() - self.start_time
+        if self.memory:
+            self.checkpoint("end")
+            self.peak = self.tracemalloc.get_traced_memory()[1]
+            self.tracemalloc.stop()
+        if self.cpu:
+            self.profile.disable()
+        active_profiler = None
+
+    # Records the traced memory, the allocation sites are kept for the checkpoint holding the most memory.
+    # A label reached several times (eg. once per chunk) keeps its highest traced memory.
+    def checkpoint(self, label):
+
+        if not self.memory:
+            return
+        # The checkpoint itself is left out of the CPU profile
+        if self.cpu:
+            self.profile.disable()
+        current, peak = self.tracemalloc.get_traced_memory()
+        count, highest, _ = self.checkpoints.get(label, (0, 0, 0))
+        self.checkpoints[label] = (count + 1, max(highest, current), peak)
+        if current > self.snapshot_size:
+            self.snapshot = self.tracemalloc.take_snapshot()
+            self.snapshot_label = label
+            self.snapshot_size = current
+        if self.cpu:
+            self.profile.enable()
+
+    # Returns the report of the profiled file as text
+    def report(self, file, outcome):
+
+        lines = [f"Profile of {file} ({outcome}) - {datetime.now().isoformat(timespec='seconds')}",
+                 f"Wall time: {self.seconds:.3f} s", ""]
+
+        if self.memory:
+            lines.append("Memory (tracemalloc)")
+            lines.append(f"Peak traced memory: {self.peak / 2**20:.1f} MB")
+            lines.append(f"{'checkpoint':<12} {'count':>7} {'current MB':>11} {'peak MB':>9}")
+            for label, (count, current, peak) in self.checkpoints.items():
+                lines.append(f"{label:<12} {count:>7} {current / 2**20:>11.1f} {peak / 2**20:>9.1f}")
+            lines.append("")
+            lines.append(f"Top {TOP_ALLOCATIONS} allocation sites at checkpoint '{self.snapshot_label}':")
+            for stat in self.snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                frame = stat.traceback[0]
+                lines.append(f"{stat.size / 2**20:>9.2f} MB {stat.count:>10} blocks  {frame.filename}:{frame.lineno}")
+            lines.append("")
+
+        if self.cpu:
+            import pstats
+            lines.append(f"CPU (cProfile), top {TOP_FUNCTIONS} functions by cumulative time")
+            output = io.StringIO()
+            pstats.Stats(self.profile, stream=output).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            lines.append(output.getvalue())
+
+        return "\n".join(lines)
+
+    # Writes the report to report_path
+    def write_report(self, report_path, file, outcome):
+
+        with open(report_path, "w", encoding="utf-8") as report_file:
+            report_file.write(self.report(file, outcome))
+        logging.info(f"Profile of {file} written to {report_path}")
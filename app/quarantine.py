@@ -0,0 +1,137 @@
+import os
+import csv
+import logging
+from collections import Counter
+from datetime import datetime
+import config
+from batching import batched
+from transaction_batch import TransactionBatch, columns, to_string
+from compression import split_file_name
+
+# Quarantine of the transactions rejected by the validation engines.
+# Every rejected row gets the reason code of its first failing check, the log only carries the counts per reason.
+# While a Quarantine is active (a context manager, one per file) the rejected rows are also collected, as read
+# from the file, and saved once the file is loaded. Quarantine modes (config.QUARANTINE):
+# - "table": bulk inserted into the rejected_transactions table, in batches of config.BATCH_SIZE,
+#            and committed with the transactions of the file
+# - "csv": written to processed_<file name>_<timestamp><ext>.rejected.csv next to the processed file
+# The rows of a file which ends up in errored are not saved, the whole file is loaded again later.
+
+# Reason codes, in the order the checks are applied
+MISSING_UTI = "missing_uti"
+INVALID_NOTIONAL = "invalid_notional"
+INVALID_EXCHANGE_RATE = "invalid_exchange_rate"
+INVALID_ISIN = "invalid_isin"
+INVALID_LEI = "invalid_lei"
+reason_codes = [MISSING_UTI, INVALID_NOTIONAL, INVALID_EXCHANGE_RATE, INVALID_ISIN, INVALID_LEI]
+
+QUARANTINE_MODES = ("table", "csv")
+
+# Quarantine collecting the rejected rows in this process, None when rows are only counted
+active_quarantine = None
+
+
+# Collects the rejected rows of one file while it is active, it can be entered again for every chunk of the file.
+# Rows are tuples (reason, transaction_uti, isin, notional, ... legal_entity_identifier).
+# Nothing is collected when mode is not one of QUARANTINE_MODES.
+class Quarantine:
+
+    def __init__(self, mode=None):
+        self.mode = mode
+        self.rows = []
+        self.previous = None
+
+    def __enter__(self):
+        global active_quarantine
+        self.previous = active_quarantine
+        if self.mode in QUARANTINE_MODES:
+            active_quarantine = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global active_quarantine
+        active_quarantine = self.previous
+        return False
+
+
+# Parameters:
+# - transactions (TransactionBatch or list of dictionaries): Transactions given to the validation engine
+# - indices (sequence): Positions of the rejected transactions
+# - reasons (sequence): Reason code of every rejected transaction, in the order of indices
+# Logs the count of rejected rows per reason and adds the rows to the active quarantine.
+def reject(transactions, indices, reasons):
+
+    if not len(indices):
+        return
+
+    counts = Counter(reasons)
+    logging.warning(f"Rejected {len(indices)} transactions: "
+                    + ", ".join(f"{reason}={counts[reason]}" for reason in reason_codes if counts[reason]))
+
+    if active_quarantine is None:
+        return
+    if isinstance(transactions, TransactionBatch):
+        raw_row = transactions.raw_row
+    else:
+        def raw_row(index):
+            return tuple(to_string(transactions[index].get(column)) for column in columns)
+    active_quarantine.rows.extend((reason, *raw_row(index)) for index, reason in zip(indices, reasons))
+
+
+# Parameters:
+# - checks (list): One sequence of booleans per reason code, in the order of reason_codes, True where the check failed
+#                  (fewer sequences than reason codes when the last checks are switched off)
+# Returns the positions of the rows failing any check and the reason code of the first failing check of each.
+def first_failures(checks):
+
+    import numpy as np
+
+    failed = np.array(checks, dtype=bool).reshape(len(checks), -1)
+    indices = np.flatnonzero(failed.any(axis=0))
+    first = failed[:, indices].argmax(axis=0)
+    return indices.tolist(), [reason_codes[check] for check in first.tolist()]
+
+
+# Inserts the rejected rows of a file into the rejected_transactions table, without committing.
+# Returns the number of rows inserted.
+def insert_rejected_rows(conn, file_name, rows):
+
+    rejected_at = datetime.now().isoformat(timespec="seconds")
+    cursor = conn.cursor()
+    for batch in batched(rows, config.BATCH_SIZE):
+        cursor.executemany("""
+            INSERT INTO rejected_transactions (file_name, reason, transaction_uti, isin, notional, notional_currency,
+            transaction_type, transaction_datetime, exchange_rate, legal_entity_identifier, rejected_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(file_name, *row, rejected_at) for row in batch])
+    return len(rows)
+
+
+# Writes the rejected rows of a file to a CSV file, with the reason as first column
+def write_rejected_csv(file_path, rows):
+
+    with open(file_path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["reason"] + columns)
+        writer.writerows(rows)
+
+
+# Parameters:
+# - conn: Database connection the file is loaded with
+# - file (str): Name of the input file
+# - rows (list): Rejected rows collected by a Quarantine
+# - mode (str): "table" or "csv", see the top of this module
+# - processed_path (str), timestamp (str): Where and with which timestamp the file is moved once processed
+# Saves the rejected rows of a loaded file, rows inserted in the table are committed by the caller
+# with the rows of the file.
+def save_rejected_rows(conn, file, rows, mode, processed_path, timestamp):
+
+    if not rows or mode not in QUARANTINE_MODES:
+        return
+    if mode == "table":
+        insert_rejected_rows(conn, file, rows)
+    else:
+        name, ext, compression = split_file_name(file)
+        write_rejected_csv(os.path.join(processed_path, f"processed_{name}_{timestamp}{ext}{compression}.rejected.csv"),
+                           rows)
+    logging.info(f"{len(rows)} rejected transactions of {file} saved to quarantine ({mode})")
@@ -0,0 +1,121 @@
+import time
+import logging
+import config
+from datetime_epoch import to_epoch
+
+# Read side of the transactions table: secondary indexes and keyset paginated queries.
+# Pages are read with keyset pagination: every page starts after the sort key of the last row of the
+# previous page (rowid, or transaction_epoch_us then rowid for datetime ranges), so reading a page costs
+# the same at any depth of the result, unlike LIMIT ... OFFSET which reads and skips all the rows before it.
+# Secondary index entries are sorted by their columns then rowid, so the filtered queries are answered
+# from the index in key order without sorting.
+
+# Columns returned by the queries, in this order
+transaction_columns = ["transaction_uti", "isin", "notional", "notional_currency", "transaction_type",
+                       "transaction_datetime", "exchange_rate", "legal_entity_identifier", "amount_eur"]
+
+# Columns which can be indexed: the returned columns and the UTC epoch of transaction_datetime (datetime_epoch.py)
+indexed_columns = transaction_columns + ["transaction_epoch_us"]
+
+# Filters of the queries, keyword argument -> column compared for equality
+equality_filters = {"isin": "isin", "lei": "legal_entity_identifier", "currency": "notional_currency"}
+
+
+# Parameters:
+# - conn: Database connection
+# - indexes (dict): Index name -> list of columns, config.TRANSACTION_INDEXES when not given
+# Creates the secondary indexes of the transactions table which do not exist yet.
+# Called once the files are loaded (or when the watched directory is idle), never during a load,
+# and every index is built and committed in its own transaction, so the write lock is only
+# held for one index at a time and the loads are never slowed down by an index build.
+# Returns the names of the indexes created.
+def create_indexes(conn, indexes=None):
+
+    indexes = config.TRANSACTION_INDEXES if indexes is None else indexes
+    existing = {name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'transactions'")}
+
+    created = []
+    for name, columns in indexes.items():
+        index_name = f"idx_transactions_{name}"
+        if index_name in existing:
+            continue
+        unknown_columns = [column for column in columns if column not in indexed_columns]
+        if unknown_columns:
+            raise ValueError(f"Unknown columns for index {name}: {', '.join(unknown_columns)}")
+
+        start_time = time.perf_counter()
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON transactions ({', '.join(columns)})")
+        conn.commit()
+        created.append(index_name)
+        logging.info(f"Index {index_name} created in {time.perf_counter() - start_time:.3f} seconds")
+    return created
+
+
+# Parameters:
+# - conn: Database connection
+# - isin, lei, currency (str): Optional, only rows with this ISIN, LEI and/or notional currency
+# - datetime_from, datetime_to (str or int): Optional, only rows with datetime_from <= transaction_datetime < datetime_to,
+#                                            as ISO 8601 datetimes (UTC when no designator is given) or epochs in
+#                                            microseconds, compared on transaction_epoch_us and sorted by it
+# - after (tuple): Key returned with the previous page, None for the first page
+# - page_size (int): Maximum number of rows in the page, config.QUERY_PAGE_SIZE when not given
+# Returns one page of rows (tuples in the order of transaction_columns) and the key of the next page,
+# None when this is the last page.
+def fetch_page(conn, isin=None, lei=None, currency=None, datetime_from=None, datetime_to=None,
+               after=None, page_size=None):
+
+    page_size = page_size or config.QUERY_PAGE_SIZE
+    conditions = []
+    parameters = []
+
+    filters = {"isin": isin, "lei": lei, "currency": currency}
+    for name, column in equality_filters.items():
+        value = filters[name]
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            parameters.append(value)
+
+    by_datetime = datetime_from is not None or datetime_to is not None
+    if datetime_from is not None:
+        conditions.append("transaction_epoch_us >= ?")
+        parameters.append(to_epoch(datetime_from))
+    if datetime_to is not None:
+        conditions.append("transaction_epoch_us < ?")
+        parameters.append(to_epoch(datetime_to))
+
+    if after is not None:
+        conditions.append("(transaction_epoch_us, rowid) > (?, ?)" if by_datetime else "rowid > ?")
+        parameters.extend(after)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = "transaction_epoch_us, rowid" if by_datetime else "rowid"
+    rows = conn.execute(f"SELECT rowid, transaction_epoch_us, {', '.join(transaction_columns)} FROM transactions "
+                        f"{where} ORDER BY {order} LIMIT ?", parameters + [page_size]).fetchall()
+
+    next_key = None
+    if len(rows) == page_size:
+        last = rows[-1]
+        next_key = (last[1], last[0]) if by_datetime else (last[0],)
+    return [row[2:] for row in rows], next_key
+
+
+# Same parameters as fetch_page, without 'after'.
+# Yields the pages of the result one at a time, so only one page is held in memory.
+def iter_pages(conn, page_size=None, **filters):
+
+    after = None
+    while True:
+        rows, after = fetch_page(conn, after=after, page_size=page_size, **filters)
+        if rows:
+            yield rows
+        if after is None:
+            return
+
+
+# Same parameters as fetch_page, without 'after'.
+# Yields the rows of the result one at a time, reading them page by page.
+def iter_transactions(conn, page_size=None, **filters):
+
+    for rows in iter_pages(conn, page_size, **filters):
+        yield from rows
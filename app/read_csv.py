@@ -1,34 +1,156 @@
+import io
 import os
 import csv
 import logging
+from itertools import chain
+from operator import itemgetter
+from transaction_batch import TransactionBatch, to_batch
+from compression import open_input
+
+# Columns which must be present in the header of every CSV file
+required_columns = ["transaction_uti", "isin", "notional", "notional_currency",
+                    "transaction_type", "transaction_datetime", "exchange_rate", "legal_entity_identifier"]
+
+
+# Parameter : fieldnames (list): Header row read from the CSV file
+# Raises ValueError if any of the required columns is missing from the header.
+def check_required_columns(fieldnames):
+
+    missing_columns = [
+        col for col in required_columns if col not in (fieldnames or [])]
+
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+
+# Parameter : reader (csv.reader): Reader positioned on the header row
+# Reads and checks the header straight away, then returns an iterator over the values of the
+# required columns of every row, in the order of required_columns.
+# Blank lines are skipped and missing trailing values are read as None, as csv.DictReader does.
+def iter_csv_values(reader):
+
+    header = next(reader, None)
+    check_required_columns(header)
+
+    # The last column of a name wins, as in csv.DictReader
+    positions = {name: index for index, name in enumerate(header)}
+    get_values = itemgetter(*[positions[column] for column in required_columns])
+    width = max(positions[column] for column in required_columns) + 1
+
+    def values():
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                row += [None] * (width - len(row))
+            yield get_values(row)
+
+    return values()
+
 
 # Parameter : file_path (str): Input directory and filename for file to loaded
-# Reads a CSV file and returns a list of transactions.
-# Each transaction is represented as a dictionary.
+# Reads a CSV file and returns the transactions as a TransactionBatch.
 # Checks if all the required columns are present in file before processing further
 def read_csv(file_path):
-   
+
     if not os.path.exists(file_path) or os.stat(file_path).st_size == 0:
         raise ValueError(f"CSV file {file_path} is empty or missing.")
 
-    transactions = []
+    try:
+        with open_input(file_path, 'r', newline='', encoding='utf-8') as csvfile:
+            logging.info(f"Started reading file:{file_path}")
+            return to_batch(iter_csv_values(csv.reader(csvfile)))
+
+    except ValueError as e:
+        raise ValueError(f"Error processing csv file {file_path}:{e}")
+
 
-    required_columns = ["transaction_uti", "isin", "notional", "notional_currency",
-                        "transaction_type", "transaction_datetime", "exchange_rate", "legal_entity_identifier"]
+# Iterates over the lines of a file opened in binary mode and decodes them for csv.
+# Keeps track of the number of bytes handed out so far in 'offset', csv.reader only
+# pulls the lines it needs for the next record so the offset always ends on a record boundary.
+class CountingLineReader:
+
+    def __init__(self, binary_file, encoding='utf-8'):
+        self.binary_file = binary_file
+        self.encoding = encoding
+        self.offset = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.binary_file.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode(self.encoding)
+
+
+# Parameters:
+# - file_path (str): Input directory and filename for file to loaded
+# - chunk_size (int): Maximum number of rows in one chunk
+# - chunk_bytes (int): Optional byte budget for one chunk, a chunk is closed once the
+#                      rows read into it take up this many bytes of the file
+# Reads a CSV file and yields the transactions in chunks (TransactionBatch),
+# so only one chunk of the file is held in memory at a time.
+# The required columns are checked before the first chunk is returned.
+def read_csv_chunks(file_path, chunk_size=10000, chunk_bytes=None):
+
+    for chunk, _ in read_csv_chunk_offsets(file_path, chunk_size, chunk_bytes):
+        yield chunk
+
+
+# Same as read_csv_chunks, yields every chunk with the byte offset in the file just after its last row.
+# With start_offset (an offset returned with an earlier chunk) the header is read and checked,
+# then the rows are read from this offset on. The offsets of a compressed file are in its decompressed content.
+def read_csv_chunk_offsets(file_path, chunk_size=10000, chunk_bytes=None, start_offset=None):
+
+    if not os.path.exists(file_path) or os.stat(file_path).st_size == 0:
+        raise ValueError(f"CSV file {file_path} is empty or missing.")
 
     try:
-        with open(file_path, newline='', encoding='utf-8') as csvfile:
+        with open_input(file_path, 'rb') as csvfile:
             logging.info(f"Started reading file:{file_path}")
-            reader = csv.DictReader(csvfile)
-            missing_columns = [
-                col for col in required_columns if col not in reader.fieldnames]
+            lines = CountingLineReader(csvfile)
+            values = iter_csv_values(csv.reader(lines))
+
+            # csv.reader has only pulled the header lines so far, the rows can be read from anywhere after them
+            if start_offset:
+                csvfile.seek(start_offset)
+                lines.offset = start_offset
 
-            if missing_columns:
-                raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+            chunk = TransactionBatch()
+            chunk_start = lines.offset
+            for row in values:
+                chunk.append(*row)
+                if (chunk_size and len(chunk) >= chunk_size) or (chunk_bytes and lines.offset - chunk_start >= chunk_bytes):
+                    yield chunk, lines.offset
+                    chunk = TransactionBatch()
+                    chunk_start = lines.offset
 
-            for row in reader:
-                transactions.append(row)
-        return transactions
+            if chunk:
+                yield chunk, lines.offset
 
     except ValueError as e:
         raise ValueError(f"Error processing csv file {file_path}:{e}")
+
+
+# Parameter : data (bytes): Header record of a CSV file
+# Reads and checks the header (check_required_columns) and returns its column names.
+def read_csv_header(data):
+
+    header = next(csv.reader(io.StringIO(data.decode("utf-8"), newline="")), None)
+    check_required_columns(header)
+    return header
+
+
+# Parameters:
+# - file_path (str): CSV file the text is part of, not read again
+# - text (str): Records of a byte range of the file, ending on a record boundary
+# - header (list): Column names read by read_csv_header
+# Returns the transactions of the records as a TransactionBatch. The header is put in front of the records,
+# so they are checked and read by iter_csv_values exactly as a whole file would be.
+def parse_csv_text(file_path, text, header):
+
+    return to_batch(iter_csv_values(chain([header], csv.reader(io.StringIO(text, newline="")))))
+
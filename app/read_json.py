@@ -1,43 +1,211 @@
 import os
+import re
 import json
 import logging
+from operator import itemgetter
+from batching import DEFAULT_CHUNK_SIZE
+from transaction_batch import to_batch, batch_chunks
+from compression import open_input
+
+# Mapping of the properties in the JSON file to the columns of transaction table
+transaction_schema = {
+    "transaction_uti": "transaction_uti",
+    "isin": "isin",
+    "notional": "notional",
+    "notional_currency": "notional_currency",
+    "transaction_type": "transaction_type",
+    "transaction_datetime": "transaction_datetime",
+    "exchange_rate": "exchange_rate",
+    "lei": "legal_entity_identifier"
+}
+
+# Returns the values of the properties of transaction_schema, in the order of the columns of a TransactionBatch
+get_values = itemgetter(*transaction_schema)
+
+# Whitespace allowed between JSON tokens
+whitespace = re.compile(r"[ \t\n\r]*")
+
+# Tokens of JSON text, as far as needed to find where a value ends: a complete string, a quote
+# whose string is not complete yet, a bracket, a comma, or a run of anything else
+json_token = re.compile(r'"(?:[^"\\]|\\.)*"|"|[\[\]{},]|[^"\[\]{},]+')
+
+# Characters which may continue a number decoded up to the end of the window
+number_chars = frozenset("0123456789.eE+-")
+
+
+# Parameters:
+# - data (dict): One element of the transactions array
+# - row_number (int): Position of the element in the array, used for logging
+# - file_path (str): Input file name, used for logging
+# Returns the values of the properties of transaction_schema, in the order of the columns of a TransactionBatch,
+# or None if any of the required properties is missing.
+def transaction_values(data, row_number, file_path):
+
+    missing_columns = transaction_schema.keys() - data.keys()
+    if missing_columns:
+        logging.warning(
+            f"Missing required property: {', '.join(missing_columns)} in the file  {file_path}")
+        logging.warning(
+            f"Missing required property on row number: {row_number} in the file  {file_path}")
+        return None
+
+    return get_values(data)
+
 
 # Parameter : file_path (str): Input directory and filename for file to loaded
-# Reads a JSON file and returns a list of transactions.
-# Each transaction is represented as a dictionary.
+# Reads a JSON file and returns the transactions as a TransactionBatch.
 def read_json(file_path):
 
-    transaction_schema = {
-        "transaction_uti": "transaction_uti",
-        "isin": "isin",
-        "notional": "notional",
-        "notional_currency": "notional_currency",
-        "transaction_type": "transaction_type",
-        "transaction_datetime": "transaction_datetime",
-        "exchange_rate": "exchange_rate",
-        "lei": "legal_entity_identifier"
-    }
-
     if not os.path.exists(file_path) or os.stat(file_path).st_size == 0:
         raise ValueError(f"JSON file {file_path} is empty or missing.")
 
     try:
-        with open(file_path, "r", encoding="utf-8") as jsonfile:
+        with open_input(file_path, "r", encoding="utf-8") as jsonfile:
             logging.info(f"Started reading file:{file_path}")
-            transactions = []
             loaded_data = json.load(jsonfile)
             loaded_transactions = loaded_data['transactions']
-            for data in loaded_transactions:
-                missing_columns = transaction_schema.keys() - data.keys()
-                if missing_columns:
-                    logging.warning(
-                        f"Missing required property: {', '.join(missing_columns)} in the file  {file_path}")
-                    logging.warning(
-                        f"Missing required property on row number: {data.index} in the file  {file_path}")
-                else:
-                    transaction = {transaction_schema[key]: value for key, value in data.items() if key in transaction_schema}
-                    transactions.append(transaction)
-        return transactions
+            values = (transaction_values(data, row_number, file_path)
+                      for row_number, data in enumerate(loaded_transactions))
+            return to_batch(row for row in values if row is not None)
+
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Error decoding JSON file {file_path}: {e}")
+
+
+# Incremental reader for one array inside a JSON document.
+# Only a small window of the file is kept in 'buffer', every value is decoded
+# with json.JSONDecoder.raw_decode once it is complete in the window.
+class JsonArrayReader:
+
+    def __init__(self, jsonfile, read_size=65536):
+        self.jsonfile = jsonfile
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    # Drops the consumed part of the window and appends the next block of the file
+    def read_more(self):
+        data = self.jsonfile.read(self.read_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    # Returns the next character which is not whitespace, or '' at end of file
+    def peek(self):
+        while True:
+            self.pos = whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more():
+                return ""
+
+    # Consumes the next character, which has to be one of 'expected'
+    def expect(self, expected):
+        char = self.peek()
+        if not char or char not in expected:
+            raise json.JSONDecodeError(f"Expecting one of '{expected}'", self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    # Returns True when the value starting at 'pos' ends inside the window: its closing bracket, or the
+    # character after a string or a scalar, has been read. The value is not decoded.
+    def value_in_window(self):
+        depth = 0
+        for match in json_token.finditer(self.buffer, self.pos):
+            token = match.group()
+            if token == '"':
+                return False
+            if token in "[{":
+                depth += 1
+            elif token in "]}":
+                depth -= 1
+                if depth <= 0:
+                    return True
+            elif depth == 0 and (token[0] == '"' or match.end() < len(self.buffer)):
+                return True
+        return False
+
+    # Decodes the next complete JSON value, reading more of the file until it is complete.
+    # A value running up to the end of the window, or followed by what may be the rest of a number,
+    # is only accepted at end of file. A value which fails to decode although it ends inside the window
+    # is malformed: the error is raised without reading the rest of the file.
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                if self.eof or (end < len(self.buffer)
+                                and (type(value) not in (int, float) or self.buffer[end] not in number_chars)):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof or self.value_in_window():
+                    raise
+            self.read_more()
+
+    # Yields the elements of the array stored under 'key' of the top level object one at a time.
+    # Values of the other keys are decoded and discarded.
+    def iter_array(self, key):
+        self.expect("{")
+        if self.peek() == "}":
+            raise ValueError(f"Property '{key}' not found")
+
+        while True:
+            name = self.value()
+            self.expect(":")
+            if name == key:
+                self.expect("[")
+                if self.peek() == "]":
+                    return
+                while True:
+                    yield self.value()
+                    if self.expect(",]") == "]":
+                        return
+            self.value()
+            if self.expect(",}") == "}":
+                raise ValueError(f"Property '{key}' not found")
+
+
+# Parameter : file_path (str): Input directory and filename for file to loaded
+# Reads a JSON file incrementally and yields the values of the transactions one at a time
+# (see transaction_values), the document is never fully loaded in memory.
+def iter_json_values(file_path):
+
+    if not os.path.exists(file_path) or os.stat(file_path).st_size == 0:
+        raise ValueError(f"JSON file {file_path} is empty or missing.")
+
+    try:
+        with open_input(file_path, "r", encoding="utf-8") as jsonfile:
+            logging.info(f"Started reading file:{file_path}")
+            reader = JsonArrayReader(jsonfile)
+            for row_number, data in enumerate(reader.iter_array("transactions")):
+                values = transaction_values(data, row_number, file_path)
+                if values is not None:
+                    yield values
 
     except json.JSONDecodeError as e:
         raise ValueError(f"Error decoding JSON file {file_path}: {e}")
+
+
+# Parameter : file_path (str): Input directory and filename for file to loaded
+# Reads a JSON file incrementally and yields the transactions one at a time as dictionaries
+# with properties renamed as per transaction_schema.
+def iter_json_transactions(file_path):
+
+    columns = list(transaction_schema.values())
+    for values in iter_json_values(file_path):
+        yield dict(zip(columns, values))
+
+
+# Parameters:
+# - file_path (str): Input directory and filename for file to loaded
+# - chunk_size (int): Maximum number of transactions in one chunk
+# Reads a JSON file incrementally and yields the transactions in chunks (TransactionBatch).
+def read_json_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+
+    yield from batch_chunks(iter_json_values(file_path), chunk_size)
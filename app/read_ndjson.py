@@ -0,0 +1,76 @@
+import os
+import json
+import logging
+from batching import DEFAULT_CHUNK_SIZE
+from transaction_batch import to_batch, batch_chunks
+from compression import open_input
+from read_json import transaction_values
+
+# Newline-delimited JSON (.ndjson or .jsonl): one transaction object per line, with the properties of
+# read_json.transaction_schema. A JSON string cannot hold a raw newline, so every newline ends a record:
+# the lines are decoded one at a time, and a large file can be cut into byte ranges at any newline
+# and parsed in worker processes (split_csv.py). Blank lines are skipped.
+
+
+# Parameters:
+# - lines (iterable): Lines of the file
+# - file_path (str): Input file name, used for logging
+# - first_line (int): Number of the first line, for the messages
+# Yields the values of the transactions one at a time (see read_json.transaction_values),
+# lines with a missing property are logged and skipped.
+# Raises ValueError if a line is not a JSON object.
+def iter_ndjson_lines(lines, file_path, first_line=1):
+
+    for line_number, line in enumerate(lines, first_line):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Error decoding line {line_number} of NDJSON file {file_path}: {e}")
+        if not isinstance(data, dict):
+            raise ValueError(f"Line {line_number} of NDJSON file {file_path} is not a JSON object")
+        values = transaction_values(data, line_number, file_path)
+        if values is not None:
+            yield values
+
+
+# Parameter : file_path (str): Input directory and filename for file to loaded
+# Reads an NDJSON file line by line and yields the values of the transactions one at a time.
+def iter_ndjson_values(file_path):
+
+    if not os.path.exists(file_path) or os.stat(file_path).st_size == 0:
+        raise ValueError(f"NDJSON file {file_path} is empty or missing.")
+
+    with open_input(file_path, "r", encoding="utf-8") as ndjsonfile:
+        logging.info(f"Started reading file:{file_path}")
+        yield from iter_ndjson_lines(ndjsonfile, file_path)
+
+
+# Parameter : file_path (str): Input directory and filename for file to loaded
+# Reads an NDJSON file and returns the transactions as a TransactionBatch.
+def read_ndjson(file_path):
+
+    return to_batch(iter_ndjson_values(file_path))
+
+
+# Parameters:
+# - file_path (str): Input directory and filename for file to loaded
+# - chunk_size (int): Maximum number of transactions in one chunk
+# Reads an NDJSON file incrementally and yields the transactions in chunks (TransactionBatch).
+def read_ndjson_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+
+    yield from batch_chunks(iter_ndjson_values(file_path), chunk_size)
+
+
+# Parameters:
+# - file_path (str): NDJSON file the text is part of, used for logging
+# - text (str): Lines of a byte range of the file
+# - header: Not used, NDJSON files have no header
+# Returns the transactions of the lines as a TransactionBatch.
+# The text is split on newlines only, as the lines of the file are read: str.splitlines would also split
+# on characters a JSON string may hold raw (U+2028, U+2029, \x85, \x0b, \x0c).
+def parse_ndjson_text(file_path, text, header=None):
+
+    lines = (line[:-1] if line.endswith("\r") else line for line in text.split("\n"))
+    return to_batch(iter_ndjson_lines(lines, file_path))
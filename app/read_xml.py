@@ -1,31 +1,97 @@
 import os
-import xml.etree.ElementTree as ET
+import logging
+from operator import itemgetter
+from batching import DEFAULT_CHUNK_SIZE
+from transaction_batch import to_batch, batch_chunks
+from compression import open_input
+
+# Mapping of the child elements of <transaction> to the columns of transaction table
+transaction_schema = {
+    "transaction_uti": "transaction_uti",
+    "isin": "isin",
+    "notional": "notional",
+    "notional_currency": "notional_currency",
+    "transaction_type": "transaction_type",
+    "transaction_datetime": "transaction_datetime",
+    "exchange_rate": "exchange_rate",
+    "lei": "legal_entity_identifier"
+}
+
+# Returns the text of the elements of transaction_schema, in the order of the columns of a TransactionBatch
+get_values = itemgetter(*transaction_schema)
 
-# Parameter : file_path (str): Input directory and filename for file to loaded
-# Reads an XML file and returns a list of transactions.
-# Each transaction is represented as a dictionary.
 
+# Parameter : file_path (str): Input directory and filename for file to loaded
+# Reads an XML file and returns the transactions as a TransactionBatch.
 def read_xml(file_path):
 
+    return to_batch(iter_xml_values(file_path))
+
+
+# Parameter : file_path (str): Input directory and filename for file to loaded
+# Reads an XML file with ET.iterparse and yields the values of the transactions one at a time,
+# in the order of the columns of a TransactionBatch.
+# The children of every <transaction> are read in one pass and the element is cleared
+# once it is consumed, so memory use does not grow with the size of the document.
+# Raises ValueError if a transaction is missing any of the required child elements.
+def iter_xml_values(file_path):
+
+    # Imported here so that importing main does not load the XML parser
+    import xml.etree.ElementTree as ET
+
     if not os.path.exists(file_path) or os.stat(file_path).st_size == 0:
         raise ValueError(f"XML file {file_path} is empty or missing.")
 
-    transactions = []
     try:
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-        for trans in root.findall("transaction"):
-            transactions.append({
-                "transaction_uti": trans.find("transaction_uti").text,
-                "isin": trans.find("isin").text,
-                "notional": trans.find("notional").text,
-                "notional_currency": trans.find("notional_currency").text,
-                "transaction_type": trans.find("transaction_type").text,
-                "transaction_datetime": trans.find("transaction_datetime").text,
-                "exchange_rate": trans.find("exchange_rate").text,
-                "legal_entity_identifier": trans.find("lei").text
-            })
-        return transactions
+        logging.info(f"Started reading file:{file_path}")
+        with open_input(file_path, "rb") as xmlfile:
+            context = ET.iterparse(xmlfile, events=("start", "end"))
+            _, root = next(context)
+            depth = 1
+            row_number = 0
+            for event, elem in context:
+                if event == "start":
+                    depth += 1
+                    continue
+
+                depth -= 1
+                # Only <transaction> elements directly under the root element are transactions
+                if depth != 1 or elem.tag != "transaction":
+                    continue
+
+                values = {child.tag: child.text for child in elem}
+                if not transaction_schema.keys() <= values.keys():
+                    missing_elements = [tag for tag in transaction_schema if tag not in values]
+                    raise ValueError(
+                        f"Missing required element: {', '.join(missing_elements)} in transaction number {row_number}")
+
+                yield get_values(values)
+                row_number += 1
+
+                # Release the consumed transaction from the tree
+                elem.clear()
+                root.clear()
 
     except ET.ParseError as e:
         raise ValueError(f"Error parsing XML file {file_path}: {e}")
+    except ValueError as e:
+        raise ValueError(f"Error processing XML file {file_path}: {e}")
+
+
+# Parameter : file_path (str): Input directory and filename for file to loaded
+# Reads an XML file incrementally and yields the transactions one at a time as dictionaries
+# with elements renamed as per transaction_schema.
+def iter_xml_transactions(file_path):
+
+    columns = list(transaction_schema.values())
+    for values in iter_xml_values(file_path):
+        yield dict(zip(columns, values))
+
+
+# Parameters:
+# - file_path (str): Input directory and filename for file to loaded
+# - chunk_size (int): Maximum number of transactions in one chunk
+# Reads an XML file incrementally and yields the transactions in chunks (TransactionBatch).
+def read_xml_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+
+    yield from batch_chunks(iter_xml_values(file_path), chunk_size)
@@ -0,0 +1,52 @@
+from collections import namedtuple
+from read_csv import read_csv, read_csv_chunks, read_csv_chunk_offsets, read_csv_header, parse_csv_text
+from read_json import read_json, read_json_chunks
+from read_xml import read_xml, read_xml_chunks
+from read_ndjson import read_ndjson, read_ndjson_chunks, parse_ndjson_text
+
+# Registry of the input formats, by file extension. file_processor, async_pipeline and split_csv find
+# the reader of a file here, a new format is added with one register_reader call at the end of this module.
+# Compressed files need no entry of their own: every reader opens its file with compression.open_input.
+
+# How the files of one format are read:
+# - read(file_path): reads the whole file, returns a TransactionBatch
+# - read_chunks(file_path, chunk_size[, chunk_bytes]): reads the file incrementally, yields TransactionBatch chunks
+# - chunk_bytes: True when read_chunks also takes the byte budget of a chunk
+# - parse_text(file_path, text, header): Optional, reads the records of a byte range of the file ending on
+#   a record boundary, so one large file can be parsed in worker processes (split_csv.py)
+# - read_header(data): Optional, reads and checks the header record, put in front of every byte range
+# - quote: Quote character (bytes) of the fields which may hold newlines, None when every newline ends a record
+# - read_chunk_offsets(file_path, chunk_size, chunk_bytes, start_offset): Optional, yields every chunk with the
+#   offset just after it and reads from start_offset, so a checkpointed load resumes there (checkpoints.py);
+#   without it the load resumes by reading the file again and skipping the rows already committed
+FileReader = namedtuple("FileReader", ["read", "read_chunks", "chunk_bytes", "parse_text", "read_header", "quote",
+                                       "read_chunk_offsets"])
+
+readers = {}
+
+
+# Parameters:
+# - extensions (tuple): File extensions of the format, eg. (".csv",)
+# - the fields of FileReader, see above
+# Registers the reader of a format, replacing the reader of the same extension if any.
+def register_reader(extensions, read, read_chunks, chunk_bytes=False, parse_text=None, read_header=None, quote=None,
+                    read_chunk_offsets=None):
+
+    for ext in extensions:
+        readers[ext] = FileReader(read, read_chunks, chunk_bytes, parse_text, read_header, quote, read_chunk_offsets)
+
+
+# Returns the reader of a file extension, raises ValueError when the format is not supported
+def get_reader(ext):
+
+    reader = readers.get(ext)
+    if reader is None:
+        raise ValueError(f"Unsupported file type: {ext}")
+    return reader
+
+
+register_reader((".csv",), read_csv, read_csv_chunks, chunk_bytes=True, parse_text=parse_csv_text,
+                read_header=read_csv_header, quote=b'"', read_chunk_offsets=read_csv_chunk_offsets)
+register_reader((".json",), read_json, read_json_chunks)
+register_reader((".xml",), read_xml, read_xml_chunks)
+register_reader((".ndjson", ".jsonl"), read_ndjson, read_ndjson_chunks, parse_text=parse_ndjson_text)
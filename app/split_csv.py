@@ -0,0 +1,186 @@
+import os
+import mmap
+import time
+import logging
+from collections import Counter, deque
+import config
+from readers import readers
+from compression import sniff_compression
+from transaction_processor import prepare_transactions, write_transactions
+from quarantine import Quarantine
+
+# Parsing of one large CSV file in worker processes, or of any uncompressed file whose reader has
+# a parse_text (readers.py), such as NDJSON.
+# The file is memory-mapped and cut into byte ranges of about config.SPLIT_RANGE_BYTES which end on record
+# boundaries, the ranges are read and validated in a process pool and the validated rows are written by
+# this process, in file order, with the usual upsert path (transaction_processor.write_transactions).
+# A newline is only a record boundary when it is outside a quoted field, that is when the number of quotes
+# before it is even (an escaped quote "" counts twice). For formats without a quote (NDJSON) every newline is
+# a record boundary and the quotes are not counted. Otherwise finding the boundaries takes two passes:
+# 1 - the quotes of every range are counted in the workers, in parallel
+# 2 - from the parity of the quotes before each cut, this process moves the cut to the next newline
+#     outside quotes, reading only the bytes between the cut and that newline.
+
+# Size of the blocks copied out of the memory map to count their quotes
+QUOTE_BLOCK_BYTES = 16 * 2 ** 20
+
+
+# Parameters:
+# - file_path (str), ext (str): File to load and its extension
+# Returns True when the file is to be parsed in worker processes: its reader has a parse_text, config.WORKERS > 1,
+# the file is at least config.SPLIT_CSV_MIN_BYTES long and it is not compressed (a compressed file is read as a stream).
+def use_split_csv(file_path, ext):
+
+    reader = readers.get(ext)
+    return (reader is not None and reader.parse_text is not None and bool(config.SPLIT_CSV_MIN_BYTES)
+            and bool(config.WORKERS) and config.WORKERS > 1
+            and os.path.getsize(file_path) >= config.SPLIT_CSV_MIN_BYTES and sniff_compression(file_path) is None)
+
+
+# Runs in a worker process: returns the number of quotes between the byte offsets start and end of the file
+def count_quotes(file_path, start, end, quote=b'"'):
+
+    with open(file_path, "rb") as csvfile, mmap.mmap(csvfile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return sum(data[block:min(block + QUOTE_BLOCK_BYTES, end)].count(quote)
+                   for block in range(start, end, QUOTE_BLOCK_BYTES))
+
+
+# Parameters:
+# - data (mmap): Memory map of the file
+# - position (int): Byte offset to start from
+# - odd (bool): True when the number of quotes before position is odd, position is then inside a quoted field
+# - quote (bytes): Quote character, None when every newline is a record boundary
+# Returns the offset just after the first newline from position which is outside quotes, the end of the file if none.
+def record_boundary(data, position, odd, quote=b'"'):
+
+    while True:
+        newline = data.find(b"\n", position)
+        if newline == -1:
+            return len(data)
+        if quote is not None:
+            odd ^= data[position:newline].count(quote) % 2 == 1
+        if not odd:
+            return newline + 1
+        position = newline + 1
+
+
+# Parameters:
+# - file_path (str): File to split
+# - executor (concurrent.futures.Executor): Pool counting the quotes of the ranges
+# - range_bytes (int): Approximate size of one range
+# - ext (str): Extension of the format of the file, see readers.py
+# Reads and checks the header when the format has one (read_csv.read_csv_header), then cuts the rest of the file
+# into ranges. Returns the header (None if there is none) and the list of (start, end) byte offsets of the ranges,
+# in file order.
+def split_ranges(file_path, executor, range_bytes, ext=".csv"):
+
+    reader = readers[ext]
+    with open(file_path, "rb") as csvfile, mmap.mmap(csvfile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header = None
+        header_end = 0
+        if reader.read_header:
+            header_end = record_boundary(data, 0, False, reader.quote)
+            header = reader.read_header(data[:header_end])
+
+        size = len(data)
+        cuts = list(range(header_end, size, range_bytes)) + [size]
+
+        # Step 1: quotes of every range between two cuts, counted in parallel
+        quote_counts = [0] * (len(cuts) - 1)
+        if reader.quote is not None:
+            quote_counts = list(executor.map(count_quotes, [file_path] * (len(cuts) - 1), cuts[:-1], cuts[1:],
+                                             [reader.quote] * (len(cuts) - 1)))
+
+        # Step 2: every cut is moved to the next record boundary
+        boundaries = [header_end]
+        quotes_before = 0
+        for cut, quotes in zip(cuts[1:-1], quote_counts):
+            quotes_before += quotes
+            if cut > boundaries[-1]:
+                boundary = record_boundary(data, cut, quotes_before % 2 == 1, reader.quote)
+                if boundary > boundaries[-1]:
+                    boundaries.append(boundary)
+        if size > boundaries[-1]:
+            boundaries.append(size)
+
+    return header, list(zip(boundaries[:-1], boundaries[1:]))
+
+
+# Runs in a worker process: reads and validates the records between the byte offsets start and end of the file
+# with the parse_text of its format (for CSV the header read by split_ranges is put in front of the records).
+# Returns the rows ready for the transaction table, the counts of rows read, valid and rejected,
+# the seconds spent reading and validating, and the rejected rows to quarantine.
+def parse_range(file_path, start, end, header, quarantine=None, ext=".csv"):
+
+    start_time = time.perf_counter()
+    with open(file_path, "rb") as csvfile, mmap.mmap(csvfile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        text = data[start:end].decode("utf-8")
+    transactions = readers[ext].parse_text(file_path, text, header)
+    del text
+    read_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    with Quarantine(quarantine) as quarantined:
+        transactions_list = prepare_transactions(transactions) if transactions else []
+    stats = {"read": len(transactions), "valid": len(transactions_list),
+             "rejected": len(transactions) - len(transactions_list),
+             "read_seconds": read_seconds, "validate_seconds": time.perf_counter() - start_time}
+    return transactions_list, stats, quarantined.rows
+
+
+# Parameters:
+# - file_path (str): File to load
+# - conn: Database connection, the rows are written without being committed
+# - workers (int): Number of worker processes
+# - quarantine (str): Optional, collects the rejected rows ("table" or "csv"), see quarantine.py
+# - executor (concurrent.futures.Executor): Optional, pool to use instead of starting one
+# - ext (str): Optional, extension of the format of the file (readers.py), CSV by default
+# Parses the file in worker processes and writes the validated rows range by range in file order,
+# at most 2 ranges per worker are held in memory waiting to be written. The caller commits.
+# Returns the processing stats of the file (as process_transactions) and the rejected rows.
+def load_split_csv(file_path, conn, workers, quarantine=None, executor=None, ext=".csv"):
+
+    if executor is None:
+        # Imported here so runs without workers do not load multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return load_split_csv(file_path, conn, workers, quarantine, executor, ext)
+
+    if not os.path.exists(file_path) or os.stat(file_path).st_size == 0:
+        raise ValueError(f"{ext[1:].upper()} file {file_path} is empty or missing.")
+
+    try:
+        start_time = time.perf_counter()
+        header, ranges = split_ranges(file_path, executor, config.SPLIT_RANGE_BYTES, ext)
+        logging.info(f"Started reading file:{file_path} in {len(ranges)} ranges over {workers} workers, "
+                     f"split in {time.perf_counter() - start_time:.3f} seconds")
+    except ValueError as e:
+        raise ValueError(f"Error processing {ext[1:]} file {file_path}:{e}")
+
+    file_stats = Counter()
+    rejected_rows = []
+    pending = deque()
+    ranges = iter(ranges)
+
+    def submit_next():
+        for start, end in ranges:
+            pending.append(executor.submit(parse_range, file_path, start, end, header, quarantine, ext))
+            return True
+        return False
+
+    while len(pending) < workers * 2 and submit_next():
+        pass
+
+    while pending:
+        transactions_list, stats, rows = pending.popleft().result()
+        submit_next()
+        file_stats.update(stats)
+        rejected_rows.extend(rows)
+        if transactions_list:
+            write_start = time.perf_counter()
+            file_stats.update(write_transactions(transactions_list, conn, commit=False))
+            file_stats["write_seconds"] += time.perf_counter() - write_start
+
+    logging.info(f"Transactions inserted: {file_stats['inserted']}, updated: {file_stats['updated']}, "
+                 f"unchanged: {file_stats['unchanged']}, duplicates collapsed: {file_stats['collapsed']}")
+    return file_stats, rejected_rows
@@ -0,0 +1,184 @@
+import sys
+from array import array
+from batching import DEFAULT_CHUNK_SIZE
+
+# Compact representation of the transactions read from a file, shared by read_csv, read_json and read_xml.
+# Instead of one dictionary per row (with its own copy of the 8 keys), a batch keeps one list per text
+# column and one array('d') of floats per numeric column:
+# - notional and exchange_rate are converted when the row is read, values which are not numeric are stored as NaN
+# - the repeated values of isin, notional_currency, transaction_type and legal_entity_identifier are interned,
+#   so a batch holds a single copy of every distinct value
+# The validation engines read the columns directly, rows are only built as slotted Transaction records
+# when a batch is indexed or iterated.
+# The text of the numeric values which could not be converted is kept in raw_values, so rejected rows
+# can be quarantined as they were read (see quarantine.py).
+
+# Columns of a batch, in the order of the arguments of TransactionBatch.append
+columns = ["transaction_uti", "isin", "notional", "notional_currency", "transaction_type",
+           "transaction_datetime", "exchange_rate", "legal_entity_identifier"]
+
+nan = float("nan")
+
+
+# Converts a value read from file to float, returns NaN for values which are not numeric.
+# Follows pandas.to_numeric(errors='coerce'): surrounding whitespace, exponents, inf and nan
+# are accepted, while underscores and non ascii digits (which float() accepts) are not.
+def to_float(value):
+
+    if value is None:
+        return nan
+    if isinstance(value, (float, int)):
+        return float(value)
+    try:
+        if "_" in value or not value.isascii():
+            return nan
+        return float(value)
+    except (TypeError, ValueError):
+        return nan
+
+
+# Converts a value read from file to string, None and NaN are kept as NULL
+def to_string(value):
+
+    if value is None or isinstance(value, str):
+        return value
+    if value != value:
+        return None
+    return str(value)
+
+
+# Converts a value of a text column with few distinct values to string and interns it
+def to_interned_string(value):
+
+    value = to_string(value)
+    return sys.intern(value) if value is not None else None
+
+
+# One transaction of a batch, with the columns as attributes.
+# Also readable as a mapping (transaction["isin"]) like the dictionaries returned by the readers before.
+class Transaction:
+
+    __slots__ = columns
+
+    def __init__(self, *values):
+        for column, value in zip(columns, values):
+            setattr(self, column, value)
+
+    def __getitem__(self, column):
+        return getattr(self, column)
+
+    def __eq__(self, other):
+        return isinstance(other, Transaction) and self.as_tuple() == other.as_tuple()
+
+    def __repr__(self):
+        return f"Transaction({', '.join(map(repr, self.as_tuple()))})"
+
+    def as_tuple(self):
+        return tuple(getattr(self, column) for column in columns)
+
+    def as_dict(self):
+        return {column: getattr(self, column) for column in columns}
+
+
+# Numeric columns of a batch, stored as array('d')
+numeric_columns = ["notional", "exchange_rate"]
+
+
+# Column store of transactions, see the top of this module
+class TransactionBatch:
+
+    __slots__ = columns + ["raw_values"]
+
+    def __init__(self):
+        self.transaction_uti = []
+        self.isin = []
+        self.notional = array("d")
+        self.notional_currency = []
+        self.transaction_type = []
+        self.transaction_datetime = []
+        self.exchange_rate = array("d")
+        self.legal_entity_identifier = []
+        # {(column, row index): value as read} for the numeric values which are not numbers
+        self.raw_values = {}
+
+    # Builds a batch from a list of dictionaries with the columns as keys (missing keys are read as NULL)
+    @classmethod
+    def from_dicts(cls, transactions):
+
+        batch = cls()
+        for transaction in transactions:
+            batch.append(*[transaction.get(column) for column in columns])
+        return batch
+
+    # Appends one transaction, the values are converted as described at the top of this module
+    def append(self, transaction_uti, isin, notional, notional_currency, transaction_type,
+               transaction_datetime, exchange_rate, legal_entity_identifier):
+
+        self.transaction_uti.append(to_string(transaction_uti))
+        self.isin.append(to_interned_string(isin))
+        self.notional_currency.append(to_interned_string(notional_currency))
+        self.transaction_type.append(to_interned_string(transaction_type))
+        self.transaction_datetime.append(to_string(transaction_datetime))
+        self.legal_entity_identifier.append(to_interned_string(legal_entity_identifier))
+
+        number = to_float(notional)
+        if number != number and notional is not None:
+            self.raw_values["notional", len(self.notional)] = to_string(notional)
+        self.notional.append(number)
+        number = to_float(exchange_rate)
+        if number != number and exchange_rate is not None:
+            self.raw_values["exchange_rate", len(self.exchange_rate)] = to_string(exchange_rate)
+        self.exchange_rate.append(number)
+
+    # Returns the values of one transaction in the order of columns, with the numeric values
+    # which are not numbers as they were read
+    def raw_row(self, index):
+
+        return tuple(self.raw_values.get((column, index), getattr(self, column)[index]) for column in columns)
+
+    # Returns the columns as a dictionary of sequences, eg. to build a pandas DataFrame
+    def column_dict(self):
+        return {column: getattr(self, column) for column in columns}
+
+    def __len__(self):
+        return len(self.transaction_uti)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            batch = TransactionBatch()
+            for column in columns:
+                setattr(batch, column, getattr(self, column)[index])
+            positions = range(len(self))[index]
+            batch.raw_values = {(column, new_index): self.raw_values[column, old_index]
+                                for new_index, old_index in enumerate(positions)
+                                for column in numeric_columns if (column, old_index) in self.raw_values}
+            return batch
+        return Transaction(*[getattr(self, column)[index] for column in columns])
+
+    def __iter__(self):
+        for values in zip(*[getattr(self, column) for column in columns]):
+            yield Transaction(*values)
+
+
+# Builds one batch from an iterable of transactions given as sequences of values in the order of columns
+def to_batch(value_rows):
+
+    batch = TransactionBatch()
+    append = batch.append
+    for values in value_rows:
+        append(*values)
+    return batch
+
+
+# Divides transactions given as sequences of values into batches of at most n transactions,
+# used for streaming readers
+def batch_chunks(value_rows, n=DEFAULT_CHUNK_SIZE):
+
+    batch = TransactionBatch()
+    for values in value_rows:
+        batch.append(*values)
+        if len(batch) >= n:
+            yield batch
+            batch = TransactionBatch()
+    if batch:
+        yield batch
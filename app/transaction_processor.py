@@ -1,7 +1,17 @@
+import time
+import hashlib
 import logging
-import pandas as pd
+import config
+from metrics import timed_commit
+from profiling import checkpoint
+from columnar_validation import validate_transactions
 from db_handler import get_db_connection
-from itertools import islice
+from batching import batched
+from transaction_batch import TransactionBatch
+from identifier_validation import valid_isins, valid_leis
+from datetime_epoch import epoch_list
+from quarantine import first_failures, reject
+from aggregates import AggregateDeltas
 
 # Schema for converting the dataframe to standard transaction table format
 transaction_schema = {
@@ -17,10 +27,51 @@ transaction_schema = {
 
 # Input parameter : transactions - list of dictionaries containing all the transaction read from the file
 #                   conn - connection object to connect to database
+#                   commit - commit the rows at the end, False leaves the commit to the caller
+# Step 1: Validates the transactions and converts them to rows for the transaction table (prepare_transactions).
+# Step 2: Performs CreateOrupdate on Database table (write_transactions)
+# Returns the processing stats: rows read, valid, rejected, collapsed (duplicates), inserted, updated and unchanged,
+# the seconds spent validating and writing (commits included) and the commits with their seconds.
+def process_transactions(transactions, conn, commit=True):
+
+    # Step 1
+    start_time = time.perf_counter()
+    transactions_list = prepare_transactions(transactions)
+
+    stats = {"read": len(transactions), "valid": len(transactions_list),
+             "rejected": len(transactions) - len(transactions_list),
+             "collapsed": 0, "inserted": 0, "updated": 0, "unchanged": 0,
+             "validate_seconds": time.perf_counter() - start_time, "write_seconds": 0.0}
+    checkpoint("validate")
+
+    if not transactions_list:
+        logging.info("No valid transactions to process.")
+        return stats  # Exit function early
+
+    # Step 2
+    start_time = time.perf_counter()
+    stats.update(write_transactions(transactions_list, conn, commit))
+    stats["write_seconds"] = time.perf_counter() - start_time
+    checkpoint("write")
+    logging.info(f"Transactions inserted: {stats['inserted']}, updated: {stats['updated']}, "
+                 f"unchanged: {stats['unchanged']}, duplicates collapsed: {stats['collapsed']}")
+    return stats
+
+
+# Input parameter : transactions - list of dictionaries containing the transactions read from a file
 # Step 1: Validates the transactions read from file with transaction_validations function.
 # Step 2: Perform GBP to EUR conversion for notional amount
-# Step 3: Performs CreateOrupdate on Database table
-def process_transactions(transactions, conn):
+# Step 3: Adds the UTC epoch of transaction_datetime to every row (add_datetime_epoch)
+# Step 4: Adds the content hash of every row (add_row_hash)
+# Returns list of tuples in the column order of transaction table, does not need a database connection
+# so it can run in worker processes.
+# With config.VALIDATION_ENGINE = "columnar" steps 1 and 2 are done by columnar_validation without pandas.
+def prepare_transactions(transactions):
+
+    if config.VALIDATION_ENGINE == "columnar":
+        transactions_list = validate_transactions(transactions)
+        logging.info(f"Transactions after validation: {len(transactions_list)}")
+        return add_row_hash(add_datetime_epoch(transactions_list))
 
     # Step 1
     df = transaction_validations(transactions)
@@ -29,21 +80,96 @@ def process_transactions(transactions, conn):
     logging.info(f"Transactions after validation: {len(df)}")
 
     if df.empty:
-        logging.info("No valid transactions to process.")
-        return  # Exit function early
-
-    cursor = conn.cursor()
+        return []
 
     # Step 2
     df["amount_eur"] = df["notional"]*df["exchange_rate"]
 
-    # Step 3
-    transactions_list = list(df.itertuples(index=False, name=None))
+    # Step 3 and 4
+    return add_row_hash(add_datetime_epoch(list(df.itertuples(index=False, name=None))))
+
+
+# Appends to every row the UTC epoch in microseconds of its transaction_datetime (datetime_epoch.epoch_list),
+# parsed for all the rows at once, None when the datetime is missing or not valid.
+def add_datetime_epoch(transactions_list):
+
+    if not transactions_list:
+        return transactions_list
+    epochs = epoch_list([row[5] for row in transactions_list])
+    return [row + (epoch,) for row, epoch in zip(transactions_list, epochs)]
+
+
+# Appends to every row a hash of its content, an existing transaction is only updated
+# when the hash of the new row is different from the stored one.
+def add_row_hash(transactions_list):
+
+    return [row + (hashlib.blake2b("\x1f".join(map(str, row)).encode(), digest_size=16).hexdigest(),)
+            for row in transactions_list]
+
+
+# Input parameter : transactions_list - list of tuples returned by prepare_transactions
+# Collapses the rows with the same transaction_uti, last wins: the row kept for a transaction_uti is its last
+# row in the list, at the position of its first row. Writing the collapsed rows gives the same table as
+# writing all the rows in order, with one write per transaction_uti.
+# Returns the collapsed rows and the number of rows dropped.
+def collapse_duplicates(transactions_list):
+
+    last_rows = {row[0]: row for row in transactions_list}
+    collapsed = len(transactions_list) - len(last_rows)
+    if not collapsed:
+        return transactions_list, 0
+    return list(last_rows.values()), collapsed
+
+
+# Returns the highest rowid in transaction table, rows inserted later get a higher rowid
+def last_rowid(cursor):
+
+    return cursor.execute("SELECT max(rowid) FROM transactions").fetchone()[0] or 0
+
+
+# Returns the number of rows inserted in transaction table after the given rowid
+def count_inserted(cursor, rowid):
+
+    return cursor.execute("SELECT COUNT(*) FROM transactions WHERE rowid > ?", (rowid,)).fetchone()[0]
+
+
+# Input parameter : transactions_list - list of tuples returned by prepare_transactions
+#                   conn - connection object to connect to database
+#                   commit - commit the rows at the end, False leaves the commit to the caller
+# Collapses the rows with the same transaction_uti (collapse_duplicates), then writes them with
+# merge_transactions when there are at least config.STAGING_MIN_ROWS of them, otherwise with upsert_transactions.
+# Returns the number of rows collapsed, inserted, updated and unchanged, and the commits with their seconds.
+def write_transactions(transactions_list, conn, commit=True):
+
+    transactions_list, collapsed = collapse_duplicates(transactions_list)
+    if collapsed:
+        logging.info(f"Duplicate transaction_uti collapsed before writing: {collapsed}")
+
+    if config.STAGING_MIN_ROWS and len(transactions_list) >= config.STAGING_MIN_ROWS:
+        stats = merge_transactions(transactions_list, conn, commit)
+    else:
+        stats = upsert_transactions(transactions_list, conn, commit)
+    stats["collapsed"] = collapsed
+    return stats
+
+
+# Input parameter : transactions_list - list of tuples returned by prepare_transactions
+#                   conn - connection object to connect to database
+#                   commit - commit the rows every config.COMMIT_ROWS rows and at the end,
+#                            False leaves every commit to the caller
+# Inserts or updates the rows in transaction table in batches of config.BATCH_SIZE.
+# Rows are committed every config.COMMIT_ROWS rows, or only once at the end if it is None.
+# Existing rows with the same content hash are left untouched.
+# With config.MAINTAIN_AGGREGATES the aggregates are worked out for every batch and written before every commit.
+# Returns the number of rows inserted, updated and unchanged, and the commits with their seconds.
+def upsert_transactions(transactions_list, conn, commit=True):
+
+    cursor = conn.cursor()
 
     query = """
         INSERT INTO transactions (transaction_uti,isin,notional,notional_currency,transaction_type,transaction_datetime,
-        exchange_rate,legal_entity_identifier,amount_eur)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        exchange_rate,legal_entity_identifier,amount_eur,transaction_epoch_us,row_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ON CONFLICT(transaction_uti) 
         DO UPDATE SET 
             isin= excluded.isin,
@@ -53,47 +179,166 @@ def process_transactions(transactions, conn):
             transaction_datetime= excluded.transaction_datetime,
             exchange_rate= excluded.exchange_rate,
             legal_entity_identifier= excluded.legal_entity_identifier,
-            amount_eur= excluded.amount_eur;
+            amount_eur= excluded.amount_eur,
+            transaction_epoch_us= excluded.transaction_epoch_us,
+            row_hash= excluded.row_hash
+        WHERE transactions.row_hash IS NOT excluded.row_hash;
     """
 
-    for batch in batched(transactions_list, 1000):
+    deltas = AggregateDeltas() if config.MAINTAIN_AGGREGATES else None
+    start_rowid = last_rowid(cursor)
+    written_rows = 0
+    uncommitted_rows = 0
+    commits = 0
+    commit_seconds = 0.0
+    for batch in batched(transactions_list, config.BATCH_SIZE):
         try:
+            if deltas is not None:
+                deltas.add_batch(cursor, batch)
             cursor.executemany(query, batch)  # Bulk operation
             transactions_count = cursor.rowcount
-            conn.commit()
+            written_rows += transactions_count
+            uncommitted_rows += len(batch)
+            if commit and config.COMMIT_ROWS and uncommitted_rows >= config.COMMIT_ROWS:
+                if deltas is not None:
+                    deltas.flush(cursor)
+                commit_seconds += timed_commit(conn)
+                commits += 1
+                uncommitted_rows = 0
             logging.info(
                 f"Number of transactions successfully inserted/updated into the database: {transactions_count}")
 
         except Exception as e:
-            logging.info("Error inserting data:", e)
+            logging.error(f"Error inserting data: {e}")
             raise e
+
+    if deltas is not None:
+        deltas.flush(cursor)
+    inserted_rows = count_inserted(cursor, start_rowid)
+
+    if commit:
+        commit_seconds += timed_commit(conn)
+        commits += 1
     cursor.close()
 
+    return {"inserted": inserted_rows, "updated": written_rows - inserted_rows,
+            "unchanged": len(transactions_list) - written_rows,
+            "commits": commits, "commit_seconds": commit_seconds}
+
+
+# Input parameter : transactions_list - list of tuples returned by prepare_transactions
+#                   conn - connection object to connect to database
+#                   commit - commit the rows at the end, False leaves the commit to the caller
+# Bulk path for large loads:
+# Step 1: Loads the rows into a temporary staging table without any constraint or index.
+# Step 2: Merges the staging table into transaction table with one INSERT ... SELECT ... ON CONFLICT,
+#         keeping only the last row of every transaction_uti (same result as upserting the rows in order).
+#         With config.MAINTAIN_AGGREGATES the aggregates are worked out while loading the staging table
+#         (from the last row of every transaction_uti, as merged) and written after the merge.
+# Returns the number of rows inserted, updated and unchanged, and the commits with their seconds.
+def merge_transactions(transactions_list, conn, commit=True):
+
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS staging_transactions (
+            transaction_uti TEXT,
+            isin TEXT,
+            notional REAL,
+            notional_currency TEXT,
+            transaction_type TEXT,
+            transaction_datetime TEXT,
+            exchange_rate REAL,
+            legal_entity_identifier TEXT,
+            amount_eur REAL,
+            transaction_epoch_us INTEGER,
+            row_hash TEXT
+        );
+    """)
+    cursor.execute("DELETE FROM staging_transactions")
+
+    merge_query = """
+        INSERT INTO transactions (transaction_uti,isin,notional,notional_currency,transaction_type,transaction_datetime,
+        exchange_rate,legal_entity_identifier,amount_eur,transaction_epoch_us,row_hash)
+        SELECT transaction_uti,isin,notional,notional_currency,transaction_type,transaction_datetime,
+        exchange_rate,legal_entity_identifier,amount_eur,transaction_epoch_us,row_hash
+        FROM staging_transactions
+        WHERE rowid IN (SELECT max(rowid) FROM staging_transactions GROUP BY transaction_uti)
+        ORDER BY transaction_uti
+        ON CONFLICT(transaction_uti)
+        DO UPDATE SET
+            isin= excluded.isin,
+            notional= excluded.notional,
+            notional_currency= excluded.notional_currency,
+            transaction_type= excluded.transaction_type,
+            transaction_datetime= excluded.transaction_datetime,
+            exchange_rate= excluded.exchange_rate,
+            legal_entity_identifier= excluded.legal_entity_identifier,
+            amount_eur= excluded.amount_eur,
+            transaction_epoch_us= excluded.transaction_epoch_us,
+            row_hash= excluded.row_hash
+        WHERE transactions.row_hash IS NOT excluded.row_hash;
+    """
+
+    start_rowid = last_rowid(cursor)
+    try:
+        # Step 1
+        if config.MAINTAIN_AGGREGATES:
+            deltas = AggregateDeltas()
+            for batch in batched(collapse_duplicates(transactions_list)[0], config.BATCH_SIZE):
+                deltas.add_batch(cursor, batch)
+        for batch in batched(transactions_list, config.BATCH_SIZE):
+            cursor.executemany("INSERT INTO staging_transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+
+        # Step 2
+        cursor.execute(merge_query)
+        written_rows = cursor.rowcount
+        if config.MAINTAIN_AGGREGATES:
+            deltas.flush(cursor)
+        logging.info(
+            f"Number of transactions successfully inserted/updated into the database: {written_rows}")
+        cursor.execute("DELETE FROM staging_transactions")
+
+    except Exception as e:
+        logging.error(f"Error merging data: {e}")
+        raise e
+
+    inserted_rows = count_inserted(cursor, start_rowid)
+    distinct_rows = len({row[0] for row in transactions_list})
+
+    commit_seconds = timed_commit(conn) if commit else 0.0
+    cursor.close()
+
+    return {"inserted": inserted_rows, "updated": written_rows - inserted_rows,
+            "unchanged": distinct_rows - written_rows,
+            "commits": int(commit), "commit_seconds": commit_seconds}
+
 # 1 - Checks if notional and exchange rate fields are numeric , remove all rows where these fields are NAN or Null.
 # 2 - Remove rows where transaction_uti is empty string or Null.
+# 3 - Remove rows where the ISIN or LEI check digits are wrong (config.VALIDATE_IDENTIFIERS).
+# The removed rows are counted in the log and quarantined with their reason code (quarantine.reject).
 def transaction_validations(transactions):
 
-    df = pd.DataFrame(transactions)
+    # pandas is imported here only, so runs with the columnar engine or without any file never load it
+    import pandas as pd
+
+    df = pd.DataFrame(transactions.column_dict() if isinstance(transactions, TransactionBatch) else transactions)
     df['notional'] = pd.to_numeric(df['notional'], errors='coerce')
     df['exchange_rate'] = pd.to_numeric(df['exchange_rate'], errors='coerce')
 
-    # Logging the records with bad data
-    bad_data = df[df['notional'].isna() | df['exchange_rate'].isna() | df['transaction_uti'].isin(['', 'Null']) | df['transaction_uti'].isna()]
-    if not bad_data.empty:
-        logging.warning("transaction_uti with Bad Data: \n%s", bad_data[['transaction_uti', 'isin', 'legal_entity_identifier']].to_string(index=False))
+    # One array of failed checks per reason code, in the order of quarantine.reason_codes
+    checks = [df['transaction_uti'].isna().to_numpy() | df['transaction_uti'].isin(['']).to_numpy(),
+              df['notional'].isna().to_numpy(), df['exchange_rate'].isna().to_numpy()]
+    if config.VALIDATE_IDENTIFIERS and not df.empty:
+        checks += [~valid_isins(df['isin']), ~valid_leis(df['legal_entity_identifier'])]
 
-    # filtering the dataframe from bad data
-    df_filtered = df.dropna(
-        subset=['notional', 'exchange_rate', 'transaction_uti'])
-    df_filtered = df_filtered[~df_filtered['transaction_uti'].isin([""])]
+    # Quarantining the records with bad data
+    indices, reasons = first_failures(checks)
+    if indices:
+        reject(transactions, indices, reasons)
+        df = df.drop(index=df.index[indices])
 
     # Converting to standard dataframe with column datatype defined in schema
-    transformed_df = df_filtered.astype(transaction_schema)
+    transformed_df = df.astype(transaction_schema)
 
     return transformed_df
-
-# Divides the input list into batched for writing to db in batches
-def batched(iterable, n):
-    it = iter(iterable)
-    while batch := tuple(islice(it, n)):
-        yield batch
@@ -0,0 +1,116 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from file_processor import select_input_files, process_file
+from query import create_indexes
+
+# Suffix of the marker file an upstream system can drop once a file is completely written,
+# eg. input_dataset_csv.csv.done marks input_dataset_csv.csv as ready.
+MARKER_SUFFIX = ".done"
+
+
+# Keeps track of the size and modification time of the files in the input directory between polls.
+# A file is ready to be loaded when its marker file exists, or when its size and modification
+# time have not changed for settle_seconds.
+class FileStabilityTracker:
+
+    def __init__(self, settle_seconds):
+        self.settle_seconds = settle_seconds
+        self.files = {}
+
+    # Parameters:
+    # - input_path (str): The directory path where the input files are located
+    # - files (list): Candidate files in the directory
+    # - names (set): All names in the directory, including marker files
+    # - now (float): Current time.monotonic()
+    # Returns the files from 'files' which are ready to be loaded.
+    def ready_files(self, input_path, files, names, now):
+
+        ready = []
+        for file in files:
+            try:
+                stat = os.stat(os.path.join(input_path, file))
+            except FileNotFoundError:
+                self.files.pop(file, None)
+                continue
+
+            if file + MARKER_SUFFIX in names:
+                ready.append(file)
+                continue
+
+            signature = (stat.st_size, stat.st_mtime_ns)
+            previous = self.files.get(file)
+            if previous is None or previous[0] != signature:
+                self.files[file] = (signature, now)
+            elif now - previous[1] >= self.settle_seconds:
+                ready.append(file)
+
+        # Forget files which are no longer in the directory
+        for file in list(self.files):
+            if file not in names:
+                del self.files[file]
+        return ready
+
+    # Called once a file is loaded and moved out of the input directory
+    def forget(self, file):
+        self.files.pop(file, None)
+
+
+# Parameters:
+# - input_path, errored_path, processed_path, conn: Same as for file_processor.process_files
+# - poll_interval (float): Seconds between two scans of the input directory
+# - settle_seconds (float): Seconds the size and modification time of a file must stay unchanged
+# - stop_event (threading.Event): Set to stop watching, the file being loaded is finished first
+# - options: chunk_size, chunk_bytes, ledger, metrics, profile, quarantine and checkpoints,
+#            passed on to file_processor.process_file
+# Watches the input directory and loads every file as soon as it has finished being written,
+# using the same connection for the whole run. The secondary indexes are created the first time
+# the directory is idle.
+def watch_directory(input_path, errored_path, processed_path, conn, poll_interval=2.0, settle_seconds=5.0,
+                    stop_event=None, **options):
+
+    stop_event = stop_event or threading.Event()
+    tracker = FileStabilityTracker(settle_seconds)
+    rejected = set()
+    indexed = False
+
+    os.makedirs(processed_path, exist_ok=True)
+    os.makedirs(errored_path, exist_ok=True)
+    logging.info(f"Watching {input_path} for new files, polling every {poll_interval} seconds.")
+
+    while not stop_event.is_set():
+        if not os.path.isdir(input_path):
+            logging.error(f"The path {input_path} is not a valid directory for Input files.")
+            stop_event.wait(poll_interval)
+            continue
+
+        names = set(os.listdir(input_path))
+        rejected &= names
+        candidates = [name for name in names if not name.endswith(MARKER_SUFFIX) and name not in rejected]
+
+        # Unsupported files are reported once only
+        input_files = select_input_files(candidates)
+        rejected.update(set(candidates) - set(input_files))
+
+        ready = tracker.ready_files(input_path, input_files, names, time.monotonic())
+
+        # Missing secondary indexes are built while no file is waiting to be loaded
+        if not ready and not indexed:
+            create_indexes(conn)
+            indexed = True
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        for file in ready:
+            if stop_event.is_set():
+                break
+            process_file(file, input_path, errored_path, processed_path, conn, timestamp, **options)
+            tracker.forget(file)
+            marker_path = os.path.join(input_path, file + MARKER_SUFFIX)
+            if os.path.exists(marker_path):
+                os.remove(marker_path)
+
+        stop_event.wait(poll_interval)
+
+    logging.info("Stopped watching input directory.")
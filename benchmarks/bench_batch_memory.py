@@ -0,0 +1,80 @@
+# Benchmark of the memory held by the transactions of one file: a list of dictionaries (one per row,
+# as the readers returned before) against a TransactionBatch, and the peak while validating both.
+# Usage: python3 benchmarks/bench_batch_memory.py [--rows 200000] [--formats csv json xml]
+import os
+import sys
+import csv
+import gc
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config  # noqa: E402
+from read_csv import read_csv  # noqa: E402
+from read_json import read_json, iter_json_transactions  # noqa: E402
+from read_xml import read_xml, iter_xml_transactions  # noqa: E402
+from transaction_processor import prepare_transactions  # noqa: E402
+from generate_data import generate_file  # noqa: E402
+
+
+# Reads the file as a list of dictionaries, the representation used before TransactionBatch
+def read_dicts(file_path, file_format):
+    if file_format == "csv":
+        with open(file_path, newline='', encoding='utf-8') as csvfile:
+            return list(csv.DictReader(csvfile))
+    if file_format == "json":
+        return list(iter_json_transactions(file_path))
+    return list(iter_xml_transactions(file_path))
+
+
+batch_readers = {"csv": read_csv, "json": read_json, "xml": read_xml}
+
+
+# Returns the result of function, the memory it still holds once it returns, its peak memory and its duration
+def measure(function, *args):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    duration = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, duration
+
+
+def mib(size):
+    return f"{size / 2 ** 20:.1f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory of list of dictionaries against TransactionBatch")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "json", "xml"], choices=list(batch_readers))
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    print(f"{'format':>6} {'representation':>15} {'held (MiB)':>11} {'read peak':>10} "
+          f"{'read (s)':>9} {'validate peak':>14}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for file_format in args.formats:
+            file_path = os.path.join(tmp_dir, f"bench.{file_format}")
+            generate_file(file_path, file_format, args.rows)
+
+            for name, reader in (("dicts", lambda path: read_dicts(path, file_format)),
+                                 ("batch", batch_readers[file_format])):
+                transactions, held, read_peak, duration = measure(reader, file_path)
+                _, _, validate_peak, _ = measure(prepare_transactions, transactions)
+                print(f"{file_format:>6} {name:>15} {mib(held):>11} {mib(read_peak):>10} "
+                      f"{duration:>9.2f} {mib(validate_peak):>14}")
+                del transactions
+
+    print(f"validation engine: {config.VALIDATION_ENGINE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Benchmark of the parsing of one CSV file: read_csv and prepare_transactions in this process, against
+# split_csv (memory-mapped byte ranges parsed and validated in worker processes) for several numbers of workers.
+# Nothing is written to the database, only the parse and validation throughput is measured.
+# Usage: python3 benchmarks/bench_split_csv.py [--rows 1000000] [--workers 1 2 4 8] [--range-mb 64]
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from read_csv import read_csv  # noqa: E402
+from transaction_processor import prepare_transactions  # noqa: E402
+from split_csv import split_ranges, parse_range  # noqa: E402
+from generate_data import generate_file  # noqa: E402
+
+
+# Returns the number of valid rows of the file, parsed in one process
+def parse_whole(file_path):
+    return len(prepare_transactions(read_csv(file_path)))
+
+
+# Returns the number of valid rows of the file, parsed by split_csv in a pool of 'workers' processes
+def parse_split(file_path, workers, range_bytes):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        header, ranges = split_ranges(file_path, executor, range_bytes)
+        futures = [executor.submit(parse_range, file_path, start, end, header) for start, end in ranges]
+        return sum(len(future.result()[0]) for future in futures)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse throughput of split_csv against read_csv")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--range-mb", type=float, default=64)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "bench.csv")
+        generate_file(file_path, "csv", args.rows)
+        size_mb = os.path.getsize(file_path) / 2 ** 20
+        print(f"{args.rows} rows, {size_mb:.1f} MiB, {os.cpu_count()} CPUs")
+        print(f"{'mode':>12} {'workers':>8} {'seconds':>8} {'MiB/s':>8} {'speedup':>8}")
+
+        start = time.perf_counter()
+        valid = parse_whole(file_path)
+        baseline = time.perf_counter() - start
+        print(f"{'read_csv':>12} {1:>8} {baseline:>8.2f} {size_mb / baseline:>8.1f} {1.0:>8.2f}")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            assert parse_split(file_path, workers, int(args.range_mb * 2 ** 20)) == valid
+            duration = time.perf_counter() - start
+            print(f"{'split_csv':>12} {workers:>8} {duration:>8.2f} {size_mb / duration:>8.1f} "
+                  f"{baseline / duration:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Benchmark of the bulk staging table merge (merge_transactions) against the per row
+# upsert (upsert_transactions) for growing table and file sizes.
+# Half of the distinct transactions of every file update existing transactions, the other half are new.
+# With 'versions' > 1 every updated transaction appears that many times in the file (amend chains).
+# Usage: python3 benchmarks/bench_staging_merge.py
+import os
+import sys
+import time
+import random
+import sqlite3
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import config  # noqa: E402
+from db_handler import apply_write_profile, create_tables  # noqa: E402
+from transaction_processor import add_datetime_epoch, add_row_hash, upsert_transactions, merge_transactions  # noqa: E402
+
+
+def make_rows(utis):
+    # Same row shape as prepare_transactions: validated columns, transaction_epoch_us and row_hash
+    rows = [(uti, "OM4258447851", 763000.0, "GBP", "Sell", "2024-11-25T15:06:22Z",
+             0.0070956, "NWBV00SHMKBFN1RKWK79", 5413.9428) for uti in utis]
+    return add_row_hash(add_datetime_epoch(rows))
+
+
+# Writes a file of file_rows rows into a table already holding table_rows rows, returns the seconds taken
+def load(write, table_rows, file_rows, versions):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(os.path.join(tmp_dir, "bench.db"))
+        apply_write_profile(conn)
+        create_tables(conn)
+        random.seed(1)
+        existing = [f"TRANS{random.getrandbits(64):020d}" for _ in range(table_rows)]
+        upsert_transactions(make_rows(existing), conn)
+
+        update_count = min(file_rows // 2 // versions, table_rows)
+        updates = [uti for uti in random.sample(existing, update_count) for _ in range(versions)]
+        new = [f"NEW{random.getrandbits(64):020d}" for _ in range(file_rows - len(updates))]
+        rows = make_rows(updates + new)
+        random.shuffle(rows)
+
+        start = time.perf_counter()
+        write(rows, conn)
+        elapsed = time.perf_counter() - start
+        conn.close()
+    return elapsed
+
+
+def main():
+    logging.disable(logging.INFO)
+    config.COMMIT_ROWS = None
+    print(f"{'table rows':>11} {'file rows':>10} {'versions':>9} {'upsert (s)':>11} {'merge (s)':>10} {'speedup':>8}")
+    for table_rows in (0, 100000, 1000000):
+        for file_rows in (10000, 100000, 500000):
+            for versions in (1, 5):
+                if versions > 1 and not table_rows:
+                    continue
+                upsert_time = load(upsert_transactions, table_rows, file_rows, versions)
+                merge_time = load(merge_transactions, table_rows, file_rows, versions)
+                print(f"{table_rows:>11} {file_rows:>10} {versions:>9} {upsert_time:>11.3f} {merge_time:>10.3f} "
+                      f"{upsert_time / merge_time:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# Benchmark of the validation engines: pandas (transaction_processor.prepare_transactions)
+# against the pandas-free columnar engine (columnar_validation.validate_transactions).
+# Usage: python3 benchmarks/bench_validation.py [row counts...]
+import os
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config  # noqa: E402
+from transaction_processor import prepare_transactions  # noqa: E402
+from columnar_validation import validate_transactions  # noqa: E402
+from generate_data import generate_transactions  # noqa: E402
+
+
+# Builds a list of transactions as returned by read_csv, with about 2% bad rows
+def make_transactions(row_count):
+    return list(generate_transactions(row_count, bad_ratio=0.02))
+
+
+# Returns best time of 'repeat' runs of function
+def best_time(function, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main(row_counts):
+    logging.disable(logging.WARNING)
+    print(f"{'rows':>10} {'pandas (s)':>12} {'columnar (s)':>13} {'speedup':>8}")
+    for row_count in row_counts:
+        transactions = make_transactions(row_count)
+
+        config.VALIDATION_ENGINE = "pandas"
+        pandas_time, pandas_rows = best_time(lambda: prepare_transactions(transactions))
+        columnar_time, columnar_rows = best_time(lambda: validate_transactions(transactions))
+
+        # Both engines must accept the same rows
+        assert [row[0] for row in pandas_rows] == [row[0] for row in columnar_rows]
+
+        print(f"{row_count:>10} {pandas_time:>12.4f} {columnar_time:>13.4f} {pandas_time / columnar_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000, 100000])
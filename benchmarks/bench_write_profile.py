@@ -0,0 +1,52 @@
+# Benchmark of the SQLite write profile: default connection with a commit per 1000 rows batch
+# against the profile from config (WAL, synchronous NORMAL, commit once per file).
+# Usage: python3 benchmarks/bench_write_profile.py [row counts...]
+import os
+import sys
+import time
+import sqlite3
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import config  # noqa: E402
+from db_handler import apply_write_profile, create_tables  # noqa: E402
+from transaction_processor import add_datetime_epoch, add_row_hash, upsert_transactions  # noqa: E402
+
+
+def make_rows(row_count):
+    # Same row shape as prepare_transactions: validated columns, transaction_epoch_us and row_hash
+    rows = [(f"TRANS{i:012d}", "OM4258447851", 763000.0, "GBP", "Sell", "2024-11-25T15:06:22Z",
+             0.0070956, "NWBV00SHMKBFN1RKWK79", 5413.9428) for i in range(row_count)]
+    return add_row_hash(add_datetime_epoch(rows))
+
+
+# Loads the rows into a new database and returns rows per second
+def load(rows, profile, commit_rows):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(os.path.join(tmp_dir, "bench.db"))
+        if profile:
+            apply_write_profile(conn)
+        create_tables(conn)
+        config.COMMIT_ROWS = commit_rows
+
+        start = time.perf_counter()
+        upsert_transactions(rows, conn)
+        elapsed = time.perf_counter() - start
+        conn.close()
+    return len(rows) / elapsed
+
+
+def main(row_counts):
+    logging.disable(logging.INFO)
+    print(f"{'rows':>10} {'default rows/s':>15} {'profile rows/s':>15} {'speedup':>8}")
+    for row_count in row_counts:
+        rows = make_rows(row_count)
+        default_rate = load(rows, profile=False, commit_rows=1000)
+        profile_rate = load(rows, profile=True, commit_rows=None)
+        print(f"{row_count:>10} {default_rate:>15,.0f} {profile_rate:>15,.0f} {profile_rate / default_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 500000])
@@ -0,0 +1,160 @@
+# Generator of synthetic transaction files in the CSV, JSON and XML formats of the input feeds.
+# ISINs and LEIs carry valid check digits, UTIs follow the pattern of the sample files.
+# Usage: python3 benchmarks/generate_data.py --rows 1000000 --format csv --output data/input/input_bench_csv.csv
+#        [--bad-ratio 0.01] [--duplicate-ratio 0.05] [--currency-mix GBP=0.6,USD=0.3,EUR=0.1] [--seed 1]
+import json
+import random
+import string
+import argparse
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+# Approximate rate of every currency, the generated exchange rates vary around it
+exchange_rates = {"GBP": 1.19, "USD": 0.92, "EUR": 1.0, "JPY": 0.0062, "CHF": 1.05}
+
+columns = ["transaction_uti", "isin", "notional", "notional_currency", "transaction_type",
+           "transaction_datetime", "exchange_rate", "legal_entity_identifier"]
+
+alphanumeric = string.digits + string.ascii_uppercase
+
+
+# Converts letters to numbers as done for ISIN and LEI check digits (A=10 ... Z=35)
+def to_digits(code):
+    return "".join(str(int(char, 36)) for char in code)
+
+
+# Returns the ISIN with its ISO 6166 (Luhn) check digit appended
+def with_isin_check_digit(body):
+    total = 0
+    for position, digit in enumerate(reversed(to_digits(body))):
+        value = int(digit) * (2 if position % 2 == 0 else 1)
+        total += value - 9 if value > 9 else value
+    return body + str((10 - total % 10) % 10)
+
+
+# Returns the LEI with its ISO 17442 (mod 97) check digits appended
+def with_lei_check_digits(body):
+    return body + f"{98 - int(to_digits(body + '00')) % 97:02d}"
+
+
+# Parses "GBP=0.6,USD=0.4" into a dictionary of currency weights
+def parse_currency_mix(currency_mix):
+    weights = {}
+    for item in currency_mix.split(","):
+        currency, weight = item.split("=")
+        weights[currency.strip().upper()] = float(weight)
+    return weights
+
+
+# Parameters:
+# - rows (int): Number of transactions
+# - bad_ratio (float): Share of rows with a bad notional, exchange rate or transaction_uti
+# - duplicate_ratio (float): Share of rows repeating (amending) the transaction_uti of an earlier row
+# - currency_mix (dict): Weight of every notional currency
+# - seed (int): Seed of the random generator, the same seed gives the same file
+# - datetime_suffix (str): "Z" as in the CSV/JSON feeds or "+00:00" as in the XML feed
+# Yields the transactions as dictionaries with the columns of the CSV feed.
+def generate_transactions(rows, bad_ratio=0.01, duplicate_ratio=0.05, currency_mix=None, seed=1, datetime_suffix="Z"):
+
+    generator = random.Random(seed)
+    currency_mix = currency_mix or {"GBP": 0.6, "USD": 0.3, "EUR": 0.1}
+    currencies = list(currency_mix)
+    weights = list(currency_mix.values())
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    # A small pool of counterparties and instruments, as in real feeds
+    leis = [with_lei_check_digits("".join(generator.choices(alphanumeric, k=18))) for _ in range(500)]
+    isins = [with_isin_check_digit("".join(generator.choices(string.ascii_uppercase, k=2)) +
+                                   "".join(generator.choices(alphanumeric, k=9))) for _ in range(2000)]
+    recent_utis = []
+
+    for index in range(rows):
+        if recent_utis and generator.random() < duplicate_ratio:
+            uti = generator.choice(recent_utis)
+        else:
+            uti = f"{generator.randrange(10**8):08d}TRANSCATIONID{index:020d}"
+            if len(recent_utis) < 10000:
+                recent_utis.append(uti)
+            else:
+                recent_utis[generator.randrange(10000)] = uti
+
+        currency = generator.choices(currencies, weights)[0]
+        rate = exchange_rates.get(currency, 1.0) * generator.uniform(0.97, 1.03)
+        timestamp = start + timedelta(seconds=generator.randrange(366 * 24 * 3600))
+        transaction = {
+            "transaction_uti": uti,
+            "isin": generator.choice(isins),
+            "notional": f"{round(generator.lognormvariate(13, 1.5), -3):.1f}",
+            "notional_currency": currency,
+            "transaction_type": generator.choice(["Buy", "Sell"]),
+            "transaction_datetime": timestamp.strftime("%Y-%m-%dT%H:%M:%S") + datetime_suffix,
+            "exchange_rate": f"{rate:.10f}",
+            "legal_entity_identifier": generator.choice(leis),
+        }
+
+        if generator.random() < bad_ratio:
+            bad_column = generator.choice(["notional", "exchange_rate", "transaction_uti"])
+            transaction[bad_column] = "N/A" if bad_column == "notional" else ""
+
+        yield transaction
+
+
+# Writes the transactions to a CSV file
+def write_csv(file_path, transactions):
+    with open(file_path, "w", encoding="utf-8", newline="") as csvfile:
+        csvfile.write(",".join(columns) + "\n")
+        for transaction in transactions:
+            csvfile.write(",".join(transaction[column] for column in columns) + "\n")
+
+
+# Writes the transactions to a JSON file, the legal entity identifier is stored as "lei" as in the JSON feed
+def write_json(file_path, transactions):
+    with open(file_path, "w", encoding="utf-8") as jsonfile:
+        jsonfile.write('{\n    "transactions": [\n')
+        for index, transaction in enumerate(transactions):
+            record = {("lei" if column == "legal_entity_identifier" else column): transaction[column]
+                      for column in columns}
+            jsonfile.write(("" if index == 0 else ",\n") + "        " + json.dumps(record))
+        jsonfile.write("\n    ]\n}\n")
+
+
+# Writes the transactions to an XML file, the legal entity identifier is stored as <lei> as in the XML feed
+def write_xml(file_path, transactions):
+    with open(file_path, "w", encoding="utf-8") as xmlfile:
+        xmlfile.write('<?xml version="1.0" encoding="UTF-8"?>\n<transactions>\n')
+        for transaction in transactions:
+            xmlfile.write("  <transaction>\n")
+            for column in columns:
+                tag = "lei" if column == "legal_entity_identifier" else column
+                xmlfile.write(f"    <{tag}>{escape(transaction[column])}</{tag}>\n")
+            xmlfile.write("  </transaction>\n")
+        xmlfile.write("</transactions>\n")
+
+
+writers = {"csv": write_csv, "json": write_json, "xml": write_xml}
+
+
+# Generates a file of the given format, parameters are the same as for generate_transactions
+def generate_file(file_path, file_format, rows, bad_ratio=0.01, duplicate_ratio=0.05, currency_mix=None, seed=1):
+    datetime_suffix = "+00:00" if file_format == "xml" else "Z"
+    transactions = generate_transactions(rows, bad_ratio, duplicate_ratio, currency_mix, seed, datetime_suffix)
+    writers[file_format](file_path, transactions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic transaction files.")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--format", choices=sorted(writers), default="csv")
+    parser.add_argument("--output", required=True, help="file to write, eg. data/input/input_bench_csv.csv")
+    parser.add_argument("--bad-ratio", type=float, default=0.01)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.05)
+    parser.add_argument("--currency-mix", default="GBP=0.6,USD=0.3,EUR=0.1")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    generate_file(args.output, args.format, args.rows, args.bad_ratio, args.duplicate_ratio,
+                  parse_currency_mix(args.currency_mix), args.seed)
+
+
+if __name__ == "__main__":
+    main()
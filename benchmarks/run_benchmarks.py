@@ -0,0 +1,203 @@
+# End to end benchmark of the loading pipeline on files made by generate_data.py.
+# For every format and size it reports the rows per second and the peak memory of each stage:
+# - read: the whole file reader (read_csv / read_json / read_xml)
+# - stream: the chunked reader (read_*_chunks), iterated without keeping the chunks
+# - validate: transaction_processor.prepare_transactions on the rows read
+# - write: transaction_processor.write_transactions of the validated rows into an empty database
+# - end_to_end: file_processor.process_files on an input directory holding the file, with the settings of config.py
+# Every stage runs in a fresh process, so the memory of one stage does not hide the peak of the next.
+# Peak memory is the highest resident set size seen while the stage runs, and "+MB" its increase
+# over the resident set size when the stage started.
+# Usage: python3 benchmarks/run_benchmarks.py [--rows 10000 1000000 10000000] [--formats csv json xml]
+#        [--stages read stream validate write end_to_end] [--bad-ratio 0.01] [--duplicate-ratio 0.05]
+#        [--json results.json]
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import queue
+import argparse
+import resource
+import sqlite3
+import tempfile
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_data import generate_file  # noqa: E402
+
+stage_names = ["read", "stream", "validate", "write", "end_to_end"]
+
+
+# Returns the current resident set size in bytes
+def current_rss():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No /proc, fall back to the high water mark (kilobytes on Linux, bytes on macOS)
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+# Samples the resident set size in a background thread while the stage runs
+class PeakMemory:
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start = self.peak = current_rss()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+
+    def sample(self):
+        while not self.stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop.set()
+        self.thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+# Runs one stage on file_path in the current process and returns its measures,
+# 'rows' being the number of rows the stage handled (None for end_to_end).
+# The input of the stage is prepared before the measure starts.
+def run_stage(stage, file_path, work_dir):
+    logging.disable(logging.WARNING)
+
+    import config
+    from db_handler import apply_write_profile, create_tables
+    from file_processor import read_file, process_files
+    from transaction_processor import prepare_transactions, write_transactions
+    from read_csv import read_csv_chunks
+    from read_json import read_json_chunks
+    from read_xml import read_xml_chunks
+    from batching import DEFAULT_CHUNK_SIZE
+
+    ext = os.path.splitext(file_path)[1]
+    rows = 0
+
+    # Database of the stage in its work directory, with the write profile of db_handler.get_db_connection
+    def connect():
+        conn = sqlite3.connect(os.path.join(work_dir, "bench.db"))
+        apply_write_profile(conn)
+        create_tables(conn)
+        return conn
+
+    if stage == "read":
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            transactions = read_file(file_path, ext)
+            seconds = time.perf_counter() - start
+        rows = len(transactions)
+
+    elif stage == "stream":
+        chunk_readers = {".csv": read_csv_chunks, ".json": read_json_chunks, ".xml": read_xml_chunks}
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            for chunk in chunk_readers[ext](file_path, config.CHUNK_SIZE or DEFAULT_CHUNK_SIZE):
+                rows += len(chunk)
+            seconds = time.perf_counter() - start
+
+    elif stage == "validate":
+        transactions = read_file(file_path, ext)
+        rows = len(transactions)
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            prepare_transactions(transactions)
+            seconds = time.perf_counter() - start
+
+    elif stage == "write":
+        valid_rows = prepare_transactions(read_file(file_path, ext))
+        rows = len(valid_rows)
+        conn = connect()
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            write_transactions(valid_rows, conn)
+            seconds = time.perf_counter() - start
+        conn.close()
+
+    elif stage == "end_to_end":
+        input_path = os.path.join(work_dir, "input")
+        os.makedirs(input_path)
+        shutil.copy(file_path, os.path.join(input_path, "input_bench_" + ext[1:] + ext))
+        rows = None
+        conn = connect()
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            process_files(input_path, os.path.join(work_dir, "errored"), os.path.join(work_dir, "processed"), conn,
+                          chunk_size=config.CHUNK_SIZE, chunk_bytes=config.CHUNK_BYTES, workers=config.WORKERS)
+            seconds = time.perf_counter() - start
+        conn.close()
+
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+
+    return {"seconds": seconds, "rows": rows, "peak_mb": memory.peak / 2**20,
+            "delta_mb": (memory.peak - memory.start) / 2**20}
+
+
+def stage_process(stage, file_path, work_dir, results):
+    results.put(run_stage(stage, file_path, work_dir))
+
+
+# Runs the stage in a fresh ('spawn') process, so every stage starts from the same memory
+def measure(stage, file_path):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    with tempfile.TemporaryDirectory() as work_dir:
+        process = context.Process(target=stage_process, args=(stage, file_path, work_dir, results))
+        process.start()
+        while True:
+            try:
+                result = results.get(timeout=1)
+                break
+            except queue.Empty:
+                if not process.is_alive():
+                    raise RuntimeError(f"Stage {stage} failed with exit code {process.exitcode}")
+        process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the loading pipeline stage by stage.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000, 10000000])
+    parser.add_argument("--formats", nargs="+", choices=["csv", "json", "xml"], default=["csv", "json", "xml"])
+    parser.add_argument("--stages", nargs="+", choices=stage_names, default=stage_names)
+    parser.add_argument("--bad-ratio", type=float, default=0.01)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.05)
+    parser.add_argument("--json", help="also write the results to this file as JSON")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'format':>6} {'rows':>10} {'stage':>10} {'seconds':>9} {'rows/s':>11} {'peak MB':>9} {'+MB':>8}")
+    with tempfile.TemporaryDirectory() as data_dir:
+        for file_format in args.formats:
+            for row_count in args.rows:
+                file_path = os.path.join(data_dir, f"bench.{file_format}")
+                generate_file(file_path, file_format, row_count, args.bad_ratio, args.duplicate_ratio)
+
+                for stage in args.stages:
+                    result = measure(stage, file_path)
+                    rate = row_count / result["seconds"] if result["seconds"] else 0.0
+                    results.append({"format": file_format, "file_rows": row_count, "stage": stage,
+                                    "rows_per_second": rate, **result})
+                    print(f"{file_format:>6} {row_count:>10} {stage:>10} {result['seconds']:>9.3f} {rate:>11,.0f} "
+                          f"{result['peak_mb']:>9.1f} {result['delta_mb']:>8.1f}", flush=True)
+                os.remove(file_path)
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
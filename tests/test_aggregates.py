@@ -0,0 +1,86 @@
+import sqlite3
+import pytest
+from app.db_handler import create_tables
+from app.transaction_processor import process_transactions
+from app.aggregates import check_aggregates, rebuild_aggregates, stored_aggregates
+
+
+def make_transaction(uti, notional, currency="USD", lei="5493001KJTIIGC8Y1R12", day="2024-02-26"):
+    return {"transaction_uti": uti, "isin": "US0378331005", "notional": notional, "notional_currency": currency,
+            "transaction_type": "BUY", "transaction_datetime": f"{day}T12:00:00Z", "exchange_rate": 2.0,
+            "legal_entity_identifier": lei}
+
+
+@pytest.fixture
+def conn():
+
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    yield conn
+    conn.close()
+
+
+# Test inserts and updates keep the aggregates equal to a full recompute, with both write paths
+@pytest.mark.parametrize("staging_min_rows", [None, 1])
+def test_aggregates_follow_upserts(mocker, conn, staging_min_rows):
+
+    mocker.patch("app.transaction_processor.config.STAGING_MIN_ROWS", staging_min_rows)
+
+    process_transactions([make_transaction("TXN1", 10), make_transaction("TXN2", 20, currency="EUR"),
+                          make_transaction("TXN3", 30, day="2024-02-27")], conn)
+    # TXN1 changes currency and day, TXN2 moves to another LEI, TXN3 is unchanged
+    process_transactions([make_transaction("TXN1", 15, currency="GBP", day="2024-02-28"),
+                          make_transaction("TXN2", 20, currency="EUR", lei="529900T8BM49AURSDO55"),
+                          make_transaction("TXN3", 30, day="2024-02-27")], conn)
+
+    assert stored_aggregates(conn) == {
+        ("lei", "5493001KJTIIGC8Y1R12"): (2, 90.0), ("lei", "529900T8BM49AURSDO55"): (1, 40.0),
+        ("currency", "GBP"): (1, 30.0), ("currency", "EUR"): (1, 40.0), ("currency", "USD"): (1, 60.0),
+        ("day", "2024-02-26"): (1, 40.0), ("day", "2024-02-27"): (1, 60.0), ("day", "2024-02-28"): (1, 30.0)}
+    assert check_aggregates(conn) == []
+
+
+# Test an unchanged snapshot leaves the aggregates untouched, and the check and rebuild of a damaged table
+def test_check_and_rebuild_aggregates(conn):
+
+    process_transactions([make_transaction(f"TXN{i}", i) for i in range(1, 5)], conn)
+    changes_before = conn.total_changes
+    process_transactions([make_transaction(f"TXN{i}", i) for i in range(1, 5)], conn)
+    assert conn.total_changes == changes_before
+
+    conn.execute("UPDATE transaction_aggregates SET trade_count = 3 WHERE dimension = 'currency'")
+    conn.execute("DELETE FROM transaction_aggregates WHERE dimension = 'day'")
+    assert check_aggregates(conn) == [("currency", "USD", (3, 20.0), (4, 20.0)),
+                                      ("day", "2024-02-26", None, (4, 20.0))]
+
+    assert rebuild_aggregates(conn) == 3
+    assert check_aggregates(conn) == []
+
+
+# Test an infinite notional is aggregated, and its key worked out again once the row is updated
+@pytest.mark.parametrize("staging_min_rows", [None, 1])
+def test_aggregates_infinite_notional(mocker, conn, staging_min_rows):
+
+    mocker.patch("app.transaction_processor.config.STAGING_MIN_ROWS", staging_min_rows)
+
+    process_transactions([make_transaction("TXN1", "inf"), make_transaction("TXN2", 20)], conn)
+    assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone() == (2,)
+    assert stored_aggregates(conn)[("currency", "USD")] == (2, float("inf"))
+
+    process_transactions([make_transaction("TXN1", 10)], conn)
+    assert stored_aggregates(conn)[("currency", "USD")] == (2, 60.0)
+    assert check_aggregates(conn) == []
+
+
+# Test the aggregates of a database which already holds transactions are worked out when the table is created
+def test_aggregates_seeded_on_existing_database(conn):
+
+    process_transactions([make_transaction("TXN1", 10), make_transaction("TXN2", 20)], conn)
+    conn.execute("DROP TABLE transaction_aggregates")
+    conn.commit()
+
+    create_tables(conn)
+    process_transactions([make_transaction("TXN3", 30)], conn)
+
+    assert stored_aggregates(conn)[("currency", "USD")] == (3, 120.0)
+    assert check_aggregates(conn) == []
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+from app.db_handler import create_tables
+from app.async_pipeline import process_files_async
+from app.metrics import RunMetrics
+
+header = "transaction_uti,isin,notional,notional_currency,transaction_type,transaction_datetime,exchange_rate,legal_entity_identifier\n"
+row = "TRANS{},OM4258447851,763000.0,GBP,Sell,2024-11-25T15:06:22Z,0.0070956,NWBV00SHMKBFN1RKWK79\n"
+json_record = ('{{"transaction_uti": "TRANS{}", "isin": "OM4258447851", "notional": 1.0, "notional_currency": "GBP", '
+               '"transaction_type": "Sell", "transaction_datetime": "2024-11-25T15:06:22Z", "exchange_rate": 2.0, '
+               '"lei": "NWBV00SHMKBFN1RKWK79"}}')
+
+
+def write_file(input_path, name, content):
+    with open(os.path.join(input_path, name), "w") as input_file:
+        input_file.write(content)
+
+
+def make_dirs(tmp_path):
+    paths = [os.path.join(tmp_path, name) for name in ("input", "errored", "processed")]
+    os.makedirs(paths[0])
+    return paths
+
+
+# Test the files are loaded chunk by chunk, a failing file is rolled back and moved to errored
+# while the files around it are committed and moved to processed
+def test_process_files_async(tmp_path):
+
+    input_path, errored_path, processed_path = make_dirs(tmp_path)
+    write_file(input_path, "input_first_csv.csv", header + "".join(row.format(i) for i in range(7)))
+    # The second file is broken after its first chunk is written
+    write_file(input_path, "input_second_json.json",
+               '{"transactions": [' + json_record.format(100) + "," + json_record.format(101) + "," +
+               json_record.format(102) + ', {"transaction_uti": ')
+    write_file(input_path, "input_third_json.json", '{"transactions": [' + json_record.format(200) + "]}")
+
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    metrics = RunMetrics()
+    process_files_async(input_path, errored_path, processed_path, conn, chunk_size=2, queue_size=1, metrics=metrics)
+
+    utis = {uti for (uti,) in conn.execute("SELECT transaction_uti FROM transactions")}
+    assert utis == {f"TRANS{i}" for i in range(7)} | {"TRANS200"}
+    conn.close()
+
+    assert sorted(name.split("_")[2] for name in os.listdir(processed_path)) == ["first", "third"]
+    assert [name.split("_")[2] for name in os.listdir(errored_path)] == ["second"]
+    assert os.listdir(input_path) == []
+
+    summary = metrics.finish()
+    assert summary["files"] == {"processed": 2, "errored": 1, "skipped": 0}
+    assert summary["rows"]["inserted"] == 8
+
+
+# Test a validation error in the executor rolls back the file
+def test_process_files_async_validation_error(tmp_path, mocker):
+
+    input_path, errored_path, processed_path = make_dirs(tmp_path)
+    write_file(input_path, "input_first_csv.csv", header + "".join(row.format(i) for i in range(5)))
+    mocker.patch("app.async_pipeline.prepare_transactions", side_effect=ValueError("validation failed"))
+
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    process_files_async(input_path, errored_path, processed_path, conn, chunk_size=2)
+
+    assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 0
+    conn.close()
+    assert len(os.listdir(errored_path)) == 1
+    assert os.listdir(processed_path) == []
+
+
+# Test a file already in the ingestion ledger is skipped without being read again
+def test_process_files_async_ledger(tmp_path):
+
+    input_path, errored_path, processed_path = make_dirs(tmp_path)
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+
+    write_file(input_path, "input_first_csv.csv", header + row.format(1))
+    process_files_async(input_path, errored_path, processed_path, conn, ledger=True)
+    write_file(input_path, "input_first_csv.csv", header + row.format(1))
+    process_files_async(input_path, errored_path, processed_path, conn, ledger=True)
+
+    outcomes = [outcome for (outcome,) in conn.execute("SELECT outcome FROM ingestion_ledger ORDER BY id")]
+    assert outcomes == ["processed", "skipped"]
+    conn.close()
@@ -0,0 +1,161 @@
+import os
+import json
+import sqlite3
+import pytest
+import app.file_processor as file_processor
+from app.db_handler import create_tables
+from app.file_processor import process_files
+from app.checkpoints import load_checkpoint, save_checkpoint, clear_checkpoint, skip_rows
+from app.read_csv import read_csv_chunk_offsets
+from app.transaction_batch import to_batch
+
+header = ("transaction_uti,isin,notional,notional_currency,transaction_type,transaction_datetime,"
+          "exchange_rate,legal_entity_identifier\n")
+
+
+def csv_row(index):
+    return f"TRANS{index},OM4258447851,{1000 + index}.0,GBP,Sell,2024-11-25T15:06:22Z,0.0070956,NWBV00SHMKBFN1RKWK79\n"
+
+
+def json_row(index):
+    return {"transaction_uti": f"TRANS{index}", "isin": "OM4258447851", "notional": 1000.0 + index,
+            "notional_currency": "GBP", "transaction_type": "Sell", "transaction_datetime": "2024-11-25T15:06:22Z",
+            "exchange_rate": 0.0070956, "lei": "NWBV00SHMKBFN1RKWK79"}
+
+
+# Test the checkpoint of a file is saved, updated and cleared by checksum
+def test_save_and_clear_checkpoint():
+
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    assert load_checkpoint(conn, "abc") is None
+
+    save_checkpoint(conn, "abc", "input_data_csv.csv", 1, 3, 120)
+    save_checkpoint(conn, "abc", "input_data_csv.csv", 2, 6, 240)
+    assert load_checkpoint(conn, "abc") == (2, 6, 240)
+
+    clear_checkpoint(conn, "abc")
+    assert load_checkpoint(conn, "abc") is None
+    conn.close()
+
+
+# Test the rows already committed are skipped across chunk boundaries
+def test_skip_rows():
+
+    chunks = [to_batch([(f"TRANS{i}", None, None, None, None, None, None, None) for i in range(start, start + 3)])
+              for start in (0, 3, 6)]
+
+    resumed = list(skip_rows(iter(chunks), 4))
+
+    assert [[transaction["transaction_uti"] for transaction in chunk] for chunk in resumed] == \
+        [["TRANS4", "TRANS5"], ["TRANS6", "TRANS7", "TRANS8"]]
+
+
+# Test reading a CSV file from the offset of a chunk gives the rows after that chunk
+def test_read_csv_chunk_offsets_resume(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_data_csv.csv")
+    with open(file_path, "w") as csvfile:
+        csvfile.write(header + "".join(csv_row(i) for i in range(7)))
+
+    chunks = list(read_csv_chunk_offsets(file_path, chunk_size=3))
+    assert [len(chunk) for chunk, _ in chunks] == [3, 3, 1]
+    assert chunks[-1][1] == os.path.getsize(file_path)
+
+    resumed = list(read_csv_chunk_offsets(file_path, chunk_size=3, start_offset=chunks[0][1]))
+
+    assert [[transaction["transaction_uti"] for transaction in chunk] for chunk, _ in resumed] == \
+        [["TRANS3", "TRANS4", "TRANS5"], ["TRANS6"]]
+    assert [offset for _, offset in resumed] == [offset for _, offset in chunks[1:]]
+
+
+# Test a load which fails in the middle of a file resumes after the last chunk committed
+@pytest.mark.parametrize("extension", [".csv", ".json"])
+def test_process_files_resumes_after_checkpoint(tmp_path, mocker, extension):
+
+    mocker.patch("app.file_processor.config.COMMIT_ROWS", 3)
+    input_path = os.path.join(tmp_path, "input")
+    errored_path = os.path.join(tmp_path, "errored")
+    processed_path = os.path.join(tmp_path, "processed")
+    for path in (input_path, errored_path, processed_path):
+        os.makedirs(path)
+
+    conn = sqlite3.connect(os.path.join(tmp_path, "test.db"))
+    create_tables(conn)
+
+    file_path = os.path.join(input_path, "input_data_" + extension[1:] + extension)
+
+    def write_file():
+        with open(file_path, "w") as input_file:
+            if extension == ".csv":
+                input_file.write(header + "".join(csv_row(i) for i in range(10)))
+            else:
+                json.dump({"transactions": [json_row(i) for i in range(10)]}, input_file)
+
+    # The third chunk fails, as if the process died while writing it
+    process_transactions = file_processor.process_transactions
+    chunks_written = []
+
+    def failing_process_transactions(chunk, conn, commit=True):
+        chunks_written.append([transaction["transaction_uti"] for transaction in chunk])
+        if len(chunks_written) == 3:
+            raise OSError("disk I/O error")
+        return process_transactions(chunk, conn, commit)
+
+    mocker.patch("app.file_processor.process_transactions", side_effect=failing_process_transactions)
+
+    write_file()
+    process_files(input_path, errored_path, processed_path, conn, chunk_size=3, checkpoints=True)
+
+    assert len(os.listdir(errored_path)) == 1
+    assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone() == (6,)
+    chunks_committed, rows_read, byte_offset = conn.execute(
+        "SELECT chunks_committed, rows_read, byte_offset FROM load_checkpoints").fetchone()
+    assert (chunks_committed, rows_read) == (2, 6)
+    assert (byte_offset is None) == (extension != ".csv")
+
+    # Same file dropped again: only the rows after the checkpoint are read and written
+    chunks_written.clear()
+    write_file()
+    process_files(input_path, errored_path, processed_path, conn, chunk_size=3, checkpoints=True)
+
+    assert chunks_written == [["TRANS6", "TRANS7", "TRANS8"], ["TRANS9"]]
+    assert len(os.listdir(processed_path)) == 1
+    assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone() == (10,)
+    assert conn.execute("SELECT COUNT(*) FROM load_checkpoints").fetchone() == (0,)
+    conn.close()
+
+
+# Test COMMIT_ROWS smaller than a chunk does not commit part of a chunk without its checkpoint
+def test_checkpoint_commit_rows_below_chunk_size(tmp_path, mocker):
+
+    mocker.patch("app.file_processor.config.COMMIT_ROWS", 2)
+    input_path = os.path.join(tmp_path, "input")
+    errored_path = os.path.join(tmp_path, "errored")
+    processed_path = os.path.join(tmp_path, "processed")
+    for path in (input_path, errored_path, processed_path):
+        os.makedirs(path)
+
+    conn = sqlite3.connect(os.path.join(tmp_path, "test.db"))
+    create_tables(conn)
+    file_path = os.path.join(input_path, "input_data_csv.csv")
+    with open(file_path, "w") as csvfile:
+        csvfile.write(header + "".join(csv_row(i) for i in range(10)))
+
+    # The checkpoint of the third chunk fails, once its rows are written
+    save_checkpoint = file_processor.save_checkpoint
+    checkpoints_saved = []
+
+    def failing_save_checkpoint(conn, checksum, file, chunks_committed, rows_read, byte_offset):
+        checkpoints_saved.append(chunks_committed)
+        if chunks_committed == 3:
+            raise OSError("disk I/O error")
+        save_checkpoint(conn, checksum, file, chunks_committed, rows_read, byte_offset)
+
+    mocker.patch("app.file_processor.save_checkpoint", side_effect=failing_save_checkpoint)
+    process_files(input_path, errored_path, processed_path, conn, chunk_size=3, checkpoints=True)
+
+    assert checkpoints_saved == [1, 2, 3]
+    assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone() == (6,)
+    assert conn.execute("SELECT chunks_committed, rows_read FROM load_checkpoints").fetchone() == (2, 6)
+    conn.close()
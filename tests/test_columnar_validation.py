@@ -0,0 +1,52 @@
+from app.columnar_validation import validate_transactions
+from app.transaction_batch import to_float
+from app.transaction_processor import transaction_validations
+
+
+def make_transaction(uti, notional, exchange_rate, isin="US0378331005", lei="5493001KJTIIGC8Y1R12"):
+    return {"transaction_uti": uti, "isin": isin, "notional": notional, "notional_currency": "USD",
+            "transaction_type": "BUY", "transaction_datetime": "2024-02-26T12:00:00", "exchange_rate": exchange_rate,
+            "legal_entity_identifier": lei}
+
+
+# Test columnar engine accepts and rejects the same rows as the pandas engine
+def test_validate_transactions_matches_pandas():
+
+    transactions = [
+        make_transaction("TXN1", 100, 1.1),
+        make_transaction("", "200", "0.9"),            # Invalid (empty transaction_uti)
+        make_transaction(None, "200", "0.9"),          # Invalid (missing transaction_uti)
+        make_transaction("TXN2", "US12347", "GBP"),    # Invalid (Notional Value and Exchange rate)
+        make_transaction("TXN3", " 1.957E7 ", "0.5"),
+        make_transaction("TXN4", "1_000", "0.5"),      # Invalid for pandas.to_numeric
+        make_transaction("TXN5", "", "0.5"),           # Invalid (empty notional)
+        make_transaction("TXN6", "nan", "0.5"),        # Invalid (NaN notional)
+        make_transaction("TXN7", "10", None),          # Invalid (missing exchange rate)
+        make_transaction("Null", "10", "2"),           # Reported as bad data but kept, as in pandas engine
+        make_transaction(123, "+3", "inf"),
+        make_transaction("TXN8", "10", "2", isin="US0378331006"),          # Invalid (ISIN check digit)
+        make_transaction("TXN9", "10", "2", lei="5493001KJTIIGC8Y1R13"),   # Invalid (LEI check digits)
+        make_transaction("TXN10", "10", "2", isin=None),                   # Invalid (missing ISIN)
+    ]
+
+    rows = validate_transactions(transactions)
+
+    df = transaction_validations(transactions)
+    df["amount_eur"] = df["notional"] * df["exchange_rate"]
+    expected = list(df.itertuples(index=False, name=None))
+
+    assert rows == expected
+    assert [row[0] for row in rows] == ["TXN1", "TXN3", "Null", "123"]
+    assert rows[1][2] == 19570000.0
+    assert rows[1][8] == 19570000.0 * 0.5
+
+
+# Test conversion of single values to float
+def test_to_float():
+
+    assert to_float("1.5") == 1.5
+    assert to_float(" 2 ") == 2.0
+    assert to_float(7) == 7.0
+    assert to_float("abc") != to_float("abc")  # NaN
+    assert to_float(None) != to_float(None)
+    assert to_float("1_000") != to_float("1_000")
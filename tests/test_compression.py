@@ -0,0 +1,80 @@
+import os
+import bz2
+import gzip
+import lzma
+import sqlite3
+import pytest
+from app.db_handler import create_tables
+from app.file_processor import process_files
+from app.compression import sniff_compression, split_file_name
+from app.read_csv import read_csv, read_csv_chunk_offsets
+from app.read_xml import read_xml
+
+csv_data = ("transaction_uti,isin,notional,notional_currency,transaction_type,transaction_datetime,exchange_rate,legal_entity_identifier\n"
+            + "".join(f"TRANS{i},US0378331005,{i}.0,GBP,Sell,2024-11-25T15:06:22Z,0.5,5493001KJTIIGC8Y1R12\n"
+                      for i in range(5)))
+
+xml_data = ("<transactions><transaction><transaction_uti>TRANS1</transaction_uti><isin>US0378331005</isin>"
+            "<notional>1.0</notional><notional_currency>GBP</notional_currency><transaction_type>Sell</transaction_type>"
+            "<transaction_datetime>2024-11-25T15:06:22Z</transaction_datetime><exchange_rate>0.5</exchange_rate>"
+            "<lei>5493001KJTIIGC8Y1R12</lei></transaction></transactions>")
+
+codecs = [(gzip.open, ".gz"), (bz2.open, ".bz2"), (lzma.open, ".xz")]
+
+
+def write_compressed(file_path, codec_open, data):
+    with codec_open(file_path, "wt", encoding="utf-8") as compressed_file:
+        compressed_file.write(data)
+
+
+# Test the file names are split into name, format and compression suffix
+def test_split_file_name():
+
+    assert split_file_name("input_data_csv.csv") == ("input_data_csv", ".csv", "")
+    assert split_file_name("input_data_csv.csv.gz") == ("input_data_csv", ".csv", ".gz")
+    assert split_file_name("input_data_ndjson.ndjson.XZ") == ("input_data_ndjson", ".ndjson", ".XZ")
+
+
+# Test the compression is found from the first bytes, whatever the name of the file,
+# and the readers see the decompressed content
+@pytest.mark.parametrize("codec_open, suffix", codecs)
+def test_read_compressed(tmp_path, codec_open, suffix):
+
+    plain_path = os.path.join(tmp_path, "input_data_csv.csv")
+    with open(plain_path, "w") as csvfile:
+        csvfile.write(csv_data)
+    compressed_path = os.path.join(tmp_path, "input_data_csv.csv")
+    write_compressed(compressed_path + suffix, codec_open, csv_data)
+    xml_path = os.path.join(tmp_path, "input_data_xml.xml")
+    write_compressed(xml_path, codec_open, xml_data)
+
+    assert sniff_compression(plain_path) is None
+    assert sniff_compression(compressed_path + suffix) is codec_open
+    assert list(read_csv(compressed_path + suffix)) == list(read_csv(plain_path))
+    assert [row["transaction_uti"] for row in read_xml(xml_path)] == ["TRANS1"]
+
+    # The offsets of the chunks are in the decompressed content, a resume seeks through the codec
+    chunks = list(read_csv_chunk_offsets(compressed_path + suffix, chunk_size=2))
+    resumed = list(read_csv_chunk_offsets(compressed_path + suffix, chunk_size=2, start_offset=chunks[0][1]))
+    assert [list(chunk) for chunk, _ in resumed] == [list(chunk) for chunk, _ in chunks[1:]]
+
+
+# Test a compressed file is loaded and moved to processed under its own name
+def test_process_files_compressed(tmp_path):
+
+    input_path = os.path.join(tmp_path, "input")
+    errored_path = os.path.join(tmp_path, "errored")
+    processed_path = os.path.join(tmp_path, "processed")
+    for path in (input_path, errored_path, processed_path):
+        os.makedirs(path)
+
+    conn = sqlite3.connect(os.path.join(tmp_path, "test.db"))
+    create_tables(conn)
+    write_compressed(os.path.join(input_path, "input_data_csv.csv.gz"), gzip.open, csv_data)
+
+    process_files(input_path, errored_path, processed_path, conn, chunk_size=2)
+
+    assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone() == (5,)
+    [processed_file] = os.listdir(processed_path)
+    assert processed_file.startswith("processed_input_data_csv_") and processed_file.endswith(".csv.gz")
+    conn.close()
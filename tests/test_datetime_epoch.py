@@ -0,0 +1,36 @@
+import sqlite3
+from app.datetime_epoch import epoch_list
+from app.db_handler import create_tables
+
+
+# Test the datetime formats of the feeds give the same UTC epoch, offsets and fractions of second included
+def test_epoch_list():
+
+    epochs = epoch_list(["2024-11-25T15:06:22Z", "2024-11-25T15:06:22+00:00", "2024-11-25T17:06:22+02:00",
+                         "2024-11-25T09:36:22.5-05:30", "2024-11-25 15:06:22.123456789", "2024-11-25",
+                         "2024-02-29T00:00:00", "1969-12-31T23:59:59Z"])
+
+    assert epochs == [1732547182000000, 1732547182000000, 1732547182000000, 1732547182500000,
+                      1732547182123456, 1732492800000000, 1709164800000000, -1000000]
+
+
+# Test missing and invalid datetimes have no epoch
+def test_epoch_list_invalid():
+
+    assert epoch_list([None, "", "nan", "2023-02-29T00:00:00", "2024-11-25T24:00:00", "2024-11-25T15:06:22+2:00",
+                       "2024-11-25T15:06:22Zulu", "25/11/2024"]) == [None] * 8
+
+
+# Test the epoch is filled in for the rows of a database created before the column existed
+def test_create_tables_fills_epoch():
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""CREATE TABLE transactions (transaction_uti TEXT PRIMARY KEY, isin TEXT, notional REAL,
+                    notional_currency TEXT, transaction_type TEXT, transaction_datetime TEXT, exchange_rate REAL,
+                    legal_entity_identifier TEXT, amount_eur REAL, row_hash TEXT)""")
+    conn.executemany("INSERT INTO transactions (transaction_uti, transaction_datetime) VALUES (?, ?)",
+                     [("TRANS1", "2024-11-25T15:06:22Z"), ("TRANS2", "2024-11-25T17:06:22.250+02:00"), ("TRANS3", "")])
+    create_tables(conn)
+
+    assert conn.execute("SELECT transaction_epoch_us FROM transactions ORDER BY transaction_uti").fetchall() == [
+        (1732547182000000,), (1732547182250000,), (None,)]
@@ -45,3 +45,14 @@ def test_get_db_connection():
     assert table_exists is not None
 
     conn.close()
+
+
+# Test the write profile from config is applied to new connections
+def test_get_db_connection_write_profile():
+
+    conn = get_db_connection()
+
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    conn.close()
@@ -1,7 +1,8 @@
 import os
 import shutil
 import pandas as pd
-from app.read_csv import read_csv
+from app.read_csv import read_csv, read_csv_chunks
+import pytest
 from app.db_handler import get_db_connection, setup_database
 from app.config import INPUT_PATH, ERROR_PATH, PROCESSED_PATH, DB_NAME,DB_PATH
 from app.file_processor import process_files
@@ -197,3 +198,72 @@ def test_missing_columns_csv(mocker):
     # records inserted should be zero in case of missing column in the file
     assert mock_cursor.executemany.called == 0
     assert len(rows) == 0
+
+
+# Helper to write a csv file with the given number of valid rows
+def write_csv_rows(file_path, row_count):
+    data = [{"transaction_uti": f"TRANS{i}",
+             "isin": "OM4258447851",
+             "notional": 763000.0,
+             "notional_currency": "GBP",
+             "transaction_type": "Sell",
+             "transaction_datetime": "2024-11-25T15:06:22Z",
+             "exchange_rate": 0.0070956000,
+             "legal_entity_identifier": "NWBV00SHMKBFN1RKWK79"
+             } for i in range(row_count)]
+    pd.DataFrame(data).to_csv(file_path, index=False)
+
+
+# Test streaming read of csv file in fixed size chunks
+def test_read_csv_chunks_by_rows(tmp_path):
+
+    csv_file_path = os.path.join(tmp_path, "input_data_csv.csv")
+    write_csv_rows(csv_file_path, 25)
+
+    chunks = list(read_csv_chunks(csv_file_path, chunk_size=10))
+
+    # 25 rows should be split into 10 + 10 + 5
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert chunks[0][0]["transaction_uti"] == "TRANS0"
+    assert chunks[-1][-1]["transaction_uti"] == "TRANS24"
+    # Streamed rows should be same as rows read in one go
+    assert [row for chunk in chunks for row in chunk] == list(read_csv(csv_file_path))
+
+
+# Test streaming read of csv file with a byte budget per chunk
+def test_read_csv_chunks_by_bytes(tmp_path):
+
+    csv_file_path = os.path.join(tmp_path, "input_data_csv.csv")
+    write_csv_rows(csv_file_path, 20)
+
+    # Every row in the file is longer than 50 bytes, so each chunk holds one row
+    chunks = list(read_csv_chunks(csv_file_path, chunk_size=None, chunk_bytes=50))
+
+    assert len(chunks) == 20
+    assert all(len(chunk) == 1 for chunk in chunks)
+
+
+# Test quoted values spanning multiple lines are kept in a single row
+def test_read_csv_chunks_quoted_newline(tmp_path):
+
+    csv_file_path = os.path.join(tmp_path, "input_data_csv.csv")
+    with open(csv_file_path, "w", newline="", encoding="utf-8") as csvfile:
+        csvfile.write("transaction_uti,isin,notional,notional_currency,transaction_type,"
+                      "transaction_datetime,exchange_rate,legal_entity_identifier\n")
+        csvfile.write('TRANS1,OM4258447851,763000.0,GBP,"Sell\nBuy",2024-11-25T15:06:22Z,0.007,NWBV00SHMKBFN1RKWK79\n')
+        csvfile.write("TRANS2,OM4258447851,763000.0,GBP,Sell,2024-11-25T15:06:22Z,0.007,NWBV00SHMKBFN1RKWK79\n")
+
+    chunks = list(read_csv_chunks(csv_file_path, chunk_size=1))
+
+    assert len(chunks) == 2
+    assert chunks[0][0]["transaction_type"] == "Sell\nBuy"
+
+
+# Test missing columns are reported before any chunk is returned
+def test_read_csv_chunks_missing_columns(tmp_path):
+
+    csv_file_path = os.path.join(tmp_path, "input_data_csv.csv")
+    pd.DataFrame([{"transaction_uti": "TRANS1", "notional": 1.0}]).to_csv(csv_file_path, index=False)
+
+    with pytest.raises(ValueError, match="Missing required columns"):
+        next(read_csv_chunks(csv_file_path, chunk_size=10))
@@ -1,6 +1,10 @@
+import os
+import sqlite3
 import pytest
 from unittest.mock import MagicMock
+import app.file_processor as file_processor
 from app.file_processor import process_files
+from app.db_handler import create_tables
 
 # Testcases  for the file load functionality.
 @pytest.fixture
@@ -12,13 +16,14 @@ def mock_db_connection(mocker):
     return mock_conn, mock_cursor
 
 
-@pytest.mark.parametrize("file_name, read_function, extension", [
-    ("input_dataset_csv", "read_csv", ".csv"),
-    ("input_dataset_json", "read_json", ".json"),
-    ("input_dataset_xml", "read_xml", ".xml"),
+@pytest.mark.parametrize("file_name, extension", [
+    ("input_dataset_csv", ".csv"),
+    ("input_dataset_json", ".json"),
+    ("input_dataset_xml", ".xml"),
+    ("input_dataset_ndjson", ".ndjson"),
 ])
 # Test processing of CSV, JSON, and XML files , present in input directory
-def test_process_files_various_formats(mocker, mock_db_connection, file_name, read_function, extension):
+def test_process_files_various_formats(mocker, mock_db_connection, file_name, extension):
     
     mock_conn, _ = mock_db_connection
 
@@ -39,8 +44,9 @@ def test_process_files_various_formats(mocker, mock_db_connection, file_name, re
         "legal_entity_identifier": "NWBV00SHMKBFN1RKWK79"
     }]
 
-    # Mock individual file read functions called for file_processor read_csv , read_json , read_xml
-    mocker.patch(f"app.file_processor.{read_function}", return_value=mock_transactions)
+    # Mock the reader registered for the extension (read_csv, read_json, read_xml, read_ndjson)
+    reader = file_processor.readers[extension]
+    mocker.patch.dict(file_processor.readers, {extension: reader._replace(read=MagicMock(return_value=mock_transactions))})
 
     # Mock process_transactions called from file_processor
     mock_process_transactions = mocker.patch("app.file_processor.process_transactions")
@@ -49,7 +55,8 @@ def test_process_files_various_formats(mocker, mock_db_connection, file_name, re
     process_files("input_path", "error_path", "processed_path", mock_conn)
 
     # Assertions
-    mock_process_transactions.assert_called_once_with(mock_transactions, mock_conn)  # Ensure it's called once with expected args
+    mock_process_transactions.assert_called_once_with(mock_transactions, mock_conn, commit=False)  # Ensure it's called once with expected args
+    mock_conn.commit.assert_called_once()  # Rows and rejected rows of the file are committed together
     mock_shutil.assert_called_once()  # Ensure file was moved to processed folder
 
 
@@ -141,3 +148,66 @@ def test_process_files_error_handling(mocker, mock_db_connection):
 
     # Ensure file is moved to error folder
     mock_shutil.assert_called_once()
+
+
+# Test streaming mode sends every chunk of a CSV file for processing as soon as it is read
+def test_process_files_streaming_csv(mocker, mock_db_connection):
+
+    mock_conn, _ = mock_db_connection
+
+    # Mock file system
+    mocker.patch("os.path.isdir", return_value=True)
+    mocker.patch("os.listdir", return_value=["input_dataset_csv.csv"])
+    mock_shutil = mocker.patch("shutil.move")
+
+    # Mock the chunked reader to return two chunks
+    chunks = [[{"transaction_uti": "TRANS1"}], [{"transaction_uti": "TRANS2"}]]
+    mock_read_csv = MagicMock()
+    reader = file_processor.readers[".csv"]
+    mocker.patch.dict(file_processor.readers, {".csv": reader._replace(read=mock_read_csv,
+                                                                       read_chunks=MagicMock(return_value=iter(chunks)))})
+    mock_process_transactions = mocker.patch("app.file_processor.process_transactions")
+
+    # Call function in streaming mode
+    process_files("input_path", "error_path", "processed_path", mock_conn, chunk_size=1)
+
+    # Each chunk is processed separately and the whole file is never read in one go
+    assert mock_process_transactions.call_count == 2
+    mock_process_transactions.assert_any_call(chunks[0], mock_conn, commit=False)
+    mock_process_transactions.assert_any_call(chunks[1], mock_conn, commit=False)
+    mock_read_csv.assert_not_called()
+    # All chunks of the file are committed together
+    mock_conn.commit.assert_called_once()
+    mock_shutil.assert_called_once()
+
+
+# Test parallel mode loads every file with the workers, keeps the outcome per file
+# and takes the last file (by name) for a transaction_uti present in several files
+def test_process_files_parallel(tmp_path):
+
+    input_path = os.path.join(tmp_path, "input")
+    errored_path = os.path.join(tmp_path, "errored")
+    processed_path = os.path.join(tmp_path, "processed")
+    os.makedirs(input_path)
+
+    header = "transaction_uti,isin,notional,notional_currency,transaction_type,transaction_datetime,exchange_rate,legal_entity_identifier\n"
+    row = "{uti},OM4258447851,{notional},GBP,Sell,2024-11-25T15:06:22Z,0.5,NWBV00SHMKBFN1RKWK79\n"
+    for name, notional in [("input_dataset_a", 100.0), ("input_dataset_b", 200.0), ("input_dataset_c", 300.0)]:
+        with open(os.path.join(input_path, name + ".csv"), "w") as csvfile:
+            csvfile.write(header + row.format(uti="SHARED", notional=notional) + row.format(uti=name, notional=notional))
+    # File with missing columns should be moved to errored folder
+    with open(os.path.join(input_path, "input_dataset_d.csv"), "w") as csvfile:
+        csvfile.write("transaction_uti\nTRANS1\n")
+
+    conn = sqlite3.connect(os.path.join(tmp_path, "test.db"))
+    create_tables(conn)
+
+    process_files(input_path, errored_path, processed_path, conn, workers=2)
+
+    rows = dict(conn.execute("SELECT transaction_uti, notional FROM transactions").fetchall())
+    conn.close()
+
+    assert rows == {"SHARED": 300.0, "input_dataset_a": 100.0, "input_dataset_b": 200.0, "input_dataset_c": 300.0}
+    assert len(os.listdir(processed_path)) == 3
+    assert len(os.listdir(errored_path)) == 1
+    assert os.listdir(input_path) == []
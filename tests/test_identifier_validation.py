@@ -0,0 +1,29 @@
+from app.identifier_validation import valid_isins, valid_leis
+
+
+# Test ISIN check digit validation, letters count as two digits in the Luhn check
+def test_valid_isins():
+
+    isins = ["US0378331005", "AU0000XVGZA3", "DE000BAY0017",
+             "US0378331006",    # Wrong check digit
+             "AU0000XVGZA4",    # Wrong check digit
+             "us0378331005",    # Lower case country code
+             "US03783310O5",    # Letter O in place of digit 0
+             "US037833100",     # Too short
+             "US03783310051",   # Too long
+             "", None, float("nan")]
+
+    assert valid_isins(isins).tolist() == [True, True, True] + [False] * 9
+
+
+# Test LEI mod 97 check digit validation
+def test_valid_leis():
+
+    leis = ["5493001KJTIIGC8Y1R12", "529900T8BM49AURSDO55",
+            "5493001KJTIIGC8Y1R13",     # Wrong check digits
+            "549300IKJTIIGC8Y1R12",     # Letter I in place of digit 1
+            "5493001KJTIIGC8Y1R1",      # Too short
+            "5493001KJTIIGC8Y1R1Z",     # Check digits must be digits
+            None]
+
+    assert valid_leis(leis).tolist() == [True, True] + [False] * 5
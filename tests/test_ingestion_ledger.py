@@ -0,0 +1,104 @@
+import os
+import hashlib
+import sqlite3
+import pytest
+from app.db_handler import create_tables
+from app.file_processor import process_files
+from app.ingestion_ledger import file_checksum, is_ingested, record_ingestion
+
+csv_data = ("transaction_uti,isin,notional,notional_currency,transaction_type,transaction_datetime,exchange_rate,legal_entity_identifier\n"
+            "TRANS1,OM4258447851,763000.0,GBP,Sell,2024-11-25T15:06:22Z,0.0070956,NWBV00SHMKBFN1RKWK79\n"
+            "TRANS2,OM4258447851,abc,GBP,Sell,2024-11-25T15:06:22Z,0.0070956,NWBV00SHMKBFN1RKWK79\n")
+
+
+# Test checksum read in blocks is same as checksum of the whole file
+def test_file_checksum(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_data_csv.csv")
+    with open(file_path, "w") as csvfile:
+        csvfile.write(csv_data * 100)
+
+    with open(file_path, "rb") as csvfile:
+        expected = hashlib.sha256(csvfile.read()).hexdigest()
+
+    assert file_checksum(file_path, block_size=7) == expected
+
+
+# Test only successfully processed files count as ingested
+def test_is_ingested():
+
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+
+    record_ingestion(conn, "input_data_csv.csv", "abc", 10, {}, "errored", 0.1)
+    assert not is_ingested(conn, "abc")
+
+    record_ingestion(conn, "input_data_csv.csv", "abc", 10, {"read": 2}, "processed", 0.1)
+    assert is_ingested(conn, "abc")
+    conn.close()
+
+
+# Test a file dropped again with the same content is skipped and every attempt is recorded
+@pytest.mark.parametrize("workers", [None, 2])
+def test_process_files_skips_ingested_file(tmp_path, workers):
+
+    input_path = os.path.join(tmp_path, "input")
+    errored_path = os.path.join(tmp_path, "errored")
+    processed_path = os.path.join(tmp_path, "processed")
+    os.makedirs(input_path)
+
+    conn = sqlite3.connect(os.path.join(tmp_path, "test.db"))
+    create_tables(conn)
+
+    file_path = os.path.join(input_path, "input_data_csv.csv")
+    with open(file_path, "w") as csvfile:
+        csvfile.write(csv_data)
+    process_files(input_path, errored_path, processed_path, conn, workers=workers, ledger=True)
+
+    # Change the loaded row, it would be overwritten if the file was loaded again
+    conn.execute("UPDATE transactions SET notional = 0")
+    conn.commit()
+
+    # Same file is dropped again under the same name
+    with open(file_path, "w") as csvfile:
+        csvfile.write(csv_data)
+    process_files(input_path, errored_path, processed_path, conn, workers=workers, ledger=True)
+
+    assert os.listdir(input_path) == []
+    assert conn.execute("SELECT notional FROM transactions").fetchall() == [(0,)]
+
+    ledger = conn.execute("""SELECT file_name, rows_read, rows_valid, rows_rejected, rows_inserted, outcome
+                             FROM ingestion_ledger ORDER BY id""").fetchall()
+    conn.close()
+
+    assert ledger == [("input_data_csv.csv", 2, 1, 1, 1, "processed"),
+                      ("input_data_csv.csv", 0, 0, 0, 0, "skipped")]
+
+
+# Test identical files dropped together are loaded once, whichever way the files are processed
+@pytest.mark.parametrize("mode", ["serial", "parallel", "async"])
+def test_identical_files_in_one_run(tmp_path, mode):
+
+    input_path = os.path.join(tmp_path, "input")
+    errored_path = os.path.join(tmp_path, "errored")
+    processed_path = os.path.join(tmp_path, "processed")
+    os.makedirs(input_path)
+
+    conn = sqlite3.connect(os.path.join(tmp_path, "test.db"))
+    create_tables(conn)
+
+    for name in ("input_data_csv.csv", "input_datb_csv.csv", "input_datc_csv.csv"):
+        with open(os.path.join(input_path, name), "w") as csvfile:
+            csvfile.write(csv_data)
+
+    if mode == "async":
+        from app.async_pipeline import process_files_async
+        process_files_async(input_path, errored_path, processed_path, conn, workers=2, ledger=True)
+    else:
+        process_files(input_path, errored_path, processed_path, conn, workers=2 if mode == "parallel" else None,
+                      ledger=True)
+
+    outcomes = [outcome for outcome, in conn.execute("SELECT outcome FROM ingestion_ledger ORDER BY id")]
+    conn.close()
+
+    assert outcomes == ["processed", "skipped", "skipped"]
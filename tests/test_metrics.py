@@ -0,0 +1,66 @@
+import os
+import json
+import sqlite3
+from app.db_handler import create_tables
+from app.file_processor import process_files
+from app.metrics import RunMetrics
+
+csv_data = ("transaction_uti,isin,notional,notional_currency,transaction_type,transaction_datetime,exchange_rate,legal_entity_identifier\n"
+            "TRANS1,OM4258447851,763000.0,GBP,Sell,2024-11-25T15:06:22Z,0.0070956,NWBV00SHMKBFN1RKWK79\n"
+            "TRANS2,OM4258447851,abc,GBP,Sell,2024-11-25T15:06:22Z,0.0070956,NWBV00SHMKBFN1RKWK79\n")
+
+
+# Test every file and the run summary are exported as JSON lines and in Prometheus text format
+def test_process_files_exports_metrics(tmp_path):
+
+    input_path = os.path.join(tmp_path, "input")
+    os.makedirs(input_path)
+    with open(os.path.join(input_path, "input_data_csv.csv"), "w") as csvfile:
+        csvfile.write(csv_data)
+    with open(os.path.join(input_path, "input_bad_json.json"), "w") as jsonfile:
+        jsonfile.write("{not json")
+
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    jsonl_path = os.path.join(tmp_path, "metrics", "run.jsonl")
+    prometheus_path = os.path.join(tmp_path, "metrics", "run.prom")
+    metrics = RunMetrics(jsonl_path, prometheus_path)
+
+    process_files(input_path, os.path.join(tmp_path, "errored"), os.path.join(tmp_path, "processed"), conn,
+                  metrics=metrics)
+    metrics.finish()
+    conn.close()
+
+    with open(jsonl_path) as jsonl_file:
+        errored, processed, summary = [json.loads(line) for line in jsonl_file]
+
+    assert (errored["file"], errored["outcome"]) == ("input_bad_json.json", "errored")
+    assert (processed["file"], processed["outcome"]) == ("input_data_csv.csv", "processed")
+    assert processed["rows"] == {"read": 2, "valid": 1, "rejected": 1, "collapsed": 0, "inserted": 1, "updated": 0, "unchanged": 0}
+    assert processed["bytes_read"] == len(csv_data)
+    assert processed["commits"] == 1
+    assert all(seconds >= 0 for seconds in processed["stage_seconds"].values())
+    assert processed["stage_seconds"]["validate"] > 0
+
+    assert summary["type"] == "run"
+    assert summary["files"] == {"processed": 1, "errored": 1, "skipped": 0}
+    assert summary["rows"]["inserted"] == 1
+
+    with open(prometheus_path) as prometheus_file:
+        lines = prometheus_file.read().splitlines()
+    assert 'cdp_files_total{outcome="processed"} 1' in lines
+    assert 'cdp_rows_total{kind="rejected"} 1' in lines
+    assert "# TYPE cdp_stage_seconds_total counter" in lines
+    assert not os.path.exists(prometheus_path + ".tmp")
+
+
+# Test metrics paths set to None disable the exports
+def test_metrics_without_paths(tmp_path):
+
+    metrics = RunMetrics()
+    record = metrics.record_file("input_data_csv.csv", "skipped", {}, 0.5)
+    summary = metrics.finish()
+
+    assert record["rows"]["read"] == 0
+    assert summary["files"]["skipped"] == 1
+    assert os.listdir(tmp_path) == []
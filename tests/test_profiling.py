@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import tracemalloc
+import pytest
+from app.db_handler import create_tables
+from app.file_processor import process_files
+from app.profiling import FileProfiler
+
+csv_data = ("transaction_uti,isin,notional,notional_currency,transaction_type,transaction_datetime,exchange_rate,legal_entity_identifier\n"
+            "TRANS1,OM4258447851,763000.0,GBP,Sell,2024-11-25T15:06:22Z,0.0070956,NWBV00SHMKBFN1RKWK79\n")
+
+
+# Test a profile report is written next to the processed file and next to the errored file
+def test_process_files_writes_profile_reports(tmp_path):
+
+    input_path = os.path.join(tmp_path, "input")
+    errored_path = os.path.join(tmp_path, "errored")
+    processed_path = os.path.join(tmp_path, "processed")
+    os.makedirs(input_path)
+    with open(os.path.join(input_path, "input_data_csv.csv"), "w") as csvfile:
+        csvfile.write(csv_data)
+    with open(os.path.join(input_path, "input_bad_json.json"), "w") as jsonfile:
+        jsonfile.write("{not json")
+
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    process_files(input_path, errored_path, processed_path, conn, profile="all")
+    conn.close()
+
+    processed_files = sorted(os.listdir(processed_path))
+    assert len(processed_files) == 2
+    assert processed_files[1] == processed_files[0] + ".profile.txt"
+    with open(os.path.join(processed_path, processed_files[1])) as report_file:
+        report = report_file.read()
+    assert "Profile of input_data_csv.csv (processed)" in report
+    assert "Peak traced memory" in report
+    assert "read " in report and "validate " in report and "write " in report
+    assert "functions by cumulative time" in report
+    assert "process_transactions" in report
+
+    errored_files = sorted(os.listdir(errored_path))
+    assert errored_files[1] == errored_files[0] + ".profile.txt"
+    assert not tracemalloc.is_tracing()
+
+
+# Test the cProfile mode does not trace memory
+def test_cprofile_mode_only():
+
+    with FileProfiler("cprofile") as profiler:
+        sum(range(1000))
+
+    report = profiler.report("input_data_csv.csv", "processed")
+    assert "functions by cumulative time" in report
+    assert "Peak traced memory" not in report
+
+
+def test_unsupported_profile_mode():
+
+    with pytest.raises(ValueError):
+        FileProfiler("perf")
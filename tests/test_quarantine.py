@@ -0,0 +1,112 @@
+import os
+import csv
+import sqlite3
+import pytest
+from app import config
+from app.db_handler import create_tables
+from app.file_processor import process_files
+from app.async_pipeline import process_files_async
+from app.columnar_validation import validate_transactions
+from app.transaction_processor import transaction_validations
+# Imported as the engines import it (app is on the pythonpath), so the active quarantine is shared with them
+from quarantine import Quarantine, first_failures
+
+header = "transaction_uti,isin,notional,notional_currency,transaction_type,transaction_datetime,exchange_rate,legal_entity_identifier\n"
+rows = ("TRANS1,OM4258447851,763000.0,GBP,Sell,2024-11-25T15:06:22Z,0.0070956,NWBV00SHMKBFN1RKWK79\n"
+        ",OM4258447851,763000.0,GBP,Sell,2024-11-25T15:06:22Z,0.0070956,NWBV00SHMKBFN1RKWK79\n"
+        "TRANS3,OM4258447851,abc,GBP,Sell,2024-11-25T15:06:22Z,xyz,NWBV00SHMKBFN1RKWK79\n"
+        "TRANS4,OM4258447851,10,GBP,Sell,2024-11-25T15:06:22Z,,NWBV00SHMKBFN1RKWK79\n"
+        "TRANS5,OM4258447852,10,GBP,Sell,2024-11-25T15:06:22Z,1.5,NWBV00SHMKBFN1RKWK79\n"
+        "TRANS6,OM4258447851,10,GBP,Sell,2024-11-25T15:06:22Z,1.5,NWBV00SHMKBFN1RKWK78\n")
+
+expected = [("missing_uti", "", "763000.0"),
+            ("invalid_notional", "TRANS3", "abc"),
+            ("invalid_exchange_rate", "TRANS4", "10.0"),
+            ("invalid_isin", "TRANS5", "10.0"),
+            ("invalid_lei", "TRANS6", "10.0")]
+
+
+def make_dirs(tmp_path):
+    paths = [os.path.join(tmp_path, name) for name in ("input", "errored", "processed")]
+    os.makedirs(paths[0])
+    with open(os.path.join(paths[0], "input_dirty_csv.csv"), "w") as input_file:
+        input_file.write(header + rows)
+    return paths
+
+
+# Test the rejected rows are saved in the quarantine table with their reason, as read from the file,
+# by the serial, streaming and asyncio loads
+@pytest.mark.parametrize("load", ["serial", "streaming", "async"])
+def test_quarantine_table(tmp_path, load):
+
+    input_path, errored_path, processed_path = make_dirs(tmp_path)
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+
+    if load == "async":
+        process_files_async(input_path, errored_path, processed_path, conn, chunk_size=2, quarantine="table")
+    else:
+        process_files(input_path, errored_path, processed_path, conn, quarantine="table",
+                      chunk_size=2 if load == "streaming" else None)
+
+    assert [uti for (uti,) in conn.execute("SELECT transaction_uti FROM transactions")] == ["TRANS1"]
+    rejected = conn.execute("""SELECT reason, transaction_uti, CAST(notional AS TEXT), file_name
+                               FROM rejected_transactions ORDER BY id""").fetchall()
+    assert [row[:3] for row in rejected] == expected
+    assert {row[3] for row in rejected} == {"input_dirty_csv.csv"}
+    conn.close()
+
+
+# Test the rejected rows are written next to the processed file in csv mode, with the columnar engine
+def test_quarantine_csv(tmp_path, mocker):
+
+    input_path, errored_path, processed_path = make_dirs(tmp_path)
+    mocker.patch.object(config, "VALIDATION_ENGINE", "columnar")
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+
+    process_files(input_path, errored_path, processed_path, conn, quarantine="csv")
+
+    assert conn.execute("SELECT COUNT(*) FROM rejected_transactions").fetchone()[0] == 0
+    conn.close()
+    sidecar = [name for name in os.listdir(processed_path) if name.endswith(".rejected.csv")]
+    assert len(sidecar) == 1 and sidecar[0].startswith("processed_input_dirty_csv_")
+    with open(os.path.join(processed_path, sidecar[0]), newline="") as csvfile:
+        records = list(csv.DictReader(csvfile))
+    assert [(r["reason"], r["transaction_uti"], r["notional"]) for r in records] == expected
+
+
+# Test both engines give every rejected row the reason of its first failing check
+def test_rejection_reasons_match():
+
+    transactions = [{"transaction_uti": uti, "isin": isin, "notional": notional, "notional_currency": "GBP",
+                     "transaction_type": "Sell", "transaction_datetime": "2024-11-25T15:06:22Z",
+                     "exchange_rate": rate, "legal_entity_identifier": "NWBV00SHMKBFN1RKWK79"}
+                    for uti, isin, notional, rate in [("T1", "OM4258447851", "1", "2"), ("", "bad", "x", "2"),
+                                                      ("T3", "bad", "1", "y"), ("T4", "bad", "1", "2")]]
+
+    with Quarantine("table") as pandas_quarantine:
+        transaction_validations(transactions)
+    with Quarantine("table") as columnar_quarantine:
+        validate_transactions(transactions)
+
+    reasons = [row[0] for row in pandas_quarantine.rows]
+    assert reasons == ["missing_uti", "invalid_exchange_rate", "invalid_isin"]
+    assert [row[0] for row in columnar_quarantine.rows] == reasons
+    assert first_failures([[False, True], [True, True]]) == ([0, 1], ["invalid_notional", "missing_uti"])
+
+
+# Test the rows of a file are not committed when saving its rejected rows fails, serial and parallel loads
+@pytest.mark.parametrize("workers", [None, 2])
+def test_rejected_rows_committed_with_rows(tmp_path, mocker, workers):
+
+    input_path, errored_path, processed_path = make_dirs(tmp_path)
+    conn = sqlite3.connect(os.path.join(tmp_path, "test.db"))
+    create_tables(conn)
+    mocker.patch("app.file_processor.save_rejected_rows", side_effect=OSError("disk full"))
+
+    process_files(input_path, errored_path, processed_path, conn, workers=workers, quarantine="table")
+
+    assert len(os.listdir(errored_path)) == 1
+    assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone() == (0,)
+    conn.close()
@@ -0,0 +1,86 @@
+import sqlite3
+import pytest
+from app.db_handler import create_tables
+from app.datetime_epoch import epoch_list
+from app.query import create_indexes, fetch_page, iter_pages, iter_transactions
+
+currencies = ["EUR", "GBP", "USD"]
+
+
+# The XML feed writes +00:00 where the CSV and JSON feeds write Z
+datetimes = [f"2024-11-{25 - i:02d}T10:00:00" + ("+00:00" if i % 2 else "Z") for i in range(25)]
+
+
+# Database with 25 transactions, over 3 ISINs, 3 currencies and 25 days given in reverse order
+@pytest.fixture
+def conn():
+
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    conn.executemany("""
+        INSERT INTO transactions (transaction_uti, isin, notional, notional_currency, transaction_type,
+        transaction_datetime, exchange_rate, legal_entity_identifier, amount_eur, transaction_epoch_us)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(f"TRANS{i}", f"ISIN{i % 3}", 100.0 * i, currencies[i % 3], "Buy", datetime, 1.0, f"LEI{i % 2}", 100.0 * i,
+           epoch) for i, (datetime, epoch) in enumerate(zip(datetimes, epoch_list(datetimes)))])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+# Test every row is returned exactly once, page by page in insertion order
+def test_pagination_covers_all_rows(conn):
+
+    pages = list(iter_pages(conn, page_size=10))
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [row[0] for page in pages for row in page] == [f"TRANS{i}" for i in range(25)]
+
+
+# Test the equality filters, alone and combined
+def test_fetch_page_filters(conn):
+
+    rows, next_key = fetch_page(conn, isin="ISIN1", page_size=100)
+    assert [row[0] for row in rows] == [f"TRANS{i}" for i in range(1, 25, 3)]
+    assert next_key is None
+
+    rows = list(iter_transactions(conn, page_size=2, lei="LEI0", currency="EUR"))
+    assert [row[0] for row in rows] == [f"TRANS{i}" for i in range(0, 25, 6)]
+
+
+# Test a datetime range is returned in datetime order, including its start and excluding its end
+def test_datetime_range(conn):
+
+    rows = list(iter_transactions(conn, page_size=3, datetime_from="2024-11-05", datetime_to="2024-11-12"))
+    assert [row[5][:10] for row in rows] == [f"2024-11-{day:02d}" for day in range(5, 12)]
+
+    # Bounds with a UTC offset, or as epochs in microseconds
+    rows = list(iter_transactions(conn, datetime_from="2024-11-05T12:00:00+02:00", datetime_to=1731369600000000))
+    assert [row[5][:10] for row in rows] == [f"2024-11-{day:02d}" for day in range(5, 12)]
+
+    with pytest.raises(ValueError):
+        fetch_page(conn, datetime_from="05/11/2024")
+
+
+# Test the indexes are created once and used by the filtered queries
+def test_create_indexes(conn):
+
+    indexes = {"isin": ["isin"], "epoch": ["transaction_epoch_us"]}
+
+    assert create_indexes(conn, indexes) == ["idx_transactions_isin", "idx_transactions_epoch"]
+    assert create_indexes(conn, indexes) == []
+
+    plan = " ".join(row[-1] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT rowid FROM transactions WHERE isin = ? AND rowid > ? ORDER BY rowid", ("ISIN1", 0)))
+    assert "idx_transactions_isin" in plan
+    assert "TEMP B-TREE" not in plan
+
+    # A day window is a range scan of the epoch index
+    plan = " ".join(row[-1] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT rowid FROM transactions WHERE transaction_epoch_us >= ? AND transaction_epoch_us < ? "
+        "ORDER BY transaction_epoch_us, rowid", (0, 1)))
+    assert "idx_transactions_epoch (transaction_epoch_us>? AND transaction_epoch_us<?)" in plan
+    assert "TEMP B-TREE" not in plan
+
+    with pytest.raises(ValueError):
+        create_indexes(conn, {"price": ["price"]})
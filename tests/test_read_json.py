@@ -0,0 +1,95 @@
+import json
+import os
+import pytest
+from app.read_json import read_json, read_json_chunks, iter_json_transactions, JsonArrayReader
+from io import StringIO
+
+# Test data for the JSON reader
+transaction = {"transaction_uti": "TRANS1",
+               "isin": "OM4258447851",
+               "notional": 763000.0,
+               "notional_currency": "GBP",
+               "transaction_type": "Sell",
+               "transaction_datetime": "2024-11-25T15:06:22Z",
+               "exchange_rate": 0.0070956000,
+               "lei": "NWBV00SHMKBFN1RKWK79"}
+
+
+def write_json(file_path, document):
+    with open(file_path, "w", encoding="utf-8") as jsonfile:
+        json.dump(document, jsonfile, indent=4)
+
+
+# Test incremental reader returns same transactions as json.load based reader
+def test_iter_json_transactions_matches_read_json(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_data_json.json")
+    rows = [dict(transaction, transaction_uti=f"TRANS{i}") for i in range(50)]
+    write_json(file_path, {"source": {"system": "upstream", "ids": [1, 2, 3]}, "transactions": rows})
+
+    streamed = list(iter_json_transactions(file_path))
+
+    assert streamed == [row.as_dict() for row in read_json(file_path)]
+    assert len(streamed) == 50
+    # lei property is mapped to legal_entity_identifier
+    assert streamed[0]["legal_entity_identifier"] == "NWBV00SHMKBFN1RKWK79"
+    assert "lei" not in streamed[0]
+
+
+# Test values split across read blocks are decoded correctly
+def test_json_array_reader_small_blocks():
+
+    document = json.dumps({"transactions": [transaction, 12345, "a, ]b", [1, 2]]})
+    reader = JsonArrayReader(StringIO(document), read_size=3)
+
+    assert list(reader.iter_array("transactions")) == [transaction, 12345, "a, ]b", [1, 2]]
+
+
+# Test numbers cut by the end of a read block are decoded in full
+@pytest.mark.parametrize("read_size", range(1, 12))
+def test_json_array_reader_split_numbers(read_size):
+
+    reader = JsonArrayReader(StringIO('{"transactions": [1.5, 2e3, -3]}'), read_size=read_size)
+
+    assert list(reader.iter_array("transactions")) == [1.5, 2000.0, -3]
+
+
+# Test a malformed element is reported once it has been read, without reading the rest of the file
+@pytest.mark.parametrize("element", ['{"transaction_uti": "TRANS1" "isin": 1}', '{"notional": 1.5.2}', '[1, 2}'])
+def test_json_array_reader_malformed_element(element):
+
+    jsonfile = StringIO('{"transactions": [' + element + ", " + ", ".join([json.dumps(transaction)] * 1000) + "]}")
+    reader = JsonArrayReader(jsonfile, read_size=16)
+
+    with pytest.raises(json.JSONDecodeError):
+        list(reader.iter_array("transactions"))
+    assert jsonfile.tell() < 100
+
+
+# Test streaming read in chunks and rows with missing properties being skipped
+def test_read_json_chunks(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_data_json.json")
+    rows = [dict(transaction, transaction_uti=f"TRANS{i}") for i in range(5)]
+    del rows[2]["isin"]
+    write_json(file_path, {"transactions": rows})
+
+    chunks = list(read_json_chunks(file_path, chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+    assert [row["transaction_uti"] for chunk in chunks for row in chunk] == ["TRANS0", "TRANS1", "TRANS3", "TRANS4"]
+
+
+# Test malformed documents are reported as ValueError
+def test_iter_json_transactions_errors(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_data_json.json")
+
+    with open(file_path, "w", encoding="utf-8") as jsonfile:
+        jsonfile.write('{"transactions": [{"transaction_uti": "TRANS1"')
+    with pytest.raises(ValueError, match="Error decoding JSON file"):
+        list(iter_json_transactions(file_path))
+
+    write_json(file_path, {"records": []})
+    with pytest.raises(ValueError, match="'transactions' not found"):
+        list(iter_json_transactions(file_path))
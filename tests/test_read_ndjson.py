@@ -0,0 +1,100 @@
+import os
+import json
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from app.read_ndjson import read_ndjson, read_ndjson_chunks
+from app.split_csv import split_ranges, parse_range
+
+transaction = {"transaction_uti": "TRANS1",
+               "isin": "US0378331005",
+               "notional": 763000.0,
+               "notional_currency": "GBP",
+               "transaction_type": "Sell",
+               "transaction_datetime": "2024-11-25T15:06:22Z",
+               "exchange_rate": 0.5,
+               "lei": "5493001KJTIIGC8Y1R12"}
+
+
+# Writes one transaction per line, blank lines and escaped quotes in between
+def write_ndjson(file_path, rows):
+
+    with open(file_path, "w", encoding="utf-8") as ndjsonfile:
+        for i, row in enumerate(rows):
+            ndjsonfile.write(json.dumps(row) + "\n")
+            if i % 4 == 0:
+                ndjsonfile.write("\n")
+
+
+# Test every line is read as one transaction, with the properties renamed as for JSON files
+def test_read_ndjson(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_data_ndjson.ndjson")
+    rows = [dict(transaction, transaction_uti=f"TRANS{i}", transaction_type='Sell "block"') for i in range(5)]
+    write_ndjson(file_path, rows)
+
+    transactions = read_ndjson(file_path)
+
+    assert [row["transaction_uti"] for row in transactions] == [f"TRANS{i}" for i in range(5)]
+    assert transactions[0]["legal_entity_identifier"] == "5493001KJTIIGC8Y1R12"
+    assert transactions[0]["transaction_type"] == 'Sell "block"'
+
+
+# Test streaming read in chunks and lines with missing properties being skipped
+def test_read_ndjson_chunks(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_data_ndjson.ndjson")
+    rows = [dict(transaction, transaction_uti=f"TRANS{i}") for i in range(5)]
+    del rows[2]["isin"]
+    write_ndjson(file_path, rows)
+
+    chunks = list(read_ndjson_chunks(file_path, chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+    assert [row["transaction_uti"] for chunk in chunks for row in chunk] == ["TRANS0", "TRANS1", "TRANS3", "TRANS4"]
+
+
+# Test a line which is not a JSON object is reported as ValueError with its line number
+@pytest.mark.parametrize("line", ['{"transaction_uti": "TRANS2"', "[1, 2]"])
+def test_read_ndjson_errors(tmp_path, line):
+
+    file_path = os.path.join(tmp_path, "input_data_ndjson.ndjson")
+    with open(file_path, "w", encoding="utf-8") as ndjsonfile:
+        ndjsonfile.write(json.dumps(transaction) + "\n" + line + "\n")
+
+    with pytest.raises(ValueError, match="line 2|Line 2"):
+        read_ndjson(file_path)
+
+
+# Test the byte ranges of an NDJSON file end on newlines and read the same rows as the whole file,
+# escaped quotes inside the values do not move the boundaries
+@pytest.mark.parametrize("range_bytes", [1, 50, 1000, 10 ** 6])
+def test_split_ranges_ndjson(tmp_path, range_bytes):
+
+    file_path = os.path.join(tmp_path, "input_big_ndjson.ndjson")
+    rows = [dict(transaction, transaction_uti=f"TRANS{i}", transaction_type='Sell "block' * (i % 2)) for i in range(30)]
+    write_ndjson(file_path, rows)
+
+    with ThreadPoolExecutor(2) as executor:
+        header, ranges = split_ranges(file_path, executor, range_bytes, ".ndjson")
+
+    assert header is None
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == os.path.getsize(file_path)
+    parsed = [row for start, end in ranges for row in parse_range(file_path, start, end, header, ext=".ndjson")[0]]
+    assert [row[0] for row in parsed] == [f"TRANS{i}" for i in range(30)]
+    assert [row[4] for row in parsed] == [row["transaction_type"] for row in rows]
+
+
+# Test values holding raw line separators other than the newline read the same through the ranges
+def test_parse_range_line_separators(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_big_ndjson.ndjson")
+    rows = [dict(transaction, transaction_uti=f"TRANS{i}", transaction_type=f"Sell\u2028\u2029\x85\x0b\x0c{i}")
+            for i in range(3)]
+    with open(file_path, "w", encoding="utf-8", newline="") as ndjsonfile:
+        ndjsonfile.write("".join(json.dumps(row, ensure_ascii=False) + "\r\n" for row in rows))
+
+    parsed = parse_range(file_path, 0, os.path.getsize(file_path), None, ext=".ndjson")[0]
+
+    assert [row[4] for row in parsed] == [row["transaction_type"] for row in rows]
+    assert [row["transaction_type"] for row in read_ndjson(file_path)] == [row["transaction_type"] for row in rows]
@@ -0,0 +1,77 @@
+import os
+import pytest
+from app.read_xml import read_xml, read_xml_chunks
+
+# One <transaction> record of the XML feed
+transaction_xml = """  <transaction>
+    <transaction_uti>TRANS{index}</transaction_uti>
+    <isin>TJ3547453282</isin>
+    <notional>1000.0</notional>
+    <notional_currency>GBP</notional_currency>
+    <transaction_type>Sell</transaction_type>
+    <transaction_datetime>2024-11-25T15:06:22+00:00</transaction_datetime>
+    <exchange_rate>0.0070956</exchange_rate>
+    <lei>NWBV00SHMKBFN1RKWK79</lei>
+  </transaction>
+"""
+
+
+def write_xml(file_path, records):
+    with open(file_path, "w", encoding="utf-8") as xmlfile:
+        xmlfile.write('<?xml version="1.0" encoding="UTF-8"?>\n<transactions>\n')
+        xmlfile.writelines(records)
+        xmlfile.write("</transactions>\n")
+
+
+# Test all child elements are read into a transaction dictionary
+def test_read_xml(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_data_xml.xml")
+    write_xml(file_path, [transaction_xml.format(index=i) for i in range(3)])
+
+    transactions = read_xml(file_path)
+
+    assert len(transactions) == 3
+    # Numeric columns are converted to float when the rows are read
+    assert transactions[0].as_dict() == {"transaction_uti": "TRANS0",
+                                         "isin": "TJ3547453282",
+                                         "notional": 1000.0,
+                                         "notional_currency": "GBP",
+                                         "transaction_type": "Sell",
+                                         "transaction_datetime": "2024-11-25T15:06:22+00:00",
+                                         "exchange_rate": 0.0070956,
+                                         "legal_entity_identifier": "NWBV00SHMKBFN1RKWK79"}
+
+
+# Test streaming read of XML file in batches
+def test_read_xml_chunks(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_data_xml.xml")
+    write_xml(file_path, [transaction_xml.format(index=i) for i in range(7)])
+
+    chunks = list(read_xml_chunks(file_path, chunk_size=3))
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert chunks[-1][0]["transaction_uti"] == "TRANS6"
+
+
+# Test a record with a missing child element is reported with a clear error
+def test_read_xml_missing_element(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_data_xml.xml")
+    broken = transaction_xml.format(index=1).replace("    <lei>NWBV00SHMKBFN1RKWK79</lei>\n", "")
+    write_xml(file_path, [transaction_xml.format(index=0), broken])
+
+    with pytest.raises(ValueError, match="Missing required element: lei in transaction number 1"):
+        read_xml(file_path)
+
+
+# Test malformed XML is reported as ValueError
+def test_read_xml_parse_error(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_data_xml.xml")
+    with open(file_path, "w", encoding="utf-8") as xmlfile:
+        xmlfile.write("<transactions><transaction>")
+
+    with pytest.raises(ValueError, match="Error parsing XML file"):
+        read_xml(file_path)
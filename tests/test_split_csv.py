@@ -0,0 +1,88 @@
+import os
+import csv
+import sqlite3
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from app.db_handler import create_tables
+import app.file_processor as file_processor
+from app.file_processor import process_files
+from app.split_csv import split_ranges, parse_range, load_split_csv
+
+header = "transaction_uti,isin,notional,notional_currency,transaction_type,transaction_datetime,exchange_rate,legal_entity_identifier\n"
+
+
+# Writes a CSV file of 'count' rows, every third one with a quoted newline, escaped quotes and a comma
+def write_csv(file_path, count):
+
+    with open(file_path, "w", newline="") as csvfile:
+        csvfile.write(header)
+        for i in range(count):
+            transaction_type = '"Sell\n""block"", 2"' if i % 3 == 0 else "Buy"
+            csvfile.write(f"TRANS{i},US0378331005,{i}.0,GBP,{transaction_type},2024-11-25T15:06:22Z,0.5,"
+                          f"5493001KJTIIGC8Y1R12\n")
+
+
+# Test the ranges cover the file after the header and only end on record boundaries
+@pytest.mark.parametrize("range_bytes", [1, 7, 50, 1000, 10 ** 6])
+def test_split_ranges(tmp_path, range_bytes):
+
+    file_path = os.path.join(tmp_path, "input_big_csv.csv")
+    write_csv(file_path, 40)
+
+    with ThreadPoolExecutor(2) as executor:
+        columns, ranges = split_ranges(file_path, executor, range_bytes)
+
+    assert columns == header.strip().split(",")
+    assert ranges[0][0] == len(header)
+    assert ranges[-1][1] == os.path.getsize(file_path)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+
+    rows = [row for start, end in ranges for row in parse_range(file_path, start, end, columns)[0]]
+    with open(file_path, newline="") as csvfile:
+        expected = list(csv.DictReader(csvfile))
+    assert [row[0] for row in rows] == [row["transaction_uti"] for row in expected]
+    assert [row[4] for row in rows] == [row["transaction_type"] for row in expected]
+
+
+# Test a header without the required columns is rejected before any range is parsed
+def test_split_ranges_missing_columns(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_big_csv.csv")
+    with open(file_path, "w") as csvfile:
+        csvfile.write("transaction_uti,isin\nTRANS1,US0378331005\n")
+
+    with ThreadPoolExecutor(1) as executor, pytest.raises(ValueError, match="Missing required columns"):
+        load_split_csv(file_path, None, 1, executor=executor)
+
+
+# Test a file split over worker processes loads the same rows as the file read whole,
+# loading files one by one or in parallel
+@pytest.mark.parametrize("workers", [None, 2])
+def test_process_files_split_csv(mocker, tmp_path, workers):
+
+    input_path = os.path.join(tmp_path, "input")
+    os.makedirs(input_path)
+    write_csv(os.path.join(input_path, "input_big_csv.csv"), 300)
+    # Last row wins for a transaction_uti found in two ranges
+    with open(os.path.join(input_path, "input_big_csv.csv"), "a") as csvfile:
+        csvfile.write("TRANS0,US0378331005,-1.0,GBP,Buy,2024-11-25T15:06:22Z,0.5,5493001KJTIIGC8Y1R12\n")
+
+    mocker.patch("app.split_csv.config.WORKERS", 2)
+    mocker.patch("app.split_csv.config.SPLIT_CSV_MIN_BYTES", 1)
+    mocker.patch("app.split_csv.config.SPLIT_RANGE_BYTES", 2000)
+    load_spy = mocker.spy(file_processor, "load_split_csv")
+
+    conn = sqlite3.connect(os.path.join(tmp_path, "test.db"))
+    create_tables(conn)
+    process_files(input_path, os.path.join(tmp_path, "errored"), os.path.join(tmp_path, "processed"), conn,
+                  workers=workers)
+
+    rows = conn.execute("SELECT transaction_uti, notional, transaction_type FROM transactions ORDER BY rowid").fetchall()
+    conn.close()
+
+    assert load_spy.call_count == 1
+    assert load_spy.spy_return[0]["read"] == 301
+    assert len(rows) == 300
+    assert rows[0] == ("TRANS0", -1.0, "Buy")
+    assert rows[3] == ("TRANS3", 3.0, 'Sell\n"block", 2')
+    assert len(os.listdir(os.path.join(tmp_path, "processed"))) == 1
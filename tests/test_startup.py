@@ -0,0 +1,56 @@
+import os
+import sys
+import subprocess
+
+app_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+# Modules which are only needed once there is data to load, validate or display
+heavy_modules = ["pandas", "numpy", "tabulate", "asyncio", "multiprocessing", "cProfile", "tracemalloc", "file_processor"]
+
+# Budget for importing main.py, as reported by python -X importtime (microseconds).
+# Importing pandas alone takes several times this budget.
+IMPORT_BUDGET_US = 100000
+
+
+# Returns the cumulative import time of every top level module imported by 'code', in microseconds
+def import_times(code):
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=app_path,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+# Test importing main.py does not load the heavy modules and stays within the import time budget
+def test_main_import_time_budget():
+
+    times = import_times("import main")
+
+    assert not [module for module in heavy_modules if module in times]
+    assert times["main"] < IMPORT_BUDGET_US
+
+
+# Test a run with an empty input directory does not import pandas or tabulate
+def test_empty_run_does_not_import_pandas(tmp_path):
+
+    code = f"""
+import sys
+import config
+config.DB_PATH = {str(tmp_path)!r}
+config.INPUT_PATH = {os.path.join(tmp_path, "input")!r}
+config.ERROR_PATH = {os.path.join(tmp_path, "errored")!r}
+config.PROCESSED_PATH = {os.path.join(tmp_path, "processed")!r}
+config.METRICS_JSONL_PATH = config.METRICS_PROMETHEUS_PATH = None
+import main
+main.main([])
+print(sorted(module for module in {heavy_modules!r} if module in sys.modules))
+"""
+    os.makedirs(os.path.join(tmp_path, "input"))
+    result = subprocess.run([sys.executable, "-c", code], cwd=app_path, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[]"
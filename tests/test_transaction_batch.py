@@ -0,0 +1,33 @@
+import math
+import pickle
+from app.transaction_batch import TransactionBatch, Transaction, to_batch, batch_chunks
+
+values = ("TRANS1", "OM4258447851", "763000.0", "GBP", "Sell", "2024-11-25T15:06:22Z", "0.0070956",
+          "NWBV00SHMKBFN1RKWK79")
+
+
+# Test values are converted when appended and rows are read back as Transaction records
+def test_transaction_batch_append():
+
+    batch = to_batch([values, ("TRANS2", "OM4258447851", "abc", "GBP", "Buy", None, None, "NWBV00SHMKBFN1RKWK79")])
+
+    assert len(batch) == 2
+    assert batch[0].notional == 763000.0
+    assert batch[0]["exchange_rate"] == 0.0070956
+    assert math.isnan(batch[1].notional) and math.isnan(batch[1].exchange_rate)
+    assert batch[1].transaction_datetime is None
+    # Repeated values of the low cardinality columns are kept once
+    assert batch[0].legal_entity_identifier is batch[1].legal_entity_identifier
+    assert [row.transaction_uti for row in batch] == ["TRANS1", "TRANS2"]
+    assert not hasattr(batch[0], "__dict__")
+
+
+# Test a batch built from dictionaries, slicing, pickling and splitting in chunks
+def test_transaction_batch_from_dicts():
+
+    row = Transaction(*values).as_dict()
+    batch = TransactionBatch.from_dicts([dict(row, transaction_uti=f"TRANS{i}") for i in range(5)])
+
+    assert [row.transaction_uti for row in batch[1:3]] == ["TRANS1", "TRANS2"]
+    assert list(pickle.loads(pickle.dumps(batch))) == list(batch)
+    assert [len(chunk) for chunk in batch_chunks([values] * 5, 2)] == [2, 2, 1]
@@ -1,7 +1,8 @@
+import sqlite3
 import pandas as pd
 from unittest.mock import MagicMock
-from app.db_handler import get_db_connection
-from app.transaction_processor import process_transactions, transaction_validations, batched
+from app.db_handler import get_db_connection, create_tables
+from app.transaction_processor import process_transactions, transaction_validations, batched, upsert_transactions, merge_transactions, add_row_hash, add_datetime_epoch, write_transactions, collapse_duplicates
 
 # Set up the Mock DB connection
 def mock_get_db_connection():
@@ -11,18 +12,23 @@ def mock_get_db_connection():
     return mock_conn , mock_cursor
 
 
+# Returns the executemany calls writing the transactions table, the aggregates are written with executemany too
+def transaction_writes(mock_cursor):
+    return [call for call in mock_cursor.executemany.call_args_list if "INSERT INTO transactions" in call[0][0]]
+
+
 def test_process_transactions(mocker):
 
     transactions = [
         {
             "transaction_uti": "TXN1023",
-            "isin": "US12345",
+            "isin": "US0378331005",
             "notional": 150.0,
             "notional_currency": "USD",
             "transaction_type": "BUY",
             "transaction_datetime": "2024-02-26T12:00:00",
             "exchange_rate": 1.1,
-            "legal_entity_identifier": "LEI123"
+            "legal_entity_identifier": "5493001KJTIIGC8Y1R12"
         }
     ]
 
@@ -44,20 +50,20 @@ def test_process_transactions(mocker):
     assert mock_cursor.executemany.called
     assert mock_conn.commit.called  # Ensure commit was called after the insert/update
     # Ensure one row were passed for insert
-    assert len(mock_conn.cursor().executemany.call_args[0][1]) == 1
+    [write] = transaction_writes(mock_conn.cursor())
+    assert len(write[0][1]) == 1
 
     # Check if the SQL query is correct in the call
-    query_called = mock_conn.cursor().executemany.call_args[0][0]
-    assert "INSERT INTO transactions" in query_called
+    query_called = write[0][0]
     assert "ON CONFLICT(transaction_uti)" in query_called
 
 
 def test_transaction_validations():
     # Test transaction validation without database connection.
     transactions = [
-        {"transaction_uti": "TXN1", "isin": "US12345", "notional": 100, "notional_currency": "USD",
+        {"transaction_uti": "TXN1", "isin": "US0378331005", "notional": 100, "notional_currency": "USD",
          "transaction_type": "BUY", "transaction_datetime": "2024-02-26T12:00:00", "exchange_rate": 1.1,
-         "legal_entity_identifier": "LEI123"},
+         "legal_entity_identifier": "5493001KJTIIGC8Y1R12"},
         {"transaction_uti": "", "isin": "US12346", "notional": "200", "notional_currency": "GBP",
          "transaction_type": "SELL", "transaction_datetime": "2024-02-26T12:30:00", "exchange_rate": "0.9",
          "legal_entity_identifier": "LEI124"},  # Invalid (empty transaction_uti)
@@ -77,3 +83,103 @@ def test_batched():
     # First batch should contain first 3 elements
     assert batches[0] == (0, 1, 2)
     assert batches[-1] == (9,)  # Last batch should contain remaining element
+
+
+# Test rows are committed once per call by default and every COMMIT_ROWS rows when configured,
+# and never when the commit is left to the caller
+def test_upsert_transactions_commit_rows(mocker):
+
+    rows = add_row_hash(add_datetime_epoch([(f"TXN{i}", "US0378331005", 100.0, "USD", "BUY", "2024-02-26T12:00:00", 1.1, "5493001KJTIIGC8Y1R12", 110.0) for i in range(10)]))
+    mocker.patch("app.transaction_processor.config.BATCH_SIZE", 2)
+
+    mock_conn, mock_cursor = mock_get_db_connection()
+    upsert_transactions(rows, mock_conn)
+    assert len(transaction_writes(mock_cursor)) == 5
+    assert mock_conn.commit.call_count == 1
+
+    mocker.patch("app.transaction_processor.config.COMMIT_ROWS", 4)
+    mock_conn, mock_cursor = mock_get_db_connection()
+    upsert_transactions(rows, mock_conn)
+    # Commits after rows 4 and 8, and once at the end for the last 2 rows
+    assert mock_conn.commit.call_count == 3
+
+    # Every commit is left to the caller
+    mock_conn, mock_cursor = mock_get_db_connection()
+    upsert_transactions(rows, mock_conn, commit=False)
+    assert mock_conn.commit.call_count == 0
+
+
+# Test staging table merge gives the same table contents as upserting the rows one by one
+def test_merge_transactions_matches_upsert():
+
+    def row(uti, notional):
+        return (uti, "US0378331005", notional, "USD", "BUY", "2024-02-26T12:00:00", 1.1, "5493001KJTIIGC8Y1R12", notional * 1.1)
+
+    existing = add_row_hash(add_datetime_epoch([row("TXN1", 1.0), row("TXN2", 2.0)]))
+    # TXN2 is updated twice and TXN3 inserted then updated, the last row must win
+    new_rows = add_row_hash(add_datetime_epoch([row("TXN2", 20.0), row("TXN3", 3.0), row("TXN2", 200.0), row("TXN4", 4.0), row("TXN3", 30.0)]))
+
+    results = []
+    for write in (upsert_transactions, merge_transactions):
+        conn = sqlite3.connect(":memory:")
+        create_tables(conn)
+        upsert_transactions(existing, conn)
+        write(new_rows, conn)
+        results.append(conn.execute("SELECT * FROM transactions ORDER BY transaction_uti").fetchall())
+        # Staging table is left empty for the next load
+        if write is merge_transactions:
+            assert conn.execute("SELECT COUNT(*) FROM staging_transactions").fetchone()[0] == 0
+        conn.close()
+
+    assert results[0] == results[1]
+    assert [(r[0], r[2]) for r in results[1]] == [("TXN1", 1.0), ("TXN2", 200.0), ("TXN3", 30.0), ("TXN4", 4.0)]
+
+
+# Test duplicate transaction_uti are collapsed before writing, last wins, with the same table as writing every row
+def test_write_transactions_collapses_duplicates():
+
+    def row(uti, notional):
+        return (uti, "US0378331005", notional, "USD", "BUY", "2024-02-26T12:00:00", 1.1, "5493001KJTIIGC8Y1R12", notional * 1.1)
+
+    rows = add_row_hash(add_datetime_epoch([row("TXN1", 1.0), row("TXN2", 2.0), row("TXN1", 10.0), row("TXN3", 3.0), row("TXN1", 100.0)]))
+
+    collapsed_rows, collapsed = collapse_duplicates(rows)
+    assert collapsed == 2
+    assert [(r[0], r[2]) for r in collapsed_rows] == [("TXN1", 100.0), ("TXN2", 2.0), ("TXN3", 3.0)]
+
+    results = []
+    for write in (upsert_transactions, write_transactions):
+        conn = sqlite3.connect(":memory:")
+        create_tables(conn)
+        stats = write(rows, conn)
+        results.append(conn.execute("SELECT * FROM transactions ORDER BY transaction_uti").fetchall())
+        conn.close()
+
+    assert results[0] == results[1]
+    assert (stats["collapsed"], stats["inserted"], stats["updated"], stats["unchanged"]) == (2, 3, 0, 0)
+
+
+# Test rows with unchanged content are not rewritten and are reported as unchanged
+def test_upsert_transactions_skips_unchanged_rows():
+
+    transactions = [
+        {"transaction_uti": f"TXN{i}", "isin": "US0378331005", "notional": 100.0 + i, "notional_currency": "USD",
+         "transaction_type": "BUY", "transaction_datetime": "2024-02-26T12:00:00", "exchange_rate": 1.1,
+         "legal_entity_identifier": "5493001KJTIIGC8Y1R12"} for i in range(5)]
+
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+
+    stats = process_transactions(transactions, conn)
+    assert (stats["inserted"], stats["updated"], stats["unchanged"]) == (5, 0, 0)
+
+    # Same snapshot received again, only TXN0 is amended
+    transactions[0]["notional"] = 500.0
+    changes_before = conn.total_changes
+    stats = process_transactions(transactions, conn)
+
+    assert (stats["inserted"], stats["updated"], stats["unchanged"]) == (0, 1, 4)
+    # One transaction row, and the amount_eur of its 3 aggregate rows (LEI, currency, day)
+    assert conn.total_changes - changes_before == 1 + 3
+    assert conn.execute("SELECT notional FROM transactions WHERE transaction_uti = 'TXN0'").fetchone()[0] == 500.0
+    conn.close()
@@ -0,0 +1,81 @@
+import os
+import time
+import sqlite3
+import threading
+from app.db_handler import create_tables
+from app.watcher import FileStabilityTracker, watch_directory
+
+csv_data = ("transaction_uti,isin,notional,notional_currency,transaction_type,transaction_datetime,exchange_rate,legal_entity_identifier\n"
+            "TRANS1,OM4258447851,763000.0,GBP,Sell,2024-11-25T15:06:22Z,0.0070956,NWBV00SHMKBFN1RKWK79\n")
+
+
+# Test a file is ready only once its size and modification time are stable for the settle time
+def test_file_stability_tracker(tmp_path):
+
+    file_path = os.path.join(tmp_path, "input_data_csv.csv")
+    with open(file_path, "w") as csvfile:
+        csvfile.write(csv_data)
+    names = {"input_data_csv.csv"}
+    tracker = FileStabilityTracker(settle_seconds=5)
+
+    assert tracker.ready_files(tmp_path, ["input_data_csv.csv"], names, now=100) == []
+    assert tracker.ready_files(tmp_path, ["input_data_csv.csv"], names, now=103) == []
+
+    # File still being written, the settle time starts again
+    with open(file_path, "a") as csvfile:
+        csvfile.write(csv_data)
+    assert tracker.ready_files(tmp_path, ["input_data_csv.csv"], names, now=106) == []
+    assert tracker.ready_files(tmp_path, ["input_data_csv.csv"], names, now=110) == []
+    assert tracker.ready_files(tmp_path, ["input_data_csv.csv"], names, now=111) == ["input_data_csv.csv"]
+
+
+# Test a marker file makes the file ready straight away
+def test_file_stability_tracker_marker(tmp_path):
+
+    with open(os.path.join(tmp_path, "input_data_csv.csv"), "w") as csvfile:
+        csvfile.write(csv_data)
+    names = {"input_data_csv.csv", "input_data_csv.csv.done"}
+    tracker = FileStabilityTracker(settle_seconds=60)
+
+    assert tracker.ready_files(tmp_path, ["input_data_csv.csv"], names, now=100) == ["input_data_csv.csv"]
+
+
+# Test files landing in the input directory are loaded while watching and the watcher stops on request
+def test_watch_directory(tmp_path):
+
+    input_path = os.path.join(tmp_path, "input")
+    errored_path = os.path.join(tmp_path, "errored")
+    processed_path = os.path.join(tmp_path, "processed")
+    os.makedirs(input_path)
+    os.makedirs(processed_path)
+
+    conn = sqlite3.connect(os.path.join(tmp_path, "test.db"), check_same_thread=False)
+    create_tables(conn)
+
+    stop_event = threading.Event()
+    watcher = threading.Thread(target=watch_directory,
+                               args=(input_path, errored_path, processed_path, conn),
+                               kwargs={"poll_interval": 0.05, "settle_seconds": 0.1, "stop_event": stop_event})
+    watcher.start()
+
+    try:
+        with open(os.path.join(input_path, "input_data_csv.csv"), "w") as csvfile:
+            csvfile.write(csv_data)
+        with open(os.path.join(input_path, "input_data_csv.csv.done"), "w"):
+            pass
+        with open(os.path.join(input_path, "notes.txt"), "w"):
+            pass
+
+        deadline = time.monotonic() + 10
+        while not os.listdir(processed_path) and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop_event.set()
+        watcher.join(timeout=10)
+
+    assert not watcher.is_alive()
+    assert len(os.listdir(processed_path)) == 1
+    # Marker is removed, unsupported file is left where it is
+    assert os.listdir(input_path) == ["notes.txt"]
+    assert conn.execute("SELECT transaction_uti FROM transactions").fetchall() == [("TRANS1",)]
+    conn.close()